@@ -1,6 +1,7 @@
 """Configuration centralisée du projet."""
 
 import os
+import tempfile
 from pathlib import Path
 
 # Chemins
@@ -17,6 +18,7 @@ REP_DATA.mkdir(parents=True, exist_ok=True)
 # Fichiers de données (déplacés dans data/)
 HISTORIQUE_PATH = REP_DATA / "history.json"
 PROFILS_PATH = REP_DATA / "profiles.json"
+JOBS_PATH = REP_DATA / "jobs.sqlite3"
 
 # Configuration Flask
 UPLOAD_FOLDER = str(REP_UPLOADS)
@@ -28,10 +30,80 @@ CLE_API = os.environ.get("LOCAL_API_KEY", "").strip()
 TAILLE_MAX_GLOBALE = int(os.environ.get("MAX_GLOBAL_UPLOAD_MB", "20")) * 1024 * 1024
 
 # Limites mémoire
-MAX_JOBS_MEMOIRE = 200
+# Nombre de jobs conservés (les plus anciens sont évincés, leur sortie supprimée)
+MAX_JOBS_MEMOIRE = int(os.environ.get("MAX_JOBS", "200"))
 MAX_HISTORY_ENTRIES = 1000
+# Historique: journal NDJSON découpé en segments de N entrées
+HISTORIQUE_SEGMENT_ENTREES = int(os.environ.get("HISTORY_SEGMENT_ENTRIES", "200"))
+# Stockage de l'historique: "journal" (NDJSON, MAX_HISTORY_ENTRIES entrées) ou "sqlite" (sans limite)
+HISTORIQUE_BACKEND = os.environ.get("HISTORY_BACKEND", "journal").strip().lower()
 MAX_API_HISTORY_RETURNS = 100
 
+# Exécution asynchrone des jobs API
+JOBS_WORKERS = int(os.environ.get("JOBS_WORKERS", "2"))
+MAX_JOBS_EN_ATTENTE = int(os.environ.get("MAX_PENDING_JOBS", "50"))
+# Stockage des jobs: "memoire" (propre au processus) ou "sqlite" (partagé entre workers, conservé au redémarrage)
+JOBS_BACKEND = os.environ.get("JOBS_BACKEND", "memoire").strip().lower()
+API_ASYNC_PAR_DEFAUT = os.environ.get("API_ASYNC_DEFAULT", "0").strip().lower() in {"1", "true", "oui"}
+
+# Flux SSE des jobs (/api/jobs/stream)
+SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_DUREE_MAX = float(os.environ.get("SSE_MAX_DURATION_SECONDS", "300"))
+SSE_RETRY_MS = 3000
+
+# Conversion parallèle des lots: "sequentiel", "processus" ou "auto"
+BATCH_EXECUTEUR = os.environ.get("BATCH_EXECUTOR", "auto").strip().lower()
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", str(os.cpu_count() or 1)))
+BATCH_SEUIL_PARALLELE = int(os.environ.get("BATCH_PARALLEL_THRESHOLD", "4"))
+
+# Pool LibreOffice: une instance = un profil utilisateur isolé et réutilisé
+REP_LIBREOFFICE_PROFILS = Path(
+    os.environ.get("LIBREOFFICE_PROFILES_DIR", str(Path(tempfile.gettempdir()) / "convertisseur_libreoffice"))
+)
+LIBREOFFICE_POOL_TAILLE = int(os.environ.get("LIBREOFFICE_POOL_SIZE", "2"))
+LIBREOFFICE_MAX_CONVERSIONS = int(os.environ.get("LIBREOFFICE_MAX_CONVERSIONS", "200"))
+LIBREOFFICE_TIMEOUT = int(os.environ.get("LIBREOFFICE_TIMEOUT", "120"))
+# Attente maximale d'une instance libre du pool avant d'abandonner la conversion
+LIBREOFFICE_ATTENTE_MAX = float(os.environ.get("LIBREOFFICE_POOL_TIMEOUT", "300"))
+
+# Audio: FFmpeg alimenté par pipes en mémoire (stdin/stdout) plutôt que par fichiers temporaires
+AUDIO_STREAMING = os.environ.get("AUDIO_STREAMING", "1").strip().lower() in {"1", "true", "oui"}
+AUDIO_TAILLE_BLOC = 64 * 1024
+
+# Cache des résultats de conversion (adressé par le contenu, éviction LRU)
+REP_CACHE = REP_UPLOADS / "cache"
+CACHE_ACTIF = os.environ.get("CONVERSION_CACHE", "1").strip().lower() in {"1", "true", "oui"}
+CACHE_TAILLE_MAX = int(os.environ.get("CONVERSION_CACHE_MB", "256")) * 1024 * 1024
+
+# Fichiers envoyés au-delà du seuil: écrits dans REP_SPOOL et convertis depuis le disque
+REP_SPOOL = REP_UPLOADS / "spool"
+SEUIL_SPOOL = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD_KB", "1024")) * 1024
+
+# Envois fractionnés (/api/uploads): fragments écrits directement sur disque, reprise possible
+REP_ENVOIS = REP_UPLOADS / "chunked"
+ENVOI_TAILLE_MAX = int(os.environ.get("CHUNKED_UPLOAD_MAX_MB", "4096")) * 1024 * 1024
+# Un fragment est le corps d'une requête PUT: borné par MAX_CONTENT_LENGTH (sinon 413 à chaque fragment)
+ENVOI_TAILLE_FRAGMENT = min(int(os.environ.get("CHUNKED_UPLOAD_CHUNK_MB", "8")) * 1024 * 1024, MAX_CONTENT_LENGTH)
+ENVOI_EXPIRATION = int(os.environ.get("CHUNKED_UPLOAD_EXPIRATION_HOURS", "24")) * 3600
+
+# Niveaux d'encodage (images, audio): compromis vitesse / taille de sortie
+NIVEAUX_ENCODAGE = ("fast", "balanced", "max_compression")
+NIVEAU_ENCODAGE_DEFAUT = os.environ.get("ENCODER_TIER", "balanced").strip().lower()
+if NIVEAU_ENCODAGE_DEFAUT not in NIVEAUX_ENCODAGE:
+    # Refusé au démarrage plutôt qu'à la première conversion image ou audio
+    raise ValueError(f"ENCODER_TIER doit valoir {', '.join(NIVEAUX_ENCODAGE)} (reçu: {NIVEAU_ENCODAGE_DEFAUT!r}).")
+
+# Redimensionnement des images: dimension maximale acceptée pour max_width / max_height
+IMAGE_DIMENSION_MAX = 16384
+
+# Miniatures des sorties image (/api/jobs/<id>/thumbnail), mises en cache à côté de la sortie
+VIGNETTE_TAILLE = int(os.environ.get("PREVIEW_THUMBNAIL_PX", "320"))
+VIGNETTE_QUALITE = 75
+VIGNETTE_MAX_AGE = int(os.environ.get("PREVIEW_THUMBNAIL_MAX_AGE", "86400"))
+
+# Téléchargement des sorties de jobs: durée de cache (sorties immuables, ETag = SHA-256)
+TELECHARGEMENT_MAX_AGE = int(os.environ.get("DOWNLOAD_MAX_AGE", str(365 * 24 * 3600)))
+
 # Types MIME par format
 MIME_ATTENDUS_PAR_TYPE = {
     "data": {
@@ -50,6 +122,8 @@ MIME_ATTENDUS_PAR_TYPE = {
             "text/x-yaml",
             "application/octet-stream",
         },
+        "ndjson": {"application/x-ndjson", "application/jsonl", "application/json", "text/plain"},
+        "jsonl": {"application/x-ndjson", "application/jsonl", "application/json", "text/plain"},
     },
     "image": {
         "png": {"image/png"},
@@ -71,7 +145,7 @@ MIME_ATTENDUS_PAR_TYPE = {
 
 # Formats cibles autorisés par type
 FORMATS_CIBLES_AUTORISES = {
-    "data": {"json", "yaml"},
+    "data": {"json", "yaml", "ndjson"},
     "image": {"png", "jpg", "jpeg", "webp", "pdf"},
     "audio": {"mp3", "wav"},
     "document": {"pdf", "docx", "txt"},
@@ -1,9 +1,14 @@
 """Convertisseur pour audio."""
 
 import shutil
+import struct
 import subprocess
 import tempfile
+import uuid
 from pathlib import Path
+from threading import Thread
+from typing import Iterator
+import config
 from converters.base import BaseConverter
 from models import ConversionResult, ConversionError
 
@@ -22,12 +27,31 @@ class AudioConverter(BaseConverter):
         "mp4": "audio/mp4",
     }
     
+    # Muxers FFmpeg à forcer quand la sortie est un pipe (pas d'extension à deviner)
+    MUXER_MAP = {
+        "mp3": "mp3",
+        "wav": "wav",
+    }
+    
+    # Arguments d'encodage par niveau (voir config.NIVEAUX_ENCODAGE). Pour
+    # libmp3lame, -compression_level 0 est l'algorithme le plus lent et le
+    # plus soigné, 9 le plus rapide. Le WAV (PCM) n'a pas de paramètre.
+    PARAMETRES_NIVEAU = {
+        "fast": {"mp3": ["-b:a", "192k", "-compression_level", "9"]},
+        "balanced": {"mp3": ["-b:a", "128k", "-compression_level", "5"]},
+        "max_compression": {"mp3": ["-q:a", "6", "-compression_level", "0"]},
+    }
+    
     def supports(self, source_format: str, target_format: str) -> bool:
         """Vérifier si la conversion est supportée."""
         source = source_format.lower().strip()
         target = target_format.lower().strip()
         return (source, target) in self.SUPPORTED_CONVERSIONS
     
+    def conversions(self) -> set[tuple[str, str]]:
+        """Paires (source, cible) proposées."""
+        return set(self.SUPPORTED_CONVERSIONS)
+    
     def convert(
         self,
         input_bytes: bytes,
@@ -43,38 +67,218 @@ class AudioConverter(BaseConverter):
             raise ConversionError(f"Format non supporté: {source} → {target}")
         
         ffmpeg = self._get_ffmpeg()
+        parametres = self._parametres_encodage(target, kwargs.get("tier"))
+        
+        try:
+            if config.AUDIO_STREAMING and not self._necessite_seek(input_bytes, source):
+                output_bytes = b"".join(self._iter_pipe(ffmpeg, input_bytes, target, parametres))
+                if target == "wav":
+                    output_bytes = self._corriger_entete_wav(output_bytes)
+            else:
+                output_bytes = self._convert_fichiers(ffmpeg, input_bytes, source, target, parametres)
+            
+            return ConversionResult(
+                output_bytes=output_bytes,
+                output_format=target,
+                mimetype=self.MIMETYPE_MAP.get(target, "audio/mp3")
+            )
+        except subprocess.CalledProcessError as e:
+            raise ConversionError("Échec de la conversion audio via FFmpeg.") from e
+        except Exception as e:
+            raise ConversionError(f"Échec de la conversion audio: {str(e)}") from e
+    
+    def convert_path(
+        self,
+        input_path: Path,
+        source_format: str,
+        target_format: str,
+        output_dir: Path,
+        **kwargs
+    ) -> ConversionResult:
+        """Convertir un fichier sur disque: FFmpeg lit l'entrée et écrit la sortie directement.
+        
+        Ni l'entrée ni la sortie ne passent en mémoire, quelle que soit leur taille.
+        """
+        source = source_format.lower().strip()
+        target = target_format.lower().strip()
+        
+        if not self.supports(source, target):
+            raise ConversionError(f"Format non supporté: {source} → {target}")
+        
+        ffmpeg = self._get_ffmpeg()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / f"{uuid.uuid4().hex}.{target}"
         
         try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                # Créer fichiers temporaires
-                input_path = Path(tmpdir) / f"input.{source}"
-                output_path = Path(tmpdir) / f"output.{target}"
-                
-                input_path.write_bytes(input_bytes)
-                
-                # Exécuter FFmpeg
-                cmd = [
-                    ffmpeg,
-                    "-y",
-                    "-hide_banner",
-                    "-loglevel", "error",
-                    "-i", str(input_path),
-                    str(output_path),
-                ]
-                subprocess.run(cmd, check=True)
-                
-                # Lire le résultat
-                output_bytes = output_path.read_bytes()
-                
-                return ConversionResult(
-                    output_bytes=output_bytes,
-                    output_format=target,
-                    mimetype=self.MIMETYPE_MAP.get(target, "audio/mp3")
-                )
+            self._executer_ffmpeg(ffmpeg, input_path, output_path, self._parametres_encodage(target, kwargs.get("tier")))
         except subprocess.CalledProcessError as e:
+            output_path.unlink(missing_ok=True)
             raise ConversionError("Échec de la conversion audio via FFmpeg.") from e
         except Exception as e:
+            output_path.unlink(missing_ok=True)
             raise ConversionError(f"Échec de la conversion audio: {str(e)}") from e
+        
+        return ConversionResult(
+            output_bytes=b"",
+            output_format=target,
+            mimetype=self.MIMETYPE_MAP.get(target, "audio/mp3"),
+            output_path=output_path,
+        )
+    
+    def _iter_pipe(
+        self,
+        ffmpeg: str,
+        input_bytes: bytes,
+        target: str,
+        parametres: list[str] | None = None,
+    ) -> Iterator[bytes]:
+        """Exécuter FFmpeg sur pipe:0 → pipe:1 et lire la sortie par blocs.
+        
+        L'appelant (`convert`) rassemble les blocs en mémoire: les pipes
+        évitent les fichiers temporaires, pas la copie de la sortie en
+        mémoire (un fichier déposé sur disque passe par `convert_path`).
+        """
+        cmd = [
+            ffmpeg,
+            "-y",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-i", "pipe:0",
+            *(parametres or []),
+            "-f", self.MUXER_MAP[target],
+            "pipe:1",
+        ]
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        
+        # Alimenter stdin dans un thread pour lire stdout en parallèle (pas d'interblocage)
+        ecrivain = Thread(target=self._alimenter, args=(process.stdin, input_bytes), daemon=True)
+        ecrivain.start()
+        
+        termine = False
+        try:
+            while True:
+                bloc = process.stdout.read(config.AUDIO_TAILLE_BLOC)
+                if not bloc:
+                    break
+                yield bloc
+            termine = True
+        finally:
+            process.stdout.close()
+            if not termine:
+                process.kill()
+            returncode = process.wait()
+            ecrivain.join()
+        
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+    
+    @staticmethod
+    def _alimenter(stdin, input_bytes: bytes) -> None:
+        """Écrire l'entrée sur le stdin de FFmpeg par blocs."""
+        vue = memoryview(input_bytes)
+        try:
+            for debut in range(0, len(vue), config.AUDIO_TAILLE_BLOC):
+                stdin.write(vue[debut:debut + config.AUDIO_TAILLE_BLOC])
+        except (BrokenPipeError, ValueError):
+            # FFmpeg a fermé son entrée (erreur ou arrêt anticipé)
+            pass
+        finally:
+            try:
+                stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+    
+    @staticmethod
+    def _convert_fichiers(
+        ffmpeg: str,
+        input_bytes: bytes,
+        source: str,
+        target: str,
+        parametres: list[str] | None = None,
+    ) -> bytes:
+        """Convertir via fichiers temporaires (entrées nécessitant un accès aléatoire)."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Créer fichiers temporaires
+            input_path = Path(tmpdir) / f"input.{source}"
+            output_path = Path(tmpdir) / f"output.{target}"
+            
+            input_path.write_bytes(input_bytes)
+            AudioConverter._executer_ffmpeg(ffmpeg, input_path, output_path, parametres)
+            
+            # Lire le résultat
+            return output_path.read_bytes()
+    
+    @staticmethod
+    def _executer_ffmpeg(
+        ffmpeg: str,
+        input_path: Path,
+        output_path: Path,
+        parametres: list[str] | None = None,
+    ) -> None:
+        """Exécuter FFmpeg de fichier à fichier (format de sortie déduit de l'extension)."""
+        cmd = [
+            ffmpeg,
+            "-y",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-i", str(input_path),
+            *(parametres or []),
+            str(output_path),
+        ]
+        subprocess.run(cmd, check=True)
+    
+    @classmethod
+    def _parametres_encodage(cls, target: str, niveau: str | None) -> list[str]:
+        """Arguments FFmpeg du niveau d'encodage demandé (défaut: NIVEAU_ENCODAGE_DEFAUT)."""
+        parametres = cls.PARAMETRES_NIVEAU.get(niveau or config.NIVEAU_ENCODAGE_DEFAUT, cls.PARAMETRES_NIVEAU["balanced"])
+        return list(parametres.get(target, []))
+    
+    @staticmethod
+    def _necessite_seek(input_bytes: bytes, source: str) -> bool:
+        """Déterminer si l'entrée doit être lue depuis un fichier (accès aléatoire).
+        
+        Un MP4 n'est lisible depuis un pipe que si l'atome `moov` (index)
+        précède `mdat` (données), ce qui est le cas des fichiers "faststart".
+        """
+        if source != "mp4":
+            return False
+        
+        position = 0
+        taille_totale = len(input_bytes)
+        while position + 8 <= taille_totale:
+            taille, type_atome = struct.unpack(">I4s", input_bytes[position:position + 8])
+            if type_atome == b"moov":
+                return False
+            if type_atome == b"mdat":
+                return True
+            if taille == 1:
+                if position + 16 > taille_totale:
+                    break
+                taille = struct.unpack(">Q", input_bytes[position + 8:position + 16])[0]
+            elif taille == 0:
+                break
+            if taille < 8:
+                break
+            position += taille
+        return True
+    
+    @staticmethod
+    def _corriger_entete_wav(output_bytes: bytes) -> bytes:
+        """Renseigner les tailles RIFF/data laissées à 0xFFFFFFFF par une sortie pipe."""
+        if output_bytes[:4] != b"RIFF" or output_bytes[8:12] != b"WAVE":
+            return output_bytes
+        
+        # Parcourir les chunks jusqu'au chunk "data" (fmt, LIST, ... le précèdent)
+        position = 12
+        while position + 8 <= len(output_bytes):
+            id_chunk, taille = struct.unpack("<4sI", output_bytes[position:position + 8])
+            if id_chunk == b"data":
+                wav = bytearray(output_bytes)
+                struct.pack_into("<I", wav, 4, min(len(wav) - 8, 0xFFFFFFFF))
+                struct.pack_into("<I", wav, position + 4, min(len(wav) - position - 8, 0xFFFFFFFF))
+                return bytes(wav)
+            position += 8 + taille + (taille % 2)
+        return output_bytes
     
     @staticmethod
     def _get_ffmpeg() -> str:
@@ -1,12 +1,16 @@
 """Base abstraite pour les convertisseurs."""
 
 from abc import ABC, abstractmethod
+from pathlib import Path
 from models import ConversionResult, ConversionError
 
 
 class BaseConverter(ABC):
     """Classe abstraite pour tous les convertisseurs."""
     
+    # Extensions équivalentes à un format canonique (ex: "jpeg" → "jpg")
+    ALIAS: dict[str, str] = {}
+    
     @abstractmethod
     def supports(self, source_format: str, target_format: str) -> bool:
         """Vérifier si cette conversion est supportée.
@@ -14,12 +18,26 @@ class BaseConverter(ABC):
         Args:
             source_format: Format source (ex: 'png')
             target_format: Format cible (ex: 'jpg')
-            
+        
         Returns:
             True si supporté
         """
         pass
     
+    def conversions(self) -> set[tuple[str, str]]:
+        """Paires (source, cible) proposées, déclarées au registre des convertisseurs.
+        
+        Par défaut, toutes les paires de formats distincts de
+        `SUPPORTED_FORMATS` acceptées par `supports`.
+        """
+        formats = getattr(self, "SUPPORTED_FORMATS", set())
+        return {
+            (source, target)
+            for source in formats
+            for target in formats
+            if source != target and self.supports(source, target)
+        }
+    
     @abstractmethod
     def convert(
         self,
@@ -35,11 +53,41 @@ class BaseConverter(ABC):
             source_format: Format source
             target_format: Format cible
             **kwargs: Arguments supplémentaires spécifiques
-            
+        
         Returns:
             ConversionResult avec les octets convertis
-            
+        
         Raises:
             ConversionError: En cas d'erreur
         """
         pass
+    
+    def convert_path(
+        self,
+        input_path: Path,
+        source_format: str,
+        target_format: str,
+        output_dir: Path,
+        **kwargs
+    ) -> ConversionResult:
+        """Convertir un fichier sur disque.
+        
+        Par défaut, le fichier est lu puis converti en mémoire. Les
+        convertisseurs qui délèguent à un processus externe surchargent
+        cette méthode pour lui passer le chemin directement et écrire la
+        sortie dans `output_dir` (`ConversionResult.output_path`).
+        
+        Args:
+            input_path: Chemin du fichier d'entrée
+            source_format: Format source
+            target_format: Format cible
+            output_dir: Dossier où écrire la sortie
+            **kwargs: Arguments supplémentaires spécifiques
+        
+        Returns:
+            ConversionResult (octets en mémoire ou chemin de sortie)
+        
+        Raises:
+            ConversionError: En cas d'erreur
+        """
+        return self.convert(input_path.read_bytes(), source_format, target_format, **kwargs)
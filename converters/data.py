@@ -1,15 +1,33 @@
-"""Convertisseur pour données (JSON/YAML)."""
+"""Convertisseur pour données (JSON/YAML/NDJSON)."""
 
+import io
 import json
+import uuid
+from pathlib import Path
+from typing import BinaryIO
 import yaml
+from converters import data_stream
 from converters.base import BaseConverter
 from models import ConversionResult, ConversionError
 
 
 class DataConverter(BaseConverter):
-    """Convertit entre JSON et YAML."""
+    """Convertit entre JSON, YAML (un ou plusieurs documents) et NDJSON."""
     
-    SUPPORTED_FORMATS = {"json", "yaml"}
+    SUPPORTED_FORMATS = {"json", "yaml", "ndjson"}
+    
+    MIMETYPE_MAP = {
+        "json": "application/json",
+        "yaml": "application/x-yaml",
+        "ndjson": "application/x-ndjson",
+    }
+    
+    # Extensions lues comme l'un des formats (un .txt ou .conf est lu en YAML)
+    ALIAS = {"yml": "yaml", "txt": "yaml", "conf": "yaml", "jsonl": "ndjson"}
+    
+    # Octets lus pour détecter le format
+    TAILLE_SONDE = 4096
+    DEBUTS_JSON = frozenset(b'{["-0123456789tfn')
     
     def supports(self, source_format: str, target_format: str) -> bool:
         """Vérifier si la conversion est supportée."""
@@ -24,44 +42,163 @@ class DataConverter(BaseConverter):
         target_format: str,
         **kwargs
     ) -> ConversionResult:
-        """Convertir données entre JSON et YAML."""
+        """Convertir données entre JSON, YAML et NDJSON."""
         source = source_format.lower().strip()
         target = target_format.lower().strip()
         
         if not self.supports(source, target):
             raise ConversionError(f"Format non supporté: {source} → {target}")
         
-        # Parser l'entrée
-        text = input_bytes.decode("utf-8")
-        data = self._parse_input(text)
+        sortie = io.BytesIO()
+        self._convertir_flux(io.BytesIO(input_bytes), sortie, source, target)
+        
+        return ConversionResult(
+            output_bytes=sortie.getvalue(),
+            output_format=target,
+            mimetype=self._mimetype(target)
+        )
+    
+    def convert_path(
+        self,
+        input_path: Path,
+        source_format: str,
+        target_format: str,
+        output_dir: Path,
+        **kwargs
+    ) -> ConversionResult:
+        """Convertir un fichier sur disque en écrivant la sortie au fil de la lecture.
         
-        # Convertir vers le format cible
-        if target == "json":
-            output = json.dumps(data, indent=2, ensure_ascii=False) + "\n"
-        else:  # yaml
-            output = yaml.safe_dump(data, sort_keys=False, allow_unicode=True)
+        Aucun arbre de données n'est construit: la mémoire ne dépend pas de
+        la taille du fichier (voir converters/data_stream.py).
+        """
+        source = source_format.lower().strip()
+        target = target_format.lower().strip()
+        
+        if not self.supports(source, target):
+            raise ConversionError(f"Format non supporté: {source} → {target}")
+        
+        output_dir.mkdir(parents=True, exist_ok=True)
+        output_path = output_dir / f"{uuid.uuid4().hex}.{target}"
+        try:
+            with input_path.open("rb") as entree, output_path.open("w+b") as sortie:
+                self._convertir_flux(entree, sortie, source, target)
+        except BaseException:
+            output_path.unlink(missing_ok=True)
+            raise
         
         return ConversionResult(
-            output_bytes=output.encode("utf-8"),
+            output_bytes=b"",
             output_format=target,
-            mimetype="application/json" if target == "json" else "application/x-yaml"
+            mimetype=self._mimetype(target),
+            output_path=output_path,
         )
     
-    @staticmethod
-    def _parse_input(text: str) -> dict:
-        """Parser JSON ou YAML depuis du texte.
+    def _convertir_flux(self, entree: BinaryIO, sortie: BinaryIO, source: str, target: str) -> None:
+        """Convertir en flux avec le lecteur du format détecté (voir `_detecter_format`).
+        
+        Si ce lecteur échoue, l'entrée est relue depuis le début avec les
+        autres (YAML est un sur-ensemble de JSON, un fichier .json peut être
+        du NDJSON), la sortie partielle étant effacée. Les constructions YAML
+        sans équivalent en flux (fusion `<<`, !!set...), les clés répétées et
+        les contenus refusés par tous les lecteurs repassent par un chargement
+        complet, comme avant le moteur en flux (`json.loads`, puis le
+        chargeur Python de `yaml.safe_load`, qui accepte par exemple les
+        échappements `"\\uD83D"` refusés par libyaml).
         
         Raises:
-            ConversionError: Si parsing impossible
+            ConversionError: Si parsing impossible ou texte non encodable en UTF-8
         """
-        # Essayer JSON en premier
         try:
-            return json.loads(text)
-        except Exception:
-            pass
+            self._convertir_flux_utf8(entree, sortie, source, target)
+        except UnicodeEncodeError as e:
+            # Ex.: demi-paire de substitution isolée ("\ud83d") dans une chaîne JSON
+            raise ConversionError("Le contenu contient des caractères non encodables en UTF-8.") from e
+    
+    def _convertir_flux_utf8(self, entree: BinaryIO, sortie: BinaryIO, source: str, target: str) -> None:
+        """Corps de `_convertir_flux`."""
+        lecteurs = {
+            "json": data_stream.evenements_json,
+            "yaml": data_stream.evenements_yaml,
+            "ndjson": data_stream.evenements_ndjson,
+        }
+        premier = lecteurs.pop(self._detecter_format(entree, source))
+        
+        for lecteur in (premier, *lecteurs.values()):
+            try:
+                self._convertir_avec(lecteur, entree, sortie, target)
+                return
+            except data_stream.ErreurSyntaxe:
+                continue
+            except data_stream.NonDiffusable:
+                break
         
-        # Essayer YAML
+        entree.seek(0)
+        sortie.seek(0)
+        sortie.truncate()
         try:
-            return yaml.safe_load(text)
-        except Exception as e:
-            raise ConversionError("Impossible de parser le contenu en JSON ou YAML.") from e
+            text = entree.read().decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            raise ConversionError("Le fichier doit être un texte UTF-8 (JSON/YAML).") from e
+        try:
+            # Comme avant le moteur en flux: json.loads d'abord (dernière valeur d'une clé répétée)
+            documents = [json.loads(text)]
+        except ValueError:
+            try:
+                documents = list(yaml.load_all(text, Loader=yaml.SafeLoader))
+            except yaml.YAMLError as e:
+                raise ConversionError("Impossible de parser le contenu en JSON, YAML ou NDJSON.") from e
+        
+        output = io.StringIO()
+        if target == "yaml":
+            yaml.dump_all(documents, output, Dumper=data_stream.DumperYaml, sort_keys=False, allow_unicode=True)
+        else:
+            evenements = data_stream.evenements_documents(documents)
+            data_stream.ecrire(evenements, output, target, tableau=len(documents) > 1)
+        sortie.write(output.getvalue().encode("utf-8"))
+    
+    @staticmethod
+    def _convertir_avec(lecteur, entree: BinaryIO, sortie: BinaryIO, target: str) -> None:
+        """Convertir avec un lecteur donné, depuis le début de l'entrée.
+        
+        Un seul document est converti tel quel (vers NDJSON, une liste racine
+        donne une ligne par élément). Plusieurs documents sont autant
+        d'éléments: un tableau JSON, une ligne NDJSON chacun. Un flux NDJSON
+        est toujours lu ainsi; pour le YAML, la conversion repart dans ce
+        mode dès le second document (seul le premier est relu).
+        """
+        tableau = lecteur is data_stream.evenements_ndjson
+        while True:
+            entree.seek(0)
+            sortie.seek(0)
+            sortie.truncate()
+            try:
+                data_stream.convertir(lecteur, entree, sortie, target, tableau=tableau)
+                return
+            except data_stream.PlusieursDocuments:
+                tableau = True
+    
+    @classmethod
+    def _detecter_format(cls, entree: BinaryIO, source: str) -> str:
+        """Détecter le format d'après les premiers octets et le format annoncé.
+        
+        Un NDJSON annoncé (.ndjson, .jsonl) est lu ligne à ligne. Sinon, un
+        contenu dont le premier caractère peut commencer une valeur JSON
+        (`{`, `[`, `"`, chiffre, `-`, `true`/`false`/`null`) est lu d'abord en
+        JSON (analyseur C de la bibliothèque standard), même annoncé en YAML,
+        comme le faisait `json.loads` avant le moteur en flux (`1e3` est un
+        nombre en JSON, une chaîne en YAML); à défaut le format annoncé
+        (déduit de l'extension) l'emporte.
+        """
+        if source == "ndjson":
+            return "ndjson"
+        debut = entree.read(cls.TAILLE_SONDE)
+        entree.seek(0)
+        debut = debut.removeprefix(b"\xef\xbb\xbf").lstrip()
+        if debut[:1] and debut[0] in cls.DEBUTS_JSON:
+            return "json"
+        return "json" if source == "json" else "yaml"
+    
+    @classmethod
+    def _mimetype(cls, target: str) -> str:
+        """Type MIME d'une sortie."""
+        return cls.MIMETYPE_MAP[target]
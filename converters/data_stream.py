@@ -0,0 +1,558 @@
+"""Moteur de conversion JSON/YAML/NDJSON en flux.
+
+Les lecteurs produisent une suite d'événements (début/fin d'objet, début/fin
+de liste, scalaire) sans construire l'arbre des données; les écrivains les
+sérialisent au fil de l'eau. La mémoire utilisée dépend de la profondeur
+d'imbrication et de la plus grande valeur scalaire, pas de la taille du
+fichier.
+
+Événements: tuples `(type, valeur)`, où `valeur` n'est renseignée que pour
+SCALAIRE. Dans un objet, clés et valeurs alternent. Chaque document (un
+fichier JSON, un document YAML séparé par `---`, une ligne NDJSON) est
+encadré par DEBUT_DOCUMENT / FIN_DOCUMENT.
+
+Le YAML est lu par libyaml (CSafeLoader) quand PyYAML a été compilé avec,
+sinon par l'implémentation Python. Il est toujours écrit par l'émetteur
+Python (SafeDumper, celui de `yaml.safe_dump`): celui de libyaml échappe
+les caractères hors BMP, écrit autrement les clés vides et refuse les
+surrogats isolés, ce qui changerait les fichiers produits.
+"""
+
+import io
+import json
+import json.scanner
+import re
+from typing import BinaryIO, Callable, Iterator, TextIO
+import yaml
+from models import ConversionError
+
+DEBUT_OBJET = "debut_objet"
+FIN_OBJET = "fin_objet"
+DEBUT_LISTE = "debut_liste"
+FIN_LISTE = "fin_liste"
+SCALAIRE = "scalaire"
+DEBUT_DOCUMENT = "debut_document"
+FIN_DOCUMENT = "fin_document"
+
+Evenement = tuple[str, object]
+
+TAILLE_BLOC = 64 * 1024
+
+# Extension C de PyYAML si disponible (lecture plusieurs fois plus rapide);
+# l'écriture reste en Python pour produire les mêmes octets que yaml.safe_dump
+ChargeurYaml = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+DumperYaml = yaml.SafeDumper
+
+_BLANCS = re.compile(r"[ \t\n\r]*")
+_ENCODEUR = json.JSONEncoder(ensure_ascii=False)
+_TAG_MAP = "tag:yaml.org,2002:map"
+_TAG_SEQ = "tag:yaml.org,2002:seq"
+_TAG_MERGE = "tag:yaml.org,2002:merge"
+
+
+class ErreurSyntaxe(Exception):
+    """Contenu illisible dans le format essayé."""
+
+
+class NonDiffusable(Exception):
+    """Entrée sans équivalent en flux (clé répétée, clé de fusion YAML `<<`, !!set, !!omap...)."""
+
+
+class PlusieursDocuments(Exception):
+    """Second document rencontré alors qu'une sortie JSON à document unique est écrite."""
+
+
+def convertir(
+    lecteur: Callable[[TextIO], Iterator[Evenement]],
+    entree: BinaryIO,
+    sortie: BinaryIO,
+    target: str,
+    tableau: bool = False,
+) -> None:
+    """Convertir un flux d'octets UTF-8 vers `target` (json, yaml ou ndjson), au fil de la lecture.
+    
+    Args:
+        lecteur: evenements_json, evenements_yaml ou evenements_ndjson
+        entree: Flux d'entrée binaire
+        sortie: Flux de sortie binaire
+        target: Format cible
+        tableau: Traiter chaque document comme un élément (voir ecrire_json, ecrire_ndjson)
+    
+    Raises:
+        ErreurSyntaxe: Si l'entrée n'est pas lisible par `lecteur`
+        NonDiffusable: Si l'entrée exige un chargement complet
+        PlusieursDocuments: Si l'entrée a plusieurs documents, `tableau` étant faux
+        ConversionError: Si l'entrée n'est pas en UTF-8 ou une valeur n'a pas d'équivalent
+    """
+    texte_entree = io.TextIOWrapper(entree, encoding="utf-8-sig", newline="")
+    texte_sortie = io.TextIOWrapper(sortie, encoding="utf-8", newline="")
+    try:
+        ecrire(lecteur(texte_entree), texte_sortie, target, tableau)
+        texte_sortie.flush()
+    except UnicodeDecodeError as e:
+        raise ConversionError("Le fichier doit être un texte UTF-8 (JSON/YAML).") from e
+    finally:
+        # Rendre les flux binaires à l'appelant sans les fermer
+        texte_entree.detach()
+        texte_sortie.detach()
+
+
+class _LecteurJson:
+    """Analyseur JSON incrémental: lit le texte par blocs et produit des événements."""
+    
+    def __init__(self, texte: TextIO):
+        self.texte = texte
+        self.tampon = ""
+        self.pos = 0
+        self.fin_fichier = False
+        # Scanner C de la bibliothèque standard, utilisé pour les seuls scalaires
+        self.scanner = json.scanner.make_scanner(json.JSONDecoder())
+    
+    def evenements(self) -> Iterator[Evenement]:
+        """Parcourir le document JSON."""
+        pile = []
+        etat = "valeur"
+        while True:
+            c = self._prochain()
+            if etat == "suite":
+                if not pile:
+                    if c:
+                        raise ErreurSyntaxe("Données après la fin du document JSON.")
+                    return
+                if c == ",":
+                    self.pos += 1
+                    etat = "cle" if pile[-1] == "{" else "valeur"
+                elif c == "}" and pile[-1] == "{":
+                    self.pos += 1
+                    pile.pop()
+                    yield FIN_OBJET, None
+                elif c == "]" and pile[-1] == "[":
+                    self.pos += 1
+                    pile.pop()
+                    yield FIN_LISTE, None
+                else:
+                    raise ErreurSyntaxe("Virgule ou fermeture attendue.")
+            elif etat == "deux_points":
+                if c != ":":
+                    raise ErreurSyntaxe("':' attendu après une clé.")
+                self.pos += 1
+                etat = "valeur"
+            elif etat in ("cle", "cle_ou_fin"):
+                if etat == "cle_ou_fin" and c == "}":
+                    self.pos += 1
+                    pile.pop()
+                    yield FIN_OBJET, None
+                    etat = "suite"
+                elif c == '"':
+                    yield SCALAIRE, self._scalaire()
+                    etat = "deux_points"
+                else:
+                    raise ErreurSyntaxe("Clé JSON attendue.")
+            elif etat == "valeur_ou_fin" and c == "]":
+                self.pos += 1
+                pile.pop()
+                yield FIN_LISTE, None
+                etat = "suite"
+            elif c == "{":
+                self.pos += 1
+                pile.append(c)
+                yield DEBUT_OBJET, None
+                etat = "cle_ou_fin"
+            elif c == "[":
+                self.pos += 1
+                pile.append(c)
+                yield DEBUT_LISTE, None
+                etat = "valeur_ou_fin"
+            else:
+                yield SCALAIRE, self._scalaire()
+                etat = "suite"
+    
+    def _lire(self) -> bool:
+        """Ajouter un bloc au tampon (au moins la taille déjà en attente: coût linéaire)."""
+        if self.fin_fichier:
+            return False
+        bloc = self.texte.read(max(TAILLE_BLOC, len(self.tampon) - self.pos))
+        if not bloc:
+            self.fin_fichier = True
+            return False
+        self.tampon = self.tampon[self.pos:] + bloc
+        self.pos = 0
+        return True
+    
+    def _prochain(self) -> str:
+        """Sauter les blancs et retourner le prochain caractère ("" en fin de fichier)."""
+        while True:
+            self.pos = _BLANCS.match(self.tampon, self.pos).end()
+            if self.pos < len(self.tampon):
+                return self.tampon[self.pos]
+            if not self._lire():
+                return ""
+    
+    def _scalaire(self):
+        """Lire une chaîne, un nombre ou une constante, en complétant le tampon si elle est coupée."""
+        while True:
+            try:
+                valeur, fin = self.scanner(self.tampon, self.pos)
+            except StopIteration:
+                # Constante coupée en bord de tampon ("tru", "-Infin")?
+                if len(self.tampon) - self.pos < 16 and self._lire():
+                    continue
+                raise ErreurSyntaxe("Valeur JSON attendue.") from None
+            except json.JSONDecodeError as e:
+                if (e.msg.startswith("Unterminated") or e.pos >= len(self.tampon) - 6) and self._lire():
+                    continue
+                raise ErreurSyntaxe(str(e)) from e
+            # Un nombre près du bord du tampon peut continuer dans le bloc suivant ("1" | "2", "1e" | "+5")
+            if len(self.tampon) - fin < 3 and self._lire():
+                continue
+            self.pos = fin
+            return valeur
+
+
+def ecrire(evenements: Iterator[Evenement], sortie: TextIO, target: str, tableau: bool = False) -> None:
+    """Écrire des événements dans le format cible."""
+    evenements = _cles_uniques(evenements)
+    if target == "json":
+        ecrire_json(evenements, sortie, tableau)
+    elif target == "ndjson":
+        ecrire_ndjson(evenements, sortie, tableau)
+    else:
+        ecrire_yaml(evenements, sortie)
+
+
+def _cles_uniques(evenements: Iterator[Evenement]) -> Iterator[Evenement]:
+    """Transmettre les événements en vérifiant que les clés de chaque objet sont uniques.
+    
+    Seules les clés des objets ouverts sont gardées en mémoire.
+    
+    Raises:
+        NonDiffusable: Si une clé est répétée; le chargement complet garde
+            alors sa dernière valeur, comme json.loads et safe_load
+    """
+    # Par conteneur ouvert: [clés vues, clé attendue] pour un objet, None pour une liste
+    pile = []
+    for evenement in evenements:
+        type_evenement, valeur = evenement
+        if type_evenement in (FIN_OBJET, FIN_LISTE):
+            pile.pop()
+        elif type_evenement not in (DEBUT_DOCUMENT, FIN_DOCUMENT):
+            if pile and pile[-1] is not None:
+                parent = pile[-1]
+                if parent[1] and type_evenement == SCALAIRE:
+                    try:
+                        if valeur in parent[0]:
+                            raise NonDiffusable()
+                        parent[0].add(valeur)
+                    except TypeError:
+                        # Clé non hachable: laissée à l'écrivain
+                        pass
+                parent[1] = not parent[1]
+            if type_evenement == DEBUT_OBJET:
+                pile.append([set(), True])
+            elif type_evenement == DEBUT_LISTE:
+                pile.append(None)
+        yield evenement
+
+
+def evenements_json(texte: TextIO) -> Iterator[Evenement]:
+    """Événements d'un document JSON lu par blocs."""
+    yield DEBUT_DOCUMENT, None
+    yield from _LecteurJson(texte).evenements()
+    yield FIN_DOCUMENT, None
+
+
+def evenements_ndjson(texte: TextIO) -> Iterator[Evenement]:
+    """Événements d'un flux NDJSON (JSON Lines): un document par ligne non vide.
+    
+    Une ligne est décodée d'un bloc: la mémoire dépend de la plus longue
+    ligne, pas du nombre de lignes.
+    """
+    for numero, ligne in enumerate(texte, start=1):
+        if not ligne.strip():
+            continue
+        try:
+            valeur = json.loads(ligne)
+        except ValueError as e:
+            raise ErreurSyntaxe(f"Ligne {numero}: {e}") from e
+        yield DEBUT_DOCUMENT, None
+        yield from evenements_valeur(valeur)
+        yield FIN_DOCUMENT, None
+
+
+def evenements_documents(documents) -> Iterator[Evenement]:
+    """Événements d'une suite de documents déjà chargés."""
+    for document in documents:
+        yield DEBUT_DOCUMENT, None
+        yield from evenements_valeur(document)
+        yield FIN_DOCUMENT, None
+
+
+def evenements_valeur(valeur) -> Iterator[Evenement]:
+    """Événements d'une valeur Python (dict, list, scalaire)."""
+    if isinstance(valeur, dict):
+        yield DEBUT_OBJET, None
+        for cle, element in valeur.items():
+            yield SCALAIRE, cle
+            yield from evenements_valeur(element)
+        yield FIN_OBJET, None
+    elif isinstance(valeur, list):
+        yield DEBUT_LISTE, None
+        for element in valeur:
+            yield from evenements_valeur(element)
+        yield FIN_LISTE, None
+    else:
+        yield SCALAIRE, valeur
+
+
+def evenements_yaml(texte: TextIO) -> Iterator[Evenement]:
+    """Événements des documents YAML d'un flux, à partir des événements de l'analyseur.
+    
+    Les scalaires sont typés comme par `yaml.safe_load`. Les nœuds ancrés
+    (`&ancre`) sont mémorisés pour rejouer leurs alias (`*ancre`), le temps
+    de leur document.
+    """
+    chargeur = ChargeurYaml(texte)
+    ancres = {}
+    enregistrements = []
+    try:
+        while chargeur.check_event():
+            evenement = chargeur.get_event()
+            if isinstance(evenement, yaml.DocumentStartEvent):
+                yield DEBUT_DOCUMENT, None
+                continue
+            if isinstance(evenement, yaml.DocumentEndEvent):
+                # Les ancres ne valent que dans leur document
+                ancres.clear()
+                yield FIN_DOCUMENT, None
+                continue
+            if isinstance(evenement, (yaml.StreamStartEvent, yaml.StreamEndEvent)):
+                continue
+            
+            if isinstance(evenement, yaml.AliasEvent):
+                if evenement.anchor not in ancres:
+                    raise ErreurSyntaxe(f"Ancre YAML inconnue: {evenement.anchor}")
+                produits = ancres[evenement.anchor]
+            else:
+                produits = [_evenement_yaml(chargeur, evenement)]
+                if getattr(evenement, "anchor", None):
+                    enregistrements.append([evenement.anchor, [], 0])
+            
+            for produit in produits:
+                for enregistrement in enregistrements:
+                    enregistrement[1].append(produit)
+                    if produit[0] in (DEBUT_OBJET, DEBUT_LISTE):
+                        enregistrement[2] += 1
+                    elif produit[0] in (FIN_OBJET, FIN_LISTE):
+                        enregistrement[2] -= 1
+                termines = [e for e in enregistrements if e[2] == 0]
+                for ancre, evenements, _ in termines:
+                    ancres[ancre] = evenements
+                enregistrements = [e for e in enregistrements if e[2] != 0]
+                yield produit
+    except yaml.YAMLError as e:
+        raise ErreurSyntaxe(str(e)) from e
+    finally:
+        chargeur.dispose()
+
+
+def _evenement_yaml(chargeur: yaml.BaseLoader, evenement: yaml.Event) -> Evenement:
+    """Traduire un événement de l'analyseur YAML (hors alias)."""
+    if isinstance(evenement, yaml.ScalarEvent):
+        tag = evenement.tag
+        if tag is None or tag == "!":
+            tag = chargeur.resolve(yaml.ScalarNode, evenement.value, evenement.implicit)
+        if tag == _TAG_MERGE:
+            raise NonDiffusable()
+        noeud = yaml.ScalarNode(tag, evenement.value, evenement.start_mark, evenement.end_mark, style=evenement.style)
+        constructeur = chargeur.yaml_constructors.get(tag, chargeur.yaml_constructors[None])
+        return SCALAIRE, constructeur(chargeur, noeud)
+    if isinstance(evenement, yaml.MappingStartEvent):
+        if evenement.tag not in (None, "!", _TAG_MAP):
+            raise NonDiffusable()
+        return DEBUT_OBJET, None
+    if isinstance(evenement, yaml.SequenceStartEvent):
+        if evenement.tag not in (None, "!", _TAG_SEQ):
+            raise NonDiffusable()
+        return DEBUT_LISTE, None
+    if isinstance(evenement, yaml.MappingEndEvent):
+        return FIN_OBJET, None
+    return FIN_LISTE, None
+
+
+def ecrire_json(evenements: Iterator[Evenement], sortie: TextIO, tableau: bool = False) -> None:
+    """Écrire les événements en JSON, mis en forme comme `json.dumps(indent=2, ensure_ascii=False)`.
+    
+    Avec `tableau`, chaque document devient un élément d'un tableau; sinon
+    un seul document est attendu (un flux vide donne `null`, comme un
+    YAML vide chargé par safe_load).
+    
+    Raises:
+        PlusieursDocuments: Si un second document arrive sans `tableau`
+    """
+    pile = []
+    if tableau:
+        sortie.write("[")
+        pile.append([DEBUT_LISTE, 0])
+    documents = 0
+    for type_evenement, valeur in evenements:
+        if type_evenement == DEBUT_DOCUMENT:
+            documents += 1
+            if documents > 1 and not tableau:
+                raise PlusieursDocuments()
+            continue
+        if type_evenement == FIN_DOCUMENT:
+            continue
+        
+        if type_evenement in (FIN_OBJET, FIN_LISTE):
+            _, enfants = pile.pop()
+            if enfants:
+                sortie.write("\n" + "  " * len(pile))
+            sortie.write("}" if type_evenement == FIN_OBJET else "]")
+            continue
+        
+        if pile:
+            parent = pile[-1]
+            est_cle = parent[0] == DEBUT_OBJET and parent[1] % 2 == 0
+            if parent[0] == DEBUT_LISTE or est_cle:
+                sortie.write(("," if parent[1] else "") + "\n" + "  " * len(pile))
+            parent[1] += 1
+            if est_cle:
+                if type_evenement != SCALAIRE:
+                    raise ConversionError("Clé non scalaire: non représentable en JSON.")
+                sortie.write(_cle_json(valeur) + ": ")
+                continue
+        
+        if type_evenement == SCALAIRE:
+            sortie.write(_valeur_json(valeur))
+        else:
+            sortie.write("{" if type_evenement == DEBUT_OBJET else "[")
+            pile.append([type_evenement, 0])
+    
+    if tableau:
+        sortie.write("\n]" if pile.pop()[1] else "]")
+    elif not documents:
+        sortie.write("null")
+    sortie.write("\n")
+
+
+def ecrire_ndjson(evenements: Iterator[Evenement], sortie: TextIO, tableau: bool = False) -> None:
+    """Écrire les événements en NDJSON: un enregistrement JSON compact par ligne.
+    
+    Avec `tableau`, chaque document est un enregistrement. Sinon un seul
+    document est attendu: si sa racine est une liste, ses éléments sont
+    autant d'enregistrements. Rien n'est gardé en mémoire d'un
+    enregistrement à l'autre.
+    
+    Raises:
+        PlusieursDocuments: Si un second document arrive sans `tableau`
+    """
+    # Conteneurs en cours d'écriture; None marque une liste racine éclatée en lignes
+    pile = []
+    documents = 0
+    for type_evenement, valeur in evenements:
+        if type_evenement == DEBUT_DOCUMENT:
+            documents += 1
+            if documents > 1 and not tableau:
+                raise PlusieursDocuments()
+            continue
+        if type_evenement == FIN_DOCUMENT:
+            continue
+        
+        if type_evenement in (FIN_OBJET, FIN_LISTE):
+            if pile.pop() is not None:
+                sortie.write("}" if type_evenement == FIN_OBJET else "]")
+                if not pile or pile[-1] is None:
+                    sortie.write("\n")
+            continue
+        
+        if not pile and type_evenement == DEBUT_LISTE and not tableau:
+            pile.append(None)
+            continue
+        
+        if pile and pile[-1] is not None:
+            parent = pile[-1]
+            est_cle = parent[0] == DEBUT_OBJET and parent[1] % 2 == 0
+            if parent[1] and (parent[0] == DEBUT_LISTE or est_cle):
+                sortie.write(",")
+            parent[1] += 1
+            if est_cle:
+                if type_evenement != SCALAIRE:
+                    raise ConversionError("Clé non scalaire: non représentable en JSON.")
+                sortie.write(_cle_json(valeur) + ":")
+                continue
+        
+        if type_evenement == SCALAIRE:
+            sortie.write(_valeur_json(valeur))
+            if not pile or pile[-1] is None:
+                sortie.write("\n")
+        else:
+            sortie.write("{" if type_evenement == DEBUT_OBJET else "[")
+            pile.append([type_evenement, 0])
+
+
+def _valeur_json(valeur) -> str:
+    """Scalaire JSON."""
+    try:
+        return _ENCODEUR.encode(valeur)
+    except TypeError as e:
+        raise ConversionError(f"Valeur non représentable en JSON: {valeur!r}") from e
+
+
+def _cle_json(cle) -> str:
+    """Clé JSON (les clés non textuelles sont converties comme par json.dumps)."""
+    if isinstance(cle, str):
+        return _ENCODEUR.encode(cle)
+    if cle is None or isinstance(cle, (bool, int, float)):
+        return _ENCODEUR.encode(_ENCODEUR.encode(cle))
+    raise ConversionError(f"Clé non représentable en JSON: {cle!r}")
+
+
+def _au_moins_un_document(evenements: Iterator[Evenement]) -> Iterator[Evenement]:
+    """Relayer les événements, ou un document `null` si le flux n'en a aucun."""
+    vide = True
+    for evenement in evenements:
+        vide = False
+        yield evenement
+    if vide:
+        yield DEBUT_DOCUMENT, None
+        yield SCALAIRE, None
+        yield FIN_DOCUMENT, None
+
+
+def ecrire_yaml(evenements: Iterator[Evenement], sortie: TextIO) -> None:
+    """Écrire les événements en YAML, comme `yaml.safe_dump_all(sort_keys=False, allow_unicode=True)`.
+    
+    Les scalaires passent par le représentant et le résolveur du dumper
+    (mêmes styles et guillemets); seuls les événements sont émis. Les fins
+    de document sont implicites: l'émetteur ajoute lui-même `---` et `...`
+    là où `yaml.safe_dump` les écrirait. Un flux vide donne `null`, comme
+    dans ecrire_json.
+    """
+    dumper = DumperYaml(sortie, default_flow_style=False, allow_unicode=True, sort_keys=False)
+    try:
+        dumper.open()
+        for type_evenement, valeur in _au_moins_un_document(evenements):
+            if type_evenement == DEBUT_DOCUMENT:
+                dumper.emit(yaml.DocumentStartEvent(explicit=False))
+            elif type_evenement == FIN_DOCUMENT:
+                dumper.emit(yaml.DocumentEndEvent(explicit=False))
+            elif type_evenement == SCALAIRE:
+                noeud = dumper.represent_data(valeur)
+                dumper.represented_objects.clear()
+                dumper.object_keeper.clear()
+                implicite = (
+                    noeud.tag == dumper.resolve(yaml.ScalarNode, noeud.value, (True, False)),
+                    noeud.tag == dumper.resolve(yaml.ScalarNode, noeud.value, (False, True)),
+                )
+                dumper.emit(yaml.ScalarEvent(None, noeud.tag, implicite, noeud.value, style=noeud.style))
+            elif type_evenement == DEBUT_OBJET:
+                dumper.emit(yaml.MappingStartEvent(None, _TAG_MAP, True, flow_style=False))
+            elif type_evenement == DEBUT_LISTE:
+                dumper.emit(yaml.SequenceStartEvent(None, _TAG_SEQ, True, flow_style=False))
+            elif type_evenement == FIN_OBJET:
+                dumper.emit(yaml.MappingEndEvent())
+            else:
+                dumper.emit(yaml.SequenceEndEvent())
+        dumper.close()
+    finally:
+        dumper.dispose()
@@ -1,10 +1,15 @@
 """Convertisseur pour documents."""
 
+import codecs
 import shutil
 import subprocess
 import tempfile
+import uuid
 from pathlib import Path
+import config
+import utils
 from converters.base import BaseConverter
+from converters.libreoffice_pool import get_libreoffice_pool
 from models import ConversionResult, ConversionError
 
 
@@ -34,6 +39,53 @@ class DocumentConverter(BaseConverter):
         **kwargs
     ) -> ConversionResult:
         """Convertir document vers un autre format."""
+        resultat = self.convert_many([input_bytes], source_format, target_format, txt_encoding=txt_encoding)[0]
+        if isinstance(resultat, ConversionError):
+            raise resultat
+        return resultat
+    
+    def convert_path(
+        self,
+        input_path: Path,
+        source_format: str,
+        target_format: str,
+        output_dir: Path,
+        txt_encoding: str = "utf-8",
+        **kwargs
+    ) -> ConversionResult:
+        """Convertir un document sur disque, sortie écrite dans `output_dir`."""
+        resultat = self.convert_many(
+            [input_path], source_format, target_format, txt_encoding=txt_encoding, output_dir=output_dir
+        )[0]
+        if isinstance(resultat, ConversionError):
+            raise resultat
+        return resultat
+    
+    def convert_many(
+        self,
+        inputs: list[bytes | Path],
+        source_format: str,
+        target_format: str,
+        txt_encoding: str = "utf-8",
+        output_dir: Path | None = None,
+    ) -> list[ConversionResult | ConversionError]:
+        """Convertir plusieurs documents de même format en un seul appel LibreOffice.
+        
+        Args:
+            inputs: Octets ou chemins des documents d'entrée (les chemins
+                sont liés dans le dossier de travail, sans être relus)
+            source_format: Format source commun
+            target_format: Format cible commun
+            txt_encoding: Encodage pour TXT
+            output_dir: Si fourni, les sorties y sont déplacées au lieu
+                d'être lues en mémoire (`ConversionResult.output_path`)
+        
+        Returns:
+            Un élément par document, dans l'ordre: ConversionResult ou ConversionError
+        
+        Raises:
+            ConversionError: Si la conversion elle-même est invalide (formats, encodage, LibreOffice absent)
+        """
         source = source_format.lower().strip()
         target = target_format.lower().strip()
         
@@ -44,47 +96,122 @@ class DocumentConverter(BaseConverter):
             raise ConversionError("Encodage TXT non supporté. Utilisez utf-8 ou latin-1.")
         
         libreoffice = self._get_libreoffice()
+        resultats: list[ConversionResult | ConversionError | None] = [None] * len(inputs)
         
         try:
-            with tempfile.TemporaryDirectory() as tmpdir:
+            if output_dir is not None:
+                output_dir.mkdir(parents=True, exist_ok=True)
+            # Dans output_dir: entrées liées et sorties déplacées sans copie
+            with tempfile.TemporaryDirectory(dir=output_dir) as tmpdir:
                 tmp_path = Path(tmpdir)
-                input_path = tmp_path / f"input.{source}"
+                sortie_dir = tmp_path / "sortie"
+                sortie_dir.mkdir()
                 
-                # Écrire le fichier d'entrée
-                if source == "txt":
-                    text = input_bytes.decode(txt_encoding)
-                    input_path.write_text(text, encoding=txt_encoding)
-                else:
-                    input_path.write_bytes(input_bytes)
+                # Écrire les fichiers d'entrée (input_<i>.<source>)
+                input_paths = {}
+                for index, entree in enumerate(inputs):
+                    input_path = tmp_path / f"input_{index}.{source}"
+                    try:
+                        if isinstance(entree, Path):
+                            if source == "txt":
+                                self._verifier_encodage(entree, txt_encoding)
+                            utils.link_or_copy(entree, input_path)
+                        elif source == "txt":
+                            text = entree.decode(txt_encoding)
+                            input_path.write_text(text, encoding=txt_encoding)
+                        else:
+                            input_path.write_bytes(entree)
+                    except UnicodeDecodeError:
+                        resultats[index] = ConversionError("Encodage TXT invalide pour le fichier source.")
+                        continue
+                    input_paths[index] = input_path
                 
-                # Exécuter LibreOffice
-                cmd = [
-                    libreoffice,
-                    "--headless",
-                    "--convert-to", target,
-                    "--outdir", str(tmp_path),
-                    str(input_path),
-                ]
-                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                self._executer_libreoffice(libreoffice, input_paths, target, sortie_dir, resultats)
                 
-                # Lire le fichier de sortie
-                output_path = tmp_path / f"input.{target}"
-                if not output_path.exists():
-                    raise ConversionError("LibreOffice n'a pas produit de fichier de sortie.")
-                
-                output_bytes = output_path.read_bytes()
-                
-                return ConversionResult(
-                    output_bytes=output_bytes,
-                    output_format=target,
-                    mimetype=self.MIMETYPE_MAP.get(target, "application/octet-stream")
-                )
-        except subprocess.CalledProcessError as e:
-            raise ConversionError("Échec de la conversion document via LibreOffice.") from e
-        except UnicodeDecodeError as e:
-            raise ConversionError("Encodage TXT invalide pour le fichier source.") from e
+                # Associer chaque sortie (input_<i>.<target>) à son entrée
+                for index in input_paths:
+                    if resultats[index] is not None:
+                        continue
+                    output_path = sortie_dir / f"input_{index}.{target}"
+                    if not output_path.exists():
+                        resultats[index] = ConversionError("LibreOffice n'a pas produit de fichier de sortie.")
+                        continue
+                    mimetype = self.MIMETYPE_MAP.get(target, "application/octet-stream")
+                    if output_dir is not None:
+                        destination = output_dir / f"{uuid.uuid4().hex}.{target}"
+                        output_path.replace(destination)
+                        resultats[index] = ConversionResult(b"", target, mimetype, output_path=destination)
+                        continue
+                    resultats[index] = ConversionResult(
+                        output_bytes=output_path.read_bytes(),
+                        output_format=target,
+                        mimetype=mimetype
+                    )
         except Exception as e:
-            raise ConversionError(f"Échec de la conversion document: {str(e)}") from e
+            erreur = ConversionError(f"Échec de la conversion document: {str(e)}")
+            resultats = [r if r is not None else erreur for r in resultats]
+        
+        return resultats
+    
+    @staticmethod
+    def _executer_libreoffice(
+        libreoffice: str,
+        input_paths: dict[int, Path],
+        target: str,
+        sortie_dir: Path,
+        resultats: list,
+    ) -> None:
+        """Lancer LibreOffice sur tous les fichiers, puis isoler les échecs.
+        
+        Si l'appel groupé échoue, chaque fichier est reconverti seul afin que
+        seule l'entrée fautive soit marquée en erreur.
+        """
+        if not input_paths:
+            return
+        
+        pool = get_libreoffice_pool()
+        try:
+            pool.convertir(
+                libreoffice,
+                list(input_paths.values()),
+                target,
+                sortie_dir,
+                timeout=config.LIBREOFFICE_TIMEOUT * len(input_paths),
+            )
+            return
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            if len(input_paths) == 1:
+                index = next(iter(input_paths))
+                resultats[index] = DocumentConverter._erreur_libreoffice(e)
+                return
+        
+        for index, input_path in input_paths.items():
+            if (sortie_dir / f"{input_path.stem}.{target}").exists():
+                continue
+            try:
+                pool.convertir(libreoffice, [input_path], target, sortie_dir, timeout=config.LIBREOFFICE_TIMEOUT)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                resultats[index] = DocumentConverter._erreur_libreoffice(e)
+    
+    @staticmethod
+    def _verifier_encodage(chemin: Path, txt_encoding: str) -> None:
+        """Vérifier l'encodage d'un fichier texte par blocs, sans le charger.
+        
+        Raises:
+            UnicodeDecodeError: Si le fichier n'est pas dans cet encodage
+        """
+        decodeur = codecs.getincrementaldecoder(txt_encoding)()
+        with chemin.open("rb") as fichier:
+            while bloc := fichier.read(1024 * 1024):
+                decodeur.decode(bloc)
+        decodeur.decode(b"", final=True)
+    
+    @staticmethod
+    def _erreur_libreoffice(erreur: Exception) -> ConversionError:
+        """Traduire un échec du processus LibreOffice en ConversionError."""
+        if isinstance(erreur, subprocess.TimeoutExpired):
+            return ConversionError("Délai dépassé pour la conversion document via LibreOffice.")
+        return ConversionError("Échec de la conversion document via LibreOffice.")
     
     @staticmethod
     def _get_libreoffice() -> str:
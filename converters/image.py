@@ -2,6 +2,7 @@
 
 from io import BytesIO
 from PIL import Image
+import config
 from converters.base import BaseConverter
 from models import ConversionResult, ConversionError
 
@@ -18,6 +19,27 @@ class ImageConverter(BaseConverter):
         "pdf": "application/pdf",
     }
     
+    ALIAS = {"jpeg": "jpg"}
+    
+    # Paramètres d'encodage par niveau (voir config.NIVEAUX_ENCODAGE)
+    PARAMETRES_NIVEAU = {
+        "fast": {
+            "jpg": {"quality": 80},
+            "webp": {"quality": 80, "method": 0},
+            "png": {"compress_level": 1},
+        },
+        "balanced": {
+            "jpg": {"quality": 85, "optimize": True},
+            "webp": {"quality": 85, "method": 4},
+            "png": {"compress_level": 6},
+        },
+        "max_compression": {
+            "jpg": {"quality": 85, "optimize": True, "progressive": True},
+            "webp": {"quality": 85, "method": 6},
+            "png": {"optimize": True},
+        },
+    }
+    
     def supports(self, source_format: str, target_format: str) -> bool:
         """Vérifier si la conversion est supportée."""
         source = source_format.lower().strip()
@@ -26,6 +48,15 @@ class ImageConverter(BaseConverter):
         target = "jpg" if target == "jpeg" else target
         return source in self.SUPPORTED_FORMATS and target in self.SUPPORTED_FORMATS
     
+    def conversions(self) -> set[tuple[str, str]]:
+        """Paires (source, cible) proposées.
+        
+        PDF n'est qu'un format de sortie. Une paire de même format sert à
+        redimensionner ou réencoder (options requises).
+        """
+        sources = self.SUPPORTED_FORMATS - {"pdf"}
+        return {(source, target) for source in sources for target in self.SUPPORTED_FORMATS}
+    
     def convert(
         self,
         input_bytes: bytes,
@@ -45,6 +76,9 @@ class ImageConverter(BaseConverter):
         try:
             # Charger l'image
             img = Image.open(BytesIO(input_bytes))
+            img = self._redimensionner(
+                img, kwargs.get("max_width"), kwargs.get("max_height"), kwargs.get("scale")
+            )
             
             # Gérer la transparence pour JPG
             if target == "jpg" and img.mode in ("RGBA", "LA", "P"):
@@ -56,18 +90,14 @@ class ImageConverter(BaseConverter):
             
             # Sauvegarder en octets
             output = BytesIO()
-            save_kwargs = {}
+            niveau = kwargs.get("tier") or config.NIVEAU_ENCODAGE_DEFAUT
+            save_kwargs = self.PARAMETRES_NIVEAU.get(niveau, self.PARAMETRES_NIVEAU["balanced"]).get(target, {})
             
             if target == "jpg":
-                save_kwargs["quality"] = 85
-                save_kwargs["optimize"] = True
                 img.save(output, format="JPEG", **save_kwargs)
             elif target == "webp":
-                save_kwargs["quality"] = 85
-                save_kwargs["method"] = 6
                 img.save(output, format="WEBP", **save_kwargs)
             elif target == "png":
-                save_kwargs["optimize"] = True
                 img.save(output, format="PNG", **save_kwargs)
             elif target == "pdf":
                 if img.mode in ("RGBA", "LA", "P"):
@@ -82,6 +112,42 @@ class ImageConverter(BaseConverter):
         except Exception as e:
             raise ConversionError(f"Échec de la conversion d'image: {str(e)}") from e
 
+    @staticmethod
+    def taille_cible(
+        taille: tuple[int, int],
+        max_width: int | None = None,
+        max_height: int | None = None,
+        scale: float | None = None,
+    ) -> tuple[int, int]:
+        """Calculer les dimensions de sortie (proportions conservées, jamais agrandies)."""
+        largeur, hauteur = taille
+        facteur = min(1.0, scale or 1.0)
+        if max_width:
+            facteur = min(facteur, max_width / largeur)
+        if max_height:
+            facteur = min(facteur, max_height / hauteur)
+        if facteur >= 1.0:
+            return taille
+        return max(1, round(largeur * facteur)), max(1, round(hauteur * facteur))
+    
+    def _redimensionner(
+        self,
+        img: Image.Image,
+        max_width: int | None,
+        max_height: int | None,
+        scale: float | None,
+    ) -> Image.Image:
+        """Réduire l'image selon les options, en décodant un JPEG directement à taille réduite."""
+        taille = self.taille_cible(img.size, max_width, max_height, scale)
+        if taille == img.size:
+            return img
+        
+        if img.format == "JPEG":
+            # Décodage DCT à 1/2, 1/4 ou 1/8: l'image pleine résolution n'est jamais décodée
+            img.draft(img.mode, taille)
+        # reducing_gap: réduction entière rapide (Image.reduce) avant le rééchantillonnage final
+        return img.resize(taille, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
 
 class SVGConverter(BaseConverter):
     """Convertit SVG en PNG."""
@@ -90,6 +156,10 @@ class SVGConverter(BaseConverter):
         """Vérifier si la conversion est supportée."""
         return source_format.lower().strip() == "svg" and target_format.lower().strip() == "png"
     
+    def conversions(self) -> set[tuple[str, str]]:
+        """Paires (source, cible) proposées."""
+        return {("svg", "png")}
+    
     def convert(
         self,
         input_bytes: bytes,
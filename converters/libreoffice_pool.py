@@ -0,0 +1,198 @@
+"""Pool d'instances LibreOffice pour les conversions de documents."""
+
+import logging
+import os
+import queue
+import shutil
+import signal
+import subprocess
+from pathlib import Path
+from threading import Lock
+
+import config
+from models import ConversionError
+
+logger = logging.getLogger(__name__)
+
+
+class _Instance:
+    """Une instance LibreOffice: un profil utilisateur isolé et son compteur."""
+    
+    def __init__(self, index: int, rep_profil: Path):
+        self.index = index
+        self.rep_profil = rep_profil
+        self.conversions = 0
+        self.prete = False
+    
+    @property
+    def option_profil(self) -> str:
+        """Option `-env:UserInstallation` pointant vers le profil de l'instance."""
+        return f"-env:UserInstallation={self.rep_profil.resolve().as_uri()}"
+
+
+class LibreOfficePool:
+    """Distribue les conversions sur un ensemble d'instances LibreOffice.
+    
+    Une instance n'est pas un processus résident: chaque conversion lance
+    toujours `soffice --convert-to`. Le pool borne le nombre de conversions
+    simultanées et donne à chaque instance son propre `UserInstallation`,
+    créé une fois puis réutilisé, pour que des conversions simultanées ne se
+    disputent pas le verrou d'un même profil. Les profils sont propres au
+    processus (`processus_<pid>/instance_<n>`): deux workers gunicorn ou deux
+    processus de lot n'utilisent jamais le même. Une instance est recyclée
+    (profil supprimé puis recréé) après `max_conversions` conversions ou
+    après un échec (plantage, dépassement de délai). Une conversion attend
+    au plus `attente_max` secondes qu'une instance se libère.
+    """
+    
+    def __init__(self, taille: int, rep_profils: Path, max_conversions: int, attente_max: float = 300):
+        self.pid = os.getpid()
+        self._max_conversions = max(1, max_conversions)
+        self._attente_max = attente_max
+        self._purger_orphelins(rep_profils)
+        self._instances: queue.Queue[_Instance] = queue.Queue()
+        for index in range(max(1, taille)):
+            self._instances.put(_Instance(index, rep_profils / f"processus_{self.pid}" / f"instance_{index}"))
+    
+    def convertir(
+        self,
+        libreoffice: str,
+        input_paths: list[Path],
+        target_format: str,
+        outdir: Path,
+        timeout: int,
+    ) -> None:
+        """Convertir des fichiers avec une instance libre du pool.
+        
+        Args:
+            libreoffice: Chemin de l'exécutable soffice
+            input_paths: Fichiers à convertir (une seule invocation)
+            target_format: Format cible (`--convert-to`)
+            outdir: Dossier de sortie
+            timeout: Délai maximal en secondes
+        
+        Raises:
+            ConversionError: Si aucune instance ne se libère à temps
+            subprocess.CalledProcessError: Si LibreOffice échoue
+            subprocess.TimeoutExpired: Si le délai est dépassé
+        """
+        try:
+            instance = self._instances.get(timeout=self._attente_max)
+        except queue.Empty:
+            raise ConversionError("Toutes les instances LibreOffice sont occupées: réessayez plus tard.") from None
+        try:
+            if not instance.prete:
+                self._preparer(libreoffice, instance, timeout)
+            
+            cmd = [
+                libreoffice,
+                instance.option_profil,
+                "--headless",
+                "--norestore",
+                "--convert-to", target_format,
+                "--outdir", str(outdir),
+                *[str(path) for path in input_paths],
+            ]
+            try:
+                self._executer(cmd, timeout)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+                self._recycler(instance)
+                raise
+            
+            # Une conversion réussie complète le profil si sa création avait échoué
+            instance.prete = True
+            instance.conversions += 1
+            if instance.conversions >= self._max_conversions:
+                self._recycler(instance)
+        finally:
+            self._instances.put(instance)
+    
+    def _preparer(self, libreoffice: str, instance: _Instance, timeout: int) -> None:
+        """Créer le profil de l'instance (démarrage à froid, une seule fois).
+        
+        En cas d'échec, l'instance reste non prête: la création est retentée
+        à la conversion suivante, sauf si celle-ci réussit et complète le profil.
+        """
+        instance.rep_profil.mkdir(parents=True, exist_ok=True)
+        cmd = [
+            libreoffice,
+            instance.option_profil,
+            "--headless",
+            "--norestore",
+            "--terminate_after_init",
+        ]
+        try:
+            self._executer(cmd, timeout)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            logger.warning("Création du profil LibreOffice %s impossible: %s", instance.rep_profil, e)
+            return
+        instance.prete = True
+    
+    @staticmethod
+    def _purger_orphelins(rep_profils: Path) -> None:
+        """Supprimer les profils laissés par des processus terminés."""
+        if not rep_profils.exists():
+            return
+        
+        for rep in rep_profils.glob("processus_*"):
+            pid = rep.name.removeprefix("processus_")
+            if not pid.isdigit() or int(pid) == os.getpid():
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                shutil.rmtree(rep, ignore_errors=True)
+            except PermissionError:
+                # Processus vivant d'un autre utilisateur
+                continue
+    
+    @staticmethod
+    def _recycler(instance: _Instance) -> None:
+        """Réinitialiser le profil d'une instance."""
+        shutil.rmtree(instance.rep_profil, ignore_errors=True)
+        instance.conversions = 0
+        instance.prete = False
+    
+    @staticmethod
+    def _executer(cmd: list[str], timeout: int) -> None:
+        """Exécuter LibreOffice dans son propre groupe de processus.
+        
+        `soffice` est souvent un script qui lance `soffice.bin`: en cas de
+        dépassement de délai, tout le groupe est tué pour ne pas laisser
+        d'instance orpheline qui verrouillerait le profil.
+        """
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            process.wait()
+            raise
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+
+_pool: LibreOfficePool | None = None
+_pool_lock = Lock()
+
+
+def get_libreoffice_pool() -> LibreOfficePool:
+    """Obtenir le pool LibreOffice du processus (créé au premier usage, recréé après un fork)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = LibreOfficePool(
+                taille=config.LIBREOFFICE_POOL_TAILLE,
+                rep_profils=config.REP_LIBREOFFICE_PROFILS,
+                max_conversions=config.LIBREOFFICE_MAX_CONVERSIONS,
+                attente_max=config.LIBREOFFICE_ATTENTE_MAX,
+            )
+        return _pool
@@ -0,0 +1,128 @@
+"""Registre des convertisseurs: table de dispatch construite une seule fois."""
+
+from converters.base import BaseConverter
+from models import ConversionError
+
+
+# Libellés des types de conversion dans les messages d'erreur
+LIBELLES_TYPES = {
+    "data": "les données",
+    "image": "les images",
+    "audio": "l'audio",
+    "document": "les documents",
+}
+
+
+def _enumerer(formats) -> str:
+    """Liste lisible de formats: « JSON, NDJSON ou YAML »."""
+    noms = sorted(fmt.upper() for fmt in formats)
+    if len(noms) == 1:
+        return noms[0]
+    return f"{', '.join(noms[:-1])} ou {noms[-1]}"
+
+
+class ConverterRegistry:
+    """Table (type, source, cible) → convertisseur.
+    
+    Construite au démarrage à partir des paires déclarées par chaque
+    convertisseur (`BaseConverter.conversions`) et de ses alias
+    d'extension. Les convertisseurs sont des instances uniques partagées:
+    ils ne gardent aucun état d'une conversion à l'autre. Obtenir un
+    convertisseur revient à une recherche dans un dictionnaire.
+    """
+    
+    def __init__(self, convertisseurs: dict[str, list[BaseConverter]]):
+        self._table: dict[tuple[str, str, str], BaseConverter] = {}
+        self._alias: dict[str, dict[str, str]] = {}
+        
+        for conversion_type, instances in convertisseurs.items():
+            alias = self._alias.setdefault(conversion_type, {})
+            for converter in instances:
+                alias.update(converter.ALIAS)
+                for source, target in converter.conversions():
+                    # Le premier convertisseur déclaré pour une paire l'emporte
+                    self._table.setdefault((conversion_type, source, target), converter)
+        
+        self._matrice = self._construire_matrice()
+    
+    def normalize(self, conversion_type: str, fmt: str) -> str:
+        """Format canonique d'une extension (ex: jpeg → jpg, yml → yaml)."""
+        fmt = fmt.lower().strip()
+        return self._alias.get(conversion_type, {}).get(fmt, fmt)
+    
+    def get(self, conversion_type: str, source_format: str, target_format: str) -> BaseConverter:
+        """Obtenir le convertisseur d'une paire.
+        
+        Raises:
+            ConversionError: Si la conversion n'est pas proposée
+        """
+        return self.resolve(conversion_type, source_format, target_format)[0]
+    
+    def resolve(
+        self,
+        conversion_type: str,
+        source_format: str,
+        target_format: str,
+    ) -> tuple[BaseConverter, str, str]:
+        """Obtenir le convertisseur et les formats canoniques d'une paire.
+        
+        Returns:
+            (convertisseur, format source, format cible)
+        
+        Raises:
+            ConversionError: Si la conversion n'est pas proposée (message
+                indiquant les formats possibles)
+        """
+        source = self.normalize(conversion_type, source_format)
+        target = self.normalize(conversion_type, target_format)
+        
+        converter = self._table.get((conversion_type, source, target))
+        if converter is None:
+            raise self._erreur(conversion_type, source, target)
+        return converter, source, target
+    
+    def capabilities(self) -> dict:
+        """Matrice des conversions proposées, par type.
+        
+        Pour chaque type: `conversions` (format source → formats cibles)
+        et `aliases` (extension → format canonique).
+        """
+        return {
+            conversion_type: {
+                "conversions": {source: list(cibles) for source, cibles in capacites["conversions"].items()},
+                "aliases": dict(capacites["aliases"]),
+            }
+            for conversion_type, capacites in self._matrice.items()
+        }
+    
+    def _construire_matrice(self) -> dict:
+        """Calculer la matrice des capacités (formats triés)."""
+        matrice = {
+            conversion_type: {"conversions": {}, "aliases": dict(sorted(alias.items()))}
+            for conversion_type, alias in self._alias.items()
+        }
+        for conversion_type, source, target in sorted(self._table):
+            matrice[conversion_type]["conversions"].setdefault(source, []).append(target)
+        return matrice
+    
+    def _erreur(self, conversion_type: str, source: str, target: str) -> ConversionError:
+        """Erreur décrivant pourquoi une paire n'est pas proposée."""
+        if conversion_type not in self._matrice:
+            return ConversionError(f"Type de conversion inconnu: {conversion_type}")
+        
+        if source == target:
+            return ConversionError(f"Le fichier est déjà au format {target.upper()}.")
+        
+        conversions = self._matrice[conversion_type]["conversions"]
+        libelle = LIBELLES_TYPES.get(conversion_type, conversion_type)
+        if source not in conversions:
+            return ConversionError(f"Format source non supporté pour {libelle} ({_enumerer(conversions)}).")
+        
+        cibles = {cible for liste in conversions.values() for cible in liste}
+        if target not in cibles:
+            return ConversionError(f"Format de sortie invalide pour {libelle} ({_enumerer(cibles)}).")
+        
+        possibles = [cible for cible in conversions[source] if cible != source]
+        if len(possibles) == 1:
+            return ConversionError(f"Pour les {source.upper()}, seul le format {possibles[0].upper()} est supporté.")
+        return ConversionError(f"Pour les {source.upper()}, seuls les formats {_enumerer(possibles)} sont supportés.")
@@ -1,5 +1,6 @@
 """Modèles de données pour le projet."""
 
+from pathlib import Path
 from typing import Any
 from dataclasses import dataclass, field, asdict
 from datetime import datetime, timezone
@@ -10,6 +11,14 @@ class ConversionError(Exception):
     pass
 
 
+class UploadError(ConversionError):
+    """Erreur d'un envoi fractionné, avec le code HTTP à renvoyer."""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
 @dataclass
 class Job:
     """Représente un travail de conversion."""
@@ -26,11 +35,13 @@ class Job:
     api_output_path: str = ""
     api_output_name: str = ""
     api_output_mimetype: str = ""
-
+    # SHA-256 du fichier de sortie: ETag fort des téléchargements
+    api_output_sha256: str = ""
+    
     def to_dict(self) -> dict[str, Any]:
         """Convertir en dictionnaire."""
         return asdict(self)
-
+    
     @staticmethod
     def from_dict(data: dict) -> "Job":
         """Créer depuis un dictionnaire."""
@@ -44,7 +55,8 @@ class Profile:
     name: str
     source: str
     target: str
-
+    options: dict[str, Any] = field(default_factory=dict)
+    
     def to_dict(self) -> dict[str, Any]:
         """Convertir en dictionnaire."""
         return asdict(self)
@@ -64,7 +76,7 @@ class HistoryEntry:
     success_count: int
     error_count: int
     status: str
-
+    
     def to_dict(self) -> dict[str, Any]:
         """Convertir en dictionnaire."""
         return asdict(self)
@@ -72,7 +84,12 @@ class HistoryEntry:
 
 @dataclass
 class ConversionResult:
-    """Résultat d'une conversion unique."""
+    """Résultat d'une conversion unique.
+    
+    Une conversion par chemin (`convert_path`) peut écrire sa sortie sur
+    disque: `output_path` est alors renseigné et `output_bytes` est vide.
+    """
     output_bytes: bytes
     output_format: str
     mimetype: str
+    output_path: Path | None = None
@@ -1,17 +1,32 @@
 """Routes API."""
 
-import zipfile
+import hashlib
+import itertools
+import json
+import shutil
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Generator
 from werkzeug.utils import secure_filename
-from flask import Blueprint, request, jsonify, send_file, url_for
+from flask import Blueprint, Response, request, jsonify, send_file, url_for
 
-from models import ConversionError
+from models import ConversionError, UploadError
 import config
+import converters
 import utils
-from services import JobService, HistoryService, ProfileService, ConversionService
+from services import JobService, HistoryService, ProfileService, ConversionService, ZipStreamWriter
 
 # Importer les instances partagées du conteneur
-from services.services_container import job_service, history_service, profile_service, conversion_service
+from services.services_container import (
+    job_service,
+    history_service,
+    profile_service,
+    conversion_service,
+    cache_service,
+    upload_service,
+)
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
@@ -39,8 +54,100 @@ def get_jobs():
     if not is_valid:
         return error
     
-    jobs = job_service.get_recent_jobs(limit=30)
-    return jsonify([job.to_dict() for job in jobs])
+    since = request.args.get("since", "").strip()
+    if since and not since.isdigit():
+        return jsonify({"error": "Le paramètre since est invalide."}), 400
+    
+    status = request.args.get("status", "").lower().strip()
+    conversion_type = request.args.get("type", "").lower().strip()
+    if since and (status or conversion_type):
+        # Un job sorti du filtre n'apparaîtrait pas dans le delta: le client ne le verrait jamais changer
+        return jsonify({"error": "Le paramètre since ne se combine pas avec status ou type."}), 400
+    
+    etag = f"jobs-{job_service.epoque}-{job_service.sequence}"
+    if request.if_none_match.contains(etag):
+        return _non_modifie(etag)
+    
+    if since and int(since) <= job_service.sequence:
+        # Delta: seuls les jobs modifiés après la version du client
+        jobs, sequence = job_service.changes_since(int(since))
+    else:
+        jobs, sequence = job_service.snapshot(limit=30, status=status, conversion_type=conversion_type)
+    
+    return _versionner(jsonify(jobs), f"jobs-{job_service.epoque}-{sequence}", sequence)
+
+
+@api_bp.route("/jobs/stream", methods=["GET"])
+def stream_jobs():
+    """Diffuser les changements de jobs en Server-Sent Events.
+    
+    Sans `Last-Event-ID` (ou si l'id est inconnu), un événement `snapshot`
+    donne les jobs récents; ensuite chaque événement `jobs` ne contient que
+    les jobs modifiés. L'id de chaque événement est `<époque>:<séquence>`
+    (séquence du dernier changement inclus), ce qui permet à EventSource de
+    reprendre après une reconnexion. Un id d'une autre époque (redémarrage,
+    autre worker avec le store mémoire) donne un nouveau snapshot: sa
+    séquence ne se compare pas à celle du store courant. Le flux se termine après `SSE_DUREE_MAX` secondes (le
+    navigateur se reconnecte seul) pour ne pas monopoliser un worker.
+    """
+    is_valid, error = check_api_key()
+    if not is_valid:
+        return error
+    
+    epoque = job_service.epoque
+    epoque_client, _, dernier_id = request.headers.get("Last-Event-ID", "").strip().partition(":")
+    
+    def generer():
+        debut = time.monotonic()
+        yield f"retry: {config.SSE_RETRY_MS}\n\n"
+        
+        if epoque_client == epoque and dernier_id.isdigit() and int(dernier_id) <= job_service.sequence:
+            sequence = int(dernier_id)
+        else:
+            jobs, sequence = job_service.snapshot(limit=30)
+            yield _evenement_sse("snapshot", jobs, epoque, sequence)
+        
+        while True:
+            restant = config.SSE_DUREE_MAX - (time.monotonic() - debut)
+            if restant <= 0:
+                return
+            jobs, sequence_courante = job_service.wait_for_changes(
+                sequence, timeout=min(config.SSE_HEARTBEAT, restant)
+            )
+            if jobs:
+                yield _evenement_sse("jobs", jobs, epoque, sequence_courante)
+            else:
+                # Commentaire SSE: garde la connexion ouverte à travers les proxys
+                yield ": ping\n\n"
+            sequence = sequence_courante
+    
+    return Response(
+        generer(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _evenement_sse(nom: str, donnees, epoque: str, sequence: int) -> str:
+    """Formater un événement Server-Sent Events (id `<époque>:<séquence>`)."""
+    return f"id: {epoque}:{sequence}\nevent: {nom}\ndata: {json.dumps(donnees, ensure_ascii=False)}\n\n"
+
+
+def _non_modifie(etag: str) -> Response:
+    """Réponse 304: le client a déjà cette version, rien n'est sérialisé."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def _versionner(response: Response, etag: str, version: int) -> Response:
+    """Ajouter l'ETag et la version d'une ressource à une réponse JSON."""
+    response.set_etag(etag)
+    response.headers["X-Version"] = str(version)
+    # Le navigateur peut garder la réponse mais doit la revalider à chaque requête
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @api_bp.route("/jobs/<job_id>", methods=["GET"])
@@ -50,11 +157,19 @@ def get_job_status(job_id: str):
     if not is_valid:
         return error
     
+    version = job_service.get_job_version(job_id)
+    if version is None:
+        return jsonify({"error": "Job introuvable."}), 404
+    
+    etag = f"job-{job_service.epoque}-{version}"
+    if request.if_none_match.contains(etag):
+        return _non_modifie(etag)
+    
     job = job_service.get_job(job_id)
     if not job:
         return jsonify({"error": "Job introuvable."}), 404
     
-    return jsonify(job.to_dict())
+    return _versionner(jsonify(job.to_dict()), etag, version)
 
 
 @api_bp.route("/jobs/<job_id>/preview", methods=["GET"])
@@ -67,10 +182,40 @@ def get_job_preview(job_id: str):
     if not job.api_output_path:
         return jsonify({"error": "Pas de fichier de sortie pour ce job."}), 404
     
-    preview = utils.generate_preview(Path(job.api_output_path))
+    file_path = Path(job.api_output_path)
+    if file_path.suffix.lower() in utils.EXTENSIONS_VIGNETTE and file_path.exists():
+        # Pas d'image en base64 dans le JSON: l'aperçu pointe vers la miniature
+        return jsonify({
+            "type": "image",
+            "url": url_for("api.get_job_thumbnail", job_id=job_id, _external=False),
+            "size": file_path.stat().st_size,
+        })
+    
+    preview = utils.generate_preview(file_path)
     return jsonify(preview)
 
 
+@api_bp.route("/jobs/<job_id>/thumbnail", methods=["GET"])
+def get_job_thumbnail(job_id: str):
+    """Obtenir la miniature WebP de la sortie image d'un job (générée une fois, puis en cache)."""
+    job = job_service.get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job introuvable."}), 404
+    
+    if not job.api_output_path:
+        return jsonify({"error": "Pas de fichier de sortie pour ce job."}), 404
+    
+    vignette = utils.ensure_thumbnail(Path(job.api_output_path))
+    if vignette is None:
+        return jsonify({"error": "Pas de miniature pour ce fichier."}), 404
+    
+    # La sortie d'un job ne change plus: le navigateur peut garder la miniature
+    response = send_file(vignette, mimetype="image/webp", conditional=True, max_age=config.VIGNETTE_MAX_AGE)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+
 @api_bp.route("/jobs/<job_id>/download", methods=["GET"])
 def download_job(job_id: str):
     """Télécharger le fichier de sortie d'un job."""
@@ -85,13 +230,25 @@ def download_job(job_id: str):
     if not job.api_output_path or not Path(job.api_output_path).exists():
         return jsonify({"error": "Aucune sortie disponible pour ce job."}), 404
     
+    # conditional: Range / If-Range (206), If-None-Match (304) gérés par Werkzeug
     file_path = Path(job.api_output_path)
-    return send_file(
+    response = send_file(
         file_path,
         as_attachment=True,
         download_name=job.api_output_name or file_path.name,
-        mimetype=job.api_output_mimetype or "application/octet-stream"
+        mimetype=job.api_output_mimetype or "application/octet-stream",
+        conditional=True,
+        etag=job.api_output_sha256 or True,
+        max_age=config.TELECHARGEMENT_MAX_AGE if job.api_output_sha256 else None,
     )
+    if job.api_output_sha256:
+        # Sortie terminée, identifiée par son contenu: elle ne changera plus
+        response.cache_control.immutable = True
+        if config.CLE_API:
+            # Un proxy partagé ne doit pas servir la sortie sans authentification
+            response.cache_control.public = False
+            response.cache_control.private = True
+    return response
 
 
 @api_bp.route("/history", methods=["GET"])
@@ -106,7 +263,80 @@ def get_history():
     except ValueError:
         return jsonify({"error": "Le paramètre limit doit être un entier."}), 400
     
-    return jsonify(history_service.get_recent(limit))
+    cursor = request.args.get("cursor", "").strip()
+    if cursor and not cursor.isdigit():
+        return jsonify({"error": "Le paramètre cursor est invalide."}), 400
+    
+    since = request.args.get("since", "").strip()
+    if since and not since.isdigit():
+        return jsonify({"error": "Le paramètre since est invalide."}), 400
+    
+    # Lue avant la requête: une entrée ajoutée entre-temps sera revue au prochain appel
+    version = history_service.version
+    etag = f"history-{history_service.epoque}-{version}"
+    if request.if_none_match.contains(etag):
+        return _non_modifie(etag)
+    
+    try:
+        date_from = _parse_date_filtre(request.args.get("from", ""))
+        date_to = _parse_date_filtre(request.args.get("to", ""), fin=True)
+    except ValueError:
+        return jsonify({"error": "Les paramètres from et to doivent être des dates ISO 8601."}), 400
+    
+    filtres = {
+        "type": request.args.get("type", "").lower().strip(),
+        "status": request.args.get("status", "").lower().strip(),
+        "target_format": request.args.get("target_format", "").lower().strip(),
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    entries, next_cursor = history_service.query(
+        limit,
+        cursor=int(cursor) if cursor else None,
+        filtres=filtres,
+        since=int(since) if since else None,
+    )
+    
+    response = _versionner(jsonify(entries), etag, version)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return response
+
+
+def _parse_date_filtre(valeur: str, fin: bool = False) -> str:
+    """Normaliser une date de filtre au format des entrées (ISO 8601, UTC).
+    
+    Une date sans heure couvre toute la journée: `to=2026-04-01` inclut le 1er avril.
+    
+    Raises:
+        ValueError: Si la date est invalide
+    """
+    valeur = valeur.strip()
+    if not valeur:
+        return ""
+    
+    date = datetime.fromisoformat(valeur)
+    if fin and len(valeur) == 10:
+        date += timedelta(days=1)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc).isoformat()
+
+
+@api_bp.route("/cache", methods=["GET"])
+def get_cache_stats():
+    """Obtenir les statistiques du cache de conversion."""
+    is_valid, error = check_api_key()
+    if not is_valid:
+        return error
+    
+    return jsonify({"enabled": config.CACHE_ACTIF, **cache_service.stats()})
+
+
+@api_bp.route("/capabilities", methods=["GET"])
+def get_capabilities():
+    """Obtenir la matrice des conversions proposées (pour valider une demande côté client)."""
+    return jsonify(converters.registry.capabilities())
 
 
 @api_bp.route("/profiles", methods=["GET"])
@@ -142,7 +372,8 @@ def add_profile():
         if conversion_type not in config.FORMATS_CIBLES_AUTORISES:
             return jsonify({"error": "Type de conversion invalide."}), 400
         
-        new_profile = profile_service.add_profile(conversion_type, name, source, target)
+        options = utils.parse_conversion_options(conversion_type, data.get("options") or {})
+        new_profile = profile_service.add_profile(conversion_type, name, source, target, options)
         return jsonify(new_profile), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -166,6 +397,120 @@ def delete_profile(conversion_type: str, profile_id: str):
         return jsonify({"error": "Profil introuvable."}), 404
 
 
+@api_bp.route("/uploads", methods=["POST"])
+def create_upload():
+    """Créer un envoi fractionné (reprise possible).
+    
+    Corps JSON: filename, size (octets), mimetype (optionnel).
+    """
+    is_valid, error = check_api_key()
+    if not is_valid:
+        return error
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        size = int(data.get("size", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Paramètre size invalide."}), 400
+    
+    try:
+        etat = upload_service.create(str(data.get("filename", "")), size, str(data.get("mimetype", "")))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    
+    upload_url = url_for("api.upload_chunk", upload_id=etat["upload_id"], _external=False)
+    return jsonify({**etat, "upload_url": upload_url}), 201, {"Location": upload_url}
+
+
+@api_bp.route("/uploads/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id: str):
+    """Recevoir un fragment: en-tête `Content-Range: bytes début-fin/total` (fin incluse).
+    
+    L'en-tête optionnel `X-Chunk-Sha256` est vérifié avant d'enregistrer le fragment.
+    """
+    is_valid, error = check_api_key()
+    if not is_valid:
+        return error
+    
+    plage = request.headers.get("Content-Range", "")
+    try:
+        unite, _, reste = plage.partition(" ")
+        bornes, _, total = reste.partition("/")
+        debut, _, fin = bornes.partition("-")
+        debut, fin = int(debut), int(fin)
+        if unite != "bytes" or fin < debut:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "En-tête Content-Range invalide (attendu: bytes début-fin/total)."}), 400
+    
+    try:
+        if total not in {"*", str(upload_service.status(upload_id)["size"])}:
+            raise UploadError("Taille totale différente de celle annoncée à la création.", 416)
+        etat = upload_service.write_chunk(
+            upload_id,
+            debut,
+            fin - debut + 1,
+            request.stream,
+            request.headers.get("X-Chunk-Sha256", ""),
+        )
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    
+    return jsonify(etat)
+
+
+@api_bp.route("/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id: str):
+    """Obtenir l'état d'un envoi (plages reçues) pour reprendre un envoi interrompu."""
+    is_valid, error = check_api_key()
+    if not is_valid:
+        return error
+    
+    try:
+        return jsonify(upload_service.status(upload_id))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+
+@api_bp.route("/uploads/<upload_id>/complete", methods=["POST"])
+def complete_upload(upload_id: str):
+    """Terminer un envoi (corps JSON optionnel: sha256 du fichier complet)."""
+    is_valid, error = check_api_key()
+    if not is_valid:
+        return error
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(upload_service.finalize(upload_id, str(data.get("sha256", ""))))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+
+@api_bp.route("/uploads/<upload_id>", methods=["DELETE"])
+def delete_upload(upload_id: str):
+    """Abandonner un envoi."""
+    is_valid, error = check_api_key()
+    if not is_valid:
+        return error
+    
+    try:
+        supprime = upload_service.delete(upload_id)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    
+    if supprime:
+        return jsonify({"message": "Envoi supprimé."}), 200
+    return jsonify({"error": "Envoi introuvable."}), 404
+
+
+def _demande_async() -> bool:
+    """Déterminer si la conversion doit être exécutée en arrière-plan."""
+    valeur = request.form.get("async", "").lower().strip()
+    if not valeur:
+        return config.API_ASYNC_PAR_DEFAUT
+    return valeur in {"1", "true", "oui"}
+
+
 @api_bp.route("/convert", methods=["POST"])
 def convert():
     """Convertir des fichiers (API)."""
@@ -177,12 +522,22 @@ def convert():
     conversion_type = request.form.get("conversion_type", "data").lower().strip()
     txt_encoding = request.form.get("txt_encoding", "utf-8").lower().strip()
     files = [f for f in request.files.getlist("file") if f and f.filename]
+    upload_ids = [valeur.strip() for valeur in request.form.getlist("upload_id") if valeur.strip()]
     
-    if not files:
+    if not files and not upload_ids:
         return jsonify({"error": "Aucun fichier sélectionné."}), 400
     
-    # Valider la requête
+    # Valider la requête; un profil fournit le format cible et des options par défaut
     try:
+        options = {}
+        profile_id = request.form.get("profile_id", "").strip()
+        if profile_id:
+            profil = profile_service.get_profile(profile_id, conversion_type)
+            if profil is None:
+                raise ConversionError("Profil introuvable pour ce type de conversion.")
+            target_format = target_format or profil.get("target", "")
+            options = utils.parse_conversion_options(conversion_type, profil.get("options") or {})
+        options.update(utils.parse_conversion_options(conversion_type, request.form))
         utils.validate_conversion_request(conversion_type, target_format)
     except ConversionError as e:
         return jsonify({"error": str(e)}), 400
@@ -192,48 +547,237 @@ def convert():
     if total_size > config.TAILLE_MAX_GLOBALE:
         return jsonify({"error": "Taille totale des fichiers au-delà de la limite autorisée."}), 413
     
+    # Lire les fichiers tant que la requête est active (les flux sont fermés ensuite);
+    # au-delà de SEUIL_SPOOL ils sont déposés sur disque et supprimés après conversion
+    # Les envois fractionnés terminés ne sont pas comptés dans TAILLE_MAX_GLOBALE
+    # (leur limite est ENVOI_TAILLE_MAX): ils sont vérifiés avant d'être retirés
+    try:
+        for upload_id in upload_ids:
+            if not upload_service.status(upload_id)["finalized"]:
+                raise UploadError("Envoi non terminé: appelez d'abord /complete.", 409)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    
+    uploads = [
+        (secure_filename(file.filename or ""), utils.spool_upload(file), file.mimetype or "")
+        for file in files
+    ]
+    try:
+        for upload_id in upload_ids:
+            uploads.append(upload_service.take(upload_id))
+            total_size += utils.input_size(uploads[-1][1])
+    except UploadError as e:
+        utils.delete_spooled(*(donnees for _, donnees, _ in uploads))
+        return jsonify({"error": str(e)}), e.status_code
+    
     # Créer un job
-    job_id = job_service.create_job(conversion_type, target_format, len(files))
+    job_id = job_service.create_job(conversion_type, target_format, len(uploads))
+    status_url = url_for("api.get_job_status", job_id=job_id, _external=False)
+    download_url = url_for("api.download_job", job_id=job_id, _external=False)
+    
+    if _demande_async():
+        try:
+            job_service.submit(
+                job_id,
+                _executer_conversion_api,
+                job_id,
+                conversion_type,
+                target_format,
+                txt_encoding,
+                uploads,
+                total_size,
+                options,
+            )
+        except ConversionError as e:
+            utils.delete_spooled(*(donnees for _, donnees, _ in uploads))
+            job_service.update_job(job_id, status="erreur", message=str(e))
+            return jsonify({"job_id": job_id, "error": str(e)}), 503
+        
+        return jsonify({
+            "job_id": job_id,
+            "status": "en_attente",
+            "status_url": status_url,
+            "download_url": download_url,
+        }), 202
+    
     job_service.update_job(job_id, status="en_cours")
     
-    outputs = []
+    if request.form.get("stream", "").lower().strip() in {"1", "true", "oui"}:
+        return _reponse_flux(
+            job_id, conversion_type, target_format, txt_encoding, uploads, total_size, status_url, options
+        )
+    
+    try:
+        resultat = _executer_conversion_api(
+            job_id, conversion_type, target_format, txt_encoding, uploads, total_size, options
+        )
+    except Exception:
+        return jsonify({"error": "Une erreur inattendue est survenue."}), 500
+    
+    if resultat["success_count"] == 0:
+        return jsonify({
+            "job_id": job_id,
+            "status": "erreur",
+            "errors": resultat["errors"],
+            "status_url": status_url,
+        }), 400
+    
+    return jsonify({
+        "job_id": job_id,
+        **resultat,
+        "status_url": status_url,
+        "download_url": download_url,
+    }), 201
+
+
+def _reponse_flux(
+    job_id: str,
+    conversion_type: str,
+    target_format: str,
+    txt_encoding: str,
+    uploads: list[tuple[str, bytes | Path, str]],
+    total_size: int,
+    status_url: str,
+    options: dict | None = None,
+):
+    """Répondre directement avec la sortie, le ZIP étant diffusé pendant la conversion."""
+    flux = _iter_conversion_api(
+        job_id, conversion_type, target_format, txt_encoding, uploads, total_size, options
+    )
+    try:
+        premier_morceau = next(flux)
+    except StopIteration as fin:
+        # Pas de ZIP: échec complet ou fichier unique déjà sur disque
+        resultat = fin.value
+        if resultat["success_count"] == 0:
+            return jsonify({
+                "job_id": job_id,
+                "status": "erreur",
+                "errors": resultat["errors"],
+                "status_url": status_url,
+            }), 400
+        job = job_service.get_job(job_id)
+        return send_file(
+            Path(job.api_output_path),
+            as_attachment=True,
+            download_name=job.api_output_name,
+            mimetype=job.api_output_mimetype,
+        )
+    except Exception:
+        return jsonify({"error": "Une erreur inattendue est survenue."}), 500
+    
+    response = Response(
+        itertools.chain([premier_morceau], flux),
+        mimetype="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename=api_batch_{job_id[:8]}.zip",
+            "X-Job-Id": job_id,
+        },
+    )
+    # `flux` est déjà démarré: le fermer clôture le job et supprime les dépôts,
+    # même si le client se déconnecte avant la première lecture de la réponse
+    response.call_on_close(flux.close)
+    return response
+
+
+def _executer_conversion_api(
+    job_id: str,
+    conversion_type: str,
+    target_format: str,
+    txt_encoding: str,
+    uploads: list[tuple[str, bytes | Path, str]],
+    total_size: int,
+    options: dict | None = None,
+) -> dict:
+    """Convertir un lot API et mettre à jour le job et l'historique.
+    
+    Utilisable dans la requête (mode synchrone) ou dans un worker du
+    `JobService` (mode asynchrone): aucune dépendance au contexte Flask.
+    
+    Args:
+        job_id: ID du job
+        conversion_type: Type de conversion
+        target_format: Format cible
+        txt_encoding: Encodage pour TXT
+        uploads: Tuples (nom_fichier, octets ou chemin déposé, mimetype)
+        total_size: Taille totale du lot
+        options: Options du convertisseur (voir utils.parse_conversion_options)
+    
+    Returns:
+        Résumé (status, success_count, error_count, errors)
+    
+    Raises:
+        Exception: En cas d'erreur inattendue (job et historique déjà mis à jour)
+    """
+    flux = _iter_conversion_api(
+        job_id, conversion_type, target_format, txt_encoding, uploads, total_size, options
+    )
+    while True:
+        try:
+            next(flux)
+        except StopIteration as fin:
+            return fin.value
+
+
+def _iter_conversion_api(
+    job_id: str,
+    conversion_type: str,
+    target_format: str,
+    txt_encoding: str,
+    uploads: list[tuple[str, bytes | Path, str]],
+    total_size: int,
+    options: dict | None = None,
+) -> Generator[bytes, None, dict]:
+    """Convertir un lot API en produisant l'archive ZIP au fil de l'eau.
+    
+    Le ZIP (plusieurs fichiers ou erreurs) est écrit dans `REP_API_EXPORTS`
+    pour `/download` et ses octets sont produits dès que chaque entrée est
+    prête. Rien n'est produit si le lot échoue entièrement ou s'il ne
+    contient qu'un fichier (sortie écrite directement sur disque).
+    
+    Returns:
+        Résumé (status, success_count, error_count, errors), valeur de
+        retour du générateur
+    """
     errors = []
     source_formats = set()
+    success_count = 0
+    writer = None
+    zip_path = None
     
-    try:
-        for file in files:
-            original_name = secure_filename(file.filename or "")
+    def _resultats():
+        # Convertir tous les fichiers non vides en un seul lot (éventuellement parallèle)
+        convertis = conversion_service.iter_batch(
+            conversion_type,
+            target_format,
+            [upload for upload in uploads if upload[1]],
+            txt_encoding=txt_encoding,
+            options=options,
+        )
+        for original_name, input_bytes, _ in uploads:
             ext_source = Path(original_name).suffix.lower().lstrip(".")
             if ext_source:
                 source_formats.add(utils.normalize_image_format(ext_source))
             
-            input_bytes = file.read()
             if not input_bytes:
                 errors.append(f"{original_name}: fichier vide")
                 continue
             
-            try:
-                output_bytes, output_format, mimetype = conversion_service.convert_file(
-                    conversion_type=conversion_type,
-                    target_format=target_format,
-                    original_filename=original_name,
-                    input_bytes=input_bytes,
-                    mimetype_input=file.mimetype or "",
-                    txt_encoding=txt_encoding,
-                )
-                
-                # Sauvegarder le fichier
-                output_name = f"{Path(original_name).stem or 'converted'}_{__import__('uuid').uuid4().hex[:8]}.{output_format}"
-                output_path = config.REP_API_EXPORTS / f"{job_id}_{output_name}"
-                output_path.write_bytes(output_bytes)
-                outputs.append((output_name, output_path, mimetype))
-            except ConversionError as e:
-                errors.append(f"{original_name}: {str(e)}")
-            except Exception:
-                errors.append(f"{original_name}: erreur inattendue pendant la conversion")
+            resultat = next(convertis)
+            if isinstance(resultat, ConversionError):
+                errors.append(f"{original_name}: {str(resultat)}")
+                continue
+            
+            sortie, output_format, mimetype = resultat
+            output_name = f"{Path(original_name).stem or 'converted'}_{uuid.uuid4().hex[:8]}.{output_format}"
+            yield output_name, sortie, mimetype
+    
+    sorties = _resultats()
+    try:
+        premier = next(sorties, None)
         
         # Traiter les résultats
-        if not outputs:
+        if premier is None:
             job_service.update_job(
                 job_id,
                 status="erreur",
@@ -247,21 +791,24 @@ def convert():
                 target_format=target_format,
                 source_formats=source_formats,
                 total_size=total_size,
-                files_count=len(files),
+                files_count=len(uploads),
                 success_count=0,
                 error_count=len(errors),
                 status="erreur",
             )
-            return jsonify({
-                "job_id": job_id,
-                "status": "erreur",
-                "errors": errors,
-                "status_url": url_for("api.get_job_status", job_id=job_id, _external=False),
-            }), 400
+            return {"status": "erreur", "success_count": 0, "error_count": len(errors), "errors": errors}
         
-        if len(outputs) == 1 and not errors:
+        if len(uploads) == 1:
             # Un seul fichier sans erreur
-            output_name, output_path, mimetype = outputs[0]
+            output_name, sortie, mimetype = premier
+            output_path = config.REP_API_EXPORTS / f"{job_id}_{output_name}"
+            if isinstance(sortie, Path):
+                shutil.move(sortie, output_path)
+                sha256 = utils.sha256_file(output_path)
+            else:
+                output_path.write_bytes(sortie)
+                sha256 = hashlib.sha256(sortie).hexdigest()
+            success_count = 1
             job_service.update_job(
                 job_id,
                 status="termine",
@@ -271,32 +818,36 @@ def convert():
                 api_output_path=str(output_path),
                 api_output_name=output_name,
                 api_output_mimetype=mimetype,
+                api_output_sha256=sha256,
             )
             status = "termine"
         else:
-            # Plusieurs fichiers ou erreurs: créer un ZIP
+            # Plusieurs fichiers ou erreurs: ZIP écrit sur disque et diffusé
             zip_name = f"api_batch_{job_id[:8]}.zip"
             zip_path = config.REP_API_EXPORTS / zip_name
-            with zipfile.ZipFile(zip_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-                for output_name, output_path, _ in outputs:
-                    zf.write(output_path, arcname=output_name)
-                if errors:
-                    zf.writestr("errors.txt", "\n".join(errors) + "\n")
-            
-            # Nettoyer les fichiers individuels
-            for _, output_path, _ in outputs:
-                utils.delete_file(str(output_path))
+            writer = ZipStreamWriter(copie=zip_path)
+            for output_name, sortie, _ in itertools.chain([premier], sorties):
+                try:
+                    yield from writer.ajouter(output_name, sortie)
+                finally:
+                    utils.delete_spooled(sortie)
+                success_count += 1
+            if errors:
+                yield from writer.ajouter("errors.txt", ("\n".join(errors) + "\n").encode("utf-8"))
+            yield from writer.terminer()
             
             status = "erreur" if errors else "termine"
             job_service.update_job(
                 job_id,
                 status=status,
-                success_count=len(outputs),
+                success_count=success_count,
                 error_count=len(errors),
                 message="Lot terminé avec erreurs" if errors else "Lot terminé",
                 api_output_path=str(zip_path),
                 api_output_name=zip_name,
                 api_output_mimetype="application/zip",
+                # Empreinte calculée au fil de la diffusion, sans relire l'archive
+                api_output_sha256=writer.sha256,
             )
         
         # Enregistrer dans l'historique
@@ -306,28 +857,27 @@ def convert():
             target_format=target_format,
             source_formats=source_formats,
             total_size=total_size,
-            files_count=len(files),
-            success_count=len(outputs),
+            files_count=len(uploads),
+            success_count=success_count,
             error_count=len(errors),
             status=status,
         )
         
-        return jsonify({
-            "job_id": job_id,
+        return {
             "status": status,
-            "success_count": len(outputs),
+            "success_count": success_count,
             "error_count": len(errors),
             "errors": errors,
-            "status_url": url_for("api.get_job_status", job_id=job_id, _external=False),
-            "download_url": url_for("api.download_job", job_id=job_id, _external=False),
-        }), 201
-    except Exception:
+        }
+    except (Exception, GeneratorExit) as e:
+        if writer is not None:
+            writer.abandonner()
         job_service.update_job(
             job_id,
             status="erreur",
-            success_count=len(outputs),
+            success_count=success_count,
             error_count=max(1, len(errors)),
-            message="Erreur inattendue"
+            message="Téléchargement interrompu" if isinstance(e, GeneratorExit) else "Erreur inattendue"
         )
         history_service.add_entry(
             job_id=job_id,
@@ -335,9 +885,13 @@ def convert():
             target_format=target_format,
             source_formats=source_formats,
             total_size=total_size,
-            files_count=len(files),
-            success_count=len(outputs),
+            files_count=len(uploads),
+            success_count=success_count,
             error_count=max(1, len(errors)),
             status="erreur",
         )
-        return jsonify({"error": "Une erreur inattendue est survenue."}), 500
+        raise
+    finally:
+        # Arrêter les conversions restantes, puis supprimer les fichiers déposés
+        sorties.close()
+        utils.delete_spooled(*(donnees for _, donnees, _ in uploads))
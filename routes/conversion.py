@@ -1,10 +1,12 @@
 """Routes de conversion (formulaire web)."""
 
-import zipfile
+import itertools
 from pathlib import Path
+from typing import Iterator
 from werkzeug.utils import secure_filename
 from flask import (
     Blueprint,
+    Response,
     request,
     send_file,
     redirect,
@@ -16,7 +18,7 @@ from flask import (
 from models import ConversionError
 import config
 import utils
-from services import JobService, ConversionService, HistoryService
+from services import JobService, ConversionService, HistoryService, ZipStreamWriter
 import uuid
 
 # Importer les instances partagées du conteneur
@@ -39,6 +41,7 @@ def convert():
     
     try:
         utils.validate_conversion_request(conversion_type, target_format)
+        options = utils.parse_conversion_options(conversion_type, request.form)
     except ConversionError as e:
         flash(str(e), "error")
         return redirect(url_for("pages.index"))
@@ -53,59 +56,55 @@ def convert():
     job_service.update_job(job_id, status="en_cours")
     
     temp_paths = []
-    outputs = []
     errors = []
     source_formats = set()
-    total_converted_size = 0
     
-    @after_this_request
-    def cleanup_temp(response):
-        """Nettoyer les fichiers temporaires."""
+    def nettoyer():
         for path in temp_paths:
             try:
                 path.unlink(missing_ok=True)
             except Exception:
                 pass
+    
+    @after_this_request
+    def cleanup_temp(response):
+        """Nettoyer les fichiers temporaires une fois la réponse envoyée (ZIP diffusé compris)."""
+        response.call_on_close(nettoyer)
         return response
     
     try:
+        items = []
+        prefixes = []
         for file in files:
             original_name = secure_filename(file.filename or "")
             unique_prefix = uuid.uuid4().hex
-            save_name = f"{unique_prefix}_{original_name or 'upload'}"
-            save_path = config.REP_UPLOADS / save_name
-            file.save(save_path)
-            temp_paths.append(save_path)
+            # Petits fichiers en mémoire, gros fichiers déposés dans REP_SPOOL
+            donnees = utils.spool_upload(file)
+            if isinstance(donnees, Path):
+                temp_paths.append(donnees)
             
             # Tracker le format source
             ext = Path(original_name).suffix.lstrip('.').lower()
             if ext:
                 source_formats.add(ext)
             
-            try:
-                input_bytes = save_path.read_bytes()
-                output_bytes, output_format, mimetype = conversion_service.convert_file(
-                    conversion_type=conversion_type,
-                    target_format=target_format,
-                    original_filename=original_name,
-                    input_bytes=input_bytes,
-                    mimetype_input=file.mimetype or "",
-                    txt_encoding=txt_encoding,
-                )
-                
-                base_name = Path(original_name).stem or "converted"
-                output_name = f"{base_name}_{unique_prefix}.{output_format}"
-                output_path = config.REP_UPLOADS / output_name
-                output_path.write_bytes(output_bytes)
-                temp_paths.append(output_path)
-                total_converted_size += len(output_bytes)
-                outputs.append((output_name, output_path, mimetype))
-            except ConversionError as e:
-                errors.append(f"{original_name}: {str(e)}")
-            except Exception:
-                errors.append(f"{original_name}: erreur inattendue pendant la conversion")
+            items.append((original_name, donnees, file.mimetype or ""))
+            prefixes.append(unique_prefix)
         
-        if not outputs:
+        resultats = zip(items, prefixes, conversion_service.iter_batch(
+            conversion_type, target_format, items, txt_encoding=txt_encoding, options=options
+        ))
+        
+        # Avancer jusqu'au premier succès: si tout échoue, on peut encore rediriger
+        premier = None
+        for (original_name, _, _), unique_prefix, resultat in resultats:
+            if isinstance(resultat, ConversionError):
+                errors.append(f"{original_name}: {str(resultat)}")
+                continue
+            premier = (original_name, unique_prefix, resultat)
+            break
+        
+        if premier is None:
             job_service.update_job(
                 job_id,
                 status="erreur",
@@ -128,7 +127,16 @@ def convert():
             return redirect(url_for("pages.index"))
         
         # Cas simple: un seul fichier, pas d'erreur
-        if len(files) == 1 and not errors:
+        if len(files) == 1:
+            original_name, unique_prefix, (sortie, output_format, mimetype) = premier
+            output_name = _nom_sortie(original_name, unique_prefix, output_format)
+            if isinstance(sortie, Path):
+                # Sortie déjà sur disque (conversion par chemin): envoyée telle quelle
+                output_path = sortie
+            else:
+                output_path = config.REP_UPLOADS / output_name
+                output_path.write_bytes(sortie)
+            temp_paths.append(output_path)
             job_service.update_job(
                 job_id,
                 status="termine",
@@ -141,13 +149,12 @@ def convert():
                 conversion_type=conversion_type,
                 target_format=target_format,
                 source_formats=source_formats,
-                total_size=total_converted_size,
+                total_size=utils.input_size(output_path),
                 files_count=1,
                 success_count=1,
                 error_count=0,
                 status="termine",
             )
-            output_name, output_path, mimetype = outputs[0]
             return send_file(
                 output_path,
                 as_attachment=True,
@@ -155,67 +162,39 @@ def convert():
                 mimetype=mimetype
             )
         
-        # Cas multiple: créer un ZIP
+        # Cas multiple: diffuser le ZIP pendant que le reste du lot se convertit
         zip_name = f"batch_{job_id[:8]}.zip"
-        zip_path = config.REP_UPLOADS / zip_name
-        with zipfile.ZipFile(zip_path, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-            for output_name, output_path, _ in outputs:
-                zf.write(output_path, arcname=output_name)
-            if errors:
-                zf.writestr("errors.txt", "\n".join(errors) + "\n")
-        temp_paths.append(zip_path)
-        
-        if errors:
-            job_service.update_job(
-                job_id,
-                status="erreur",
-                success_count=len(outputs),
-                error_count=len(errors),
-                message="Lot terminé avec erreurs",
-            )
-            history_service.add_entry(
-                job_id=job_id,
-                conversion_type=conversion_type,
-                target_format=target_format,
-                source_formats=source_formats,
-                total_size=total_converted_size,
-                files_count=len(files),
-                success_count=len(outputs),
-                error_count=len(errors),
-                status="erreur",
-            )
-            flash(f"Lot converti avec {len(errors)} erreur(s). Voir errors.txt dans le ZIP.", "warning")
-        else:
-            job_service.update_job(
-                job_id,
-                status="termine",
-                success_count=len(outputs),
-                error_count=0,
-                message="Lot terminé",
-            )
-            history_service.add_entry(
-                job_id=job_id,
-                conversion_type=conversion_type,
-                target_format=target_format,
-                source_formats=source_formats,
-                total_size=total_converted_size,
-                files_count=len(files),
-                success_count=len(outputs),
-                error_count=0,
-                status="termine",
-            )
+        flux = _diffuser_lot(
+            job_id,
+            conversion_type,
+            target_format,
+            source_formats,
+            len(files),
+            premier,
+            resultats,
+            errors,
+        )
+        try:
+            # Démarré ici: sa fermeture clôture le job même si le client se
+            # déconnecte avant la première lecture de la réponse
+            premier_morceau = next(flux)
+        except Exception:
+            # Job et historique déjà clôturés par _diffuser_lot
+            flash("Une erreur inattendue est survenue pendant le traitement du lot.", "error")
+            return redirect(url_for("pages.index"))
         
-        return send_file(
-            zip_path,
-            as_attachment=True,
-            download_name=zip_name,
-            mimetype="application/zip"
+        response = Response(
+            itertools.chain([premier_morceau], flux),
+            mimetype="application/zip",
+            headers={"Content-Disposition": f"attachment; filename={zip_name}"},
         )
+        response.call_on_close(flux.close)
+        return response
     except Exception:
         job_service.update_job(
             job_id,
             status="erreur",
-            success_count=len(outputs),
+            success_count=0,
             error_count=max(1, len(errors)),
             message="Erreur inattendue",
         )
@@ -224,11 +203,99 @@ def convert():
             conversion_type=conversion_type,
             target_format=target_format,
             source_formats=source_formats,
-            total_size=total_converted_size,
+            total_size=0,
             files_count=len(files),
-            success_count=len(outputs),
+            success_count=0,
             error_count=max(1, len(errors)),
             status="erreur",
         )
         flash("Une erreur inattendue est survenue pendant le traitement du lot.", "error")
         return redirect(url_for("pages.index"))
+
+
+def _nom_sortie(original_name: str, unique_prefix: str, output_format: str) -> str:
+    """Nom du fichier converti (téléchargement ou entrée du ZIP)."""
+    base_name = Path(original_name).stem or "converted"
+    return f"{base_name}_{unique_prefix}.{output_format}"
+
+
+def _ajouter_sortie(writer: ZipStreamWriter, nom: str, sortie: bytes | Path) -> Iterator[bytes]:
+    """Ajouter une sortie au ZIP, puis supprimer son fichier s'il est sur disque."""
+    try:
+        yield from writer.ajouter(nom, sortie)
+    finally:
+        utils.delete_spooled(sortie)
+
+
+def _diffuser_lot(
+    job_id: str,
+    conversion_type: str,
+    target_format: str,
+    source_formats: set,
+    files_count: int,
+    premier: tuple,
+    resultats: Iterator,
+    errors: list[str],
+) -> Iterator[bytes]:
+    """Produire le ZIP d'un lot entrée par entrée, puis clôturer le job.
+    
+    Les conversions restantes s'exécutent au fil de la lecture de la réponse.
+    Les en-têtes (et donc la session) étant déjà envoyés, les erreurs ne sont
+    plus signalées par un message flash mais dans `errors.txt`.
+    """
+    writer = ZipStreamWriter()
+    success_count = 0
+    total_converted_size = 0
+    message = None
+    
+    try:
+        original_name, unique_prefix, (sortie, output_format, _) = premier
+        total_converted_size += utils.input_size(sortie)
+        yield from _ajouter_sortie(writer, _nom_sortie(original_name, unique_prefix, output_format), sortie)
+        success_count += 1
+        
+        for (original_name, _, _), unique_prefix, resultat in resultats:
+            if isinstance(resultat, ConversionError):
+                errors.append(f"{original_name}: {str(resultat)}")
+                continue
+            sortie, output_format, _ = resultat
+            total_converted_size += utils.input_size(sortie)
+            yield from _ajouter_sortie(writer, _nom_sortie(original_name, unique_prefix, output_format), sortie)
+            success_count += 1
+        
+        if errors:
+            yield from writer.ajouter("errors.txt", ("\n".join(errors) + "\n").encode("utf-8"))
+        yield from writer.terminer()
+    except GeneratorExit:
+        # Client déconnecté pendant le téléchargement
+        writer.abandonner()
+        errors.append("téléchargement interrompu")
+        message = "Téléchargement interrompu"
+        raise
+    except Exception:
+        writer.abandonner()
+        errors.append("erreur inattendue")
+        message = "Erreur inattendue"
+        raise
+    finally:
+        status = "erreur" if errors else "termine"
+        if message is None:
+            message = "Lot terminé avec erreurs" if errors else "Lot terminé"
+        job_service.update_job(
+            job_id,
+            status=status,
+            success_count=success_count,
+            error_count=len(errors),
+            message=message,
+        )
+        history_service.add_entry(
+            job_id=job_id,
+            conversion_type=conversion_type,
+            target_format=target_format,
+            source_formats=source_formats,
+            total_size=total_converted_size,
+            files_count=files_count,
+            success_count=success_count,
+            error_count=len(errors),
+            status=status,
+        )
@@ -0,0 +1,95 @@
+"""Mesurer les conversions YAML → JSON et JSON → YAML sur un gros fichier.
+
+Compare l'ancien chemin (json.loads essayé puis yaml.safe_load, tout en
+mémoire) au moteur en flux, le YAML étant lu par l'implémentation Python
+de PyYAML puis par libyaml (l'écriture est toujours en Python).
+
+Usage: python scripts/benchmark_data.py [--records 20000]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from converters import DataConverter, data_stream  # noqa: E402
+
+
+def generer(records: int) -> dict:
+    """Jeu de données représentatif d'un export (enregistrements imbriqués)."""
+    return {
+        "version": 1,
+        "items": [
+            {
+                "id": i,
+                "name": f"élément {i}",
+                "active": i % 2 == 0,
+                "score": i * 1.5,
+                "tags": ["a", "b", "c"],
+                "meta": {"created": f"2024-01-{i % 28 + 1:02d}T10:00:00", "owner": None},
+            }
+            for i in range(records)
+        ],
+    }
+
+
+def ancien_chemin(source: bytes, target: str) -> bytes:
+    """Conversion telle qu'avant: décodage, json.loads puis yaml.safe_load, sérialisation complète."""
+    text = source.decode("utf-8")
+    text = text.encode("utf-8").decode("utf-8")
+    try:
+        data = json.loads(text)
+    except Exception:
+        data = yaml.safe_load(text)
+    if target == "json":
+        return (json.dumps(data, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+    return yaml.safe_dump(data, sort_keys=False, allow_unicode=True).encode("utf-8")
+
+
+def mesurer(fonction, *args) -> float:
+    """Durée d'un appel, en secondes."""
+    debut = time.perf_counter()
+    fonction(*args)
+    return time.perf_counter() - debut
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000, help="nombre d'enregistrements générés")
+    args = parser.parse_args()
+    
+    data = generer(args.records)
+    sources = {
+        "yaml": yaml.safe_dump(data, sort_keys=False, allow_unicode=True).encode("utf-8"),
+        "json": json.dumps(data, ensure_ascii=False).encode("utf-8"),
+    }
+    print(f"libyaml disponible: {yaml.__with_libyaml__}")
+    
+    for source, target in (("yaml", "json"), ("json", "yaml")):
+        entree = sources[source]
+        print(f"\n{source.upper()} → {target.upper()} ({len(entree) / 1e6:.1f} Mo)")
+        
+        ancien = mesurer(ancien_chemin, entree, target)
+        print(f"  avant (chargement complet) : {ancien:7.2f} s")
+        
+        converter = DataConverter()
+        chargeur = data_stream.ChargeurYaml
+        try:
+            data_stream.ChargeurYaml = yaml.SafeLoader
+            python = mesurer(converter.convert, entree, source, target)
+        finally:
+            data_stream.ChargeurYaml = chargeur
+        print(f"  flux, PyYAML Python        : {python:7.2f} s  (x{ancien / python:.1f})")
+        
+        if yaml.__with_libyaml__:
+            libyaml = mesurer(converter.convert, entree, source, target)
+            print(f"  flux, libyaml              : {libyaml:7.2f} s  (x{ancien / libyaml:.1f})")
+
+
+if __name__ == "__main__":
+    main()
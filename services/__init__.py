@@ -4,10 +4,16 @@ from services.job_service import JobService
 from services.history_service import HistoryService
 from services.profile_service import ProfileService
 from services.conversion_service import ConversionService
+from services.cache_service import CacheService
+from services.upload_service import UploadService
+from services.zip_stream import ZipStreamWriter
 
 __all__ = [
     "JobService",
     "HistoryService",
     "ProfileService",
     "ConversionService",
+    "CacheService",
+    "UploadService",
+    "ZipStreamWriter",
 ]
@@ -0,0 +1,268 @@
+"""Service de cache des résultats de conversion."""
+
+import fcntl
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+import config
+import utils
+
+
+class CacheService:
+    """Cache disque des conversions, adressé par le contenu.
+    
+    La clé est un SHA-256 des octets d'entrée et des paramètres de conversion.
+    Chaque entrée est stockée sous `REP_CACHE/<clé[:2]>/<clé>.bin` avec un
+    fichier `.json` (format, mimetype). L'ordre LRU suit les dates de
+    modification des fichiers, mises à jour à chaque lecture.
+    
+    Plusieurs processus (workers gunicorn) partagent le dossier: une
+    recherche vérifie les fichiers sur disque (une entrée évincée ailleurs est
+    un défaut de cache, une entrée écrite ailleurs est reprise), et le budget
+    `CACHE_TAILLE_MAX` est mesuré sur disque sous un verrou de fichier
+    (`fcntl.flock`) à chaque ajout: il est commun à tous les processus.
+    """
+    
+    def __init__(self):
+        self._lock = Lock()
+        self._index: OrderedDict[str, tuple[int, str, str]] = OrderedDict()
+        self._taille_totale = 0
+        self._rep_charge: Path | None = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+    
+    @staticmethod
+    def make_key(
+        input_bytes: bytes | Path,
+        conversion_type: str,
+        source_format: str,
+        target_format: str,
+        options: dict | None = None,
+    ) -> str:
+        """Calculer la clé de cache d'une conversion (un chemin est haché par blocs)."""
+        parametres = json.dumps(
+            {
+                "type": conversion_type,
+                "source": source_format,
+                "target": target_format,
+                "options": options or {},
+            },
+            sort_keys=True,
+        )
+        empreinte = hashlib.sha256(parametres.encode("utf-8"))
+        empreinte.update(b"\0")
+        if isinstance(input_bytes, Path):
+            with input_bytes.open("rb") as fichier:
+                while bloc := fichier.read(1024 * 1024):
+                    empreinte.update(bloc)
+        else:
+            empreinte.update(input_bytes)
+        return empreinte.hexdigest()
+    
+    def get(self, key: str) -> tuple[bytes, str, str] | None:
+        """Obtenir un résultat en cache.
+        
+        Returns:
+            Tuple (output_bytes, output_format, mimetype) ou None
+        """
+        with self._lock:
+            entree = self._entree(key)
+            if entree is None:
+                self._misses += 1
+                return None
+            chemin = self._chemin(key)
+        
+        try:
+            output_bytes = chemin.read_bytes()
+            self._toucher(chemin)
+        except OSError:
+            # Fichier supprimé entre-temps: traiter comme un défaut de cache
+            with self._lock:
+                self._retirer(key)
+                self._misses += 1
+            return None
+        
+        with self._lock:
+            self._hits += 1
+        _, output_format, mimetype = entree
+        return output_bytes, output_format, mimetype
+    
+    def get_file(self, key: str, output_dir: Path) -> tuple[Path, str, str] | None:
+        """Obtenir un résultat en cache sous forme de fichier, sans le lire.
+        
+        Le fichier est lié (ou copié) dans `output_dir`: une éviction
+        ultérieure ne l'affecte pas, et l'appelant le supprime après usage.
+        
+        Returns:
+            Tuple (chemin, output_format, mimetype) ou None
+        """
+        with self._lock:
+            entree = self._entree(key)
+            if entree is None:
+                self._misses += 1
+                return None
+            chemin = self._chemin(key)
+        
+        _, output_format, mimetype = entree
+        output_dir.mkdir(parents=True, exist_ok=True)
+        destination = output_dir / f"{uuid.uuid4().hex}.{output_format}"
+        try:
+            utils.link_or_copy(chemin, destination)
+            self._toucher(chemin)
+        except OSError:
+            destination.unlink(missing_ok=True)
+            with self._lock:
+                self._retirer(key)
+                self._misses += 1
+            return None
+        
+        with self._lock:
+            self._hits += 1
+        return destination, output_format, mimetype
+    
+    def put(self, key: str, output_bytes: bytes | Path, output_format: str, mimetype: str) -> None:
+        """Stocker un résultat (octets ou fichier), en évinçant les entrées les moins récentes si besoin."""
+        taille = utils.input_size(output_bytes)
+        if taille > config.CACHE_TAILLE_MAX:
+            return
+        
+        with self._lock:
+            if self._entree(key) is not None:
+                return
+            chemin = self._chemin(key)
+        
+        # Écriture hors verrou, puis renommages atomiques (métadonnées d'abord)
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        temporaire = chemin.with_name(f"{chemin.name}.{uuid.uuid4().hex}.tmp")
+        meta_temporaire = chemin.with_name(f"{chemin.stem}.json.{uuid.uuid4().hex}.tmp")
+        if isinstance(output_bytes, Path):
+            utils.link_or_copy(output_bytes, temporaire)
+        else:
+            temporaire.write_bytes(output_bytes)
+        meta_temporaire.write_text(
+            json.dumps({"output_format": output_format, "mimetype": mimetype}),
+            encoding="utf-8",
+        )
+        os.replace(meta_temporaire, chemin.with_suffix(".json"))
+        os.replace(temporaire, chemin)
+        self._toucher(chemin)
+        
+        # Budget commun à tous les processus: mesuré sur disque, sous verrou de fichier
+        with self._lock, self._verrou_cache():
+            self._charger_index(relire=True)
+            while self._taille_totale > config.CACHE_TAILLE_MAX and self._index:
+                ancienne_cle = next(iter(self._index))
+                self._retirer(ancienne_cle)
+                self._evictions += 1
+    
+    def stats(self) -> dict:
+        """Obtenir les compteurs du cache."""
+        with self._lock:
+            self._charger_index(relire=True)
+            return {
+                "entries": len(self._index),
+                "size_bytes": self._taille_totale,
+                "max_size_bytes": config.CACHE_TAILLE_MAX,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+    
+    def _chemin(self, key: str) -> Path:
+        """Chemin du fichier de résultat d'une clé."""
+        return config.REP_CACHE / key[:2] / f"{key}.bin"
+    
+    def _entree(self, key: str) -> tuple[int, str, str] | None:
+        """Entrée d'une clé, vérifiée sur disque (verrou détenu).
+        
+        Une entrée dont le `.bin` ou le `.json` a disparu (évincée par un
+        autre processus) est un défaut: l'index est alors relu. Une entrée
+        écrite par un autre processus depuis le chargement est ajoutée.
+        """
+        self._charger_index()
+        chemin = self._chemin(key)
+        if not (chemin.exists() and chemin.with_suffix(".json").exists()):
+            if key in self._index:
+                self._charger_index(relire=True)
+            return None
+        
+        entree = self._index.get(key)
+        if entree is None:
+            try:
+                meta = json.loads(chemin.with_suffix(".json").read_text(encoding="utf-8"))
+                entree = (chemin.stat().st_size, meta.get("output_format", ""), meta.get("mimetype", ""))
+            except (OSError, ValueError):
+                return None
+            self._index[key] = entree
+            self._taille_totale += entree[0]
+        self._index.move_to_end(key)
+        return entree
+    
+    @staticmethod
+    def _toucher(chemin: Path) -> None:
+        """Marquer une entrée comme la plus récente (date à la nanoseconde, partagée entre processus)."""
+        maintenant = time.time_ns()
+        os.utime(chemin, ns=(maintenant, maintenant))
+    
+    @contextmanager
+    def _verrou_cache(self):
+        """Verrou exclusif entre processus sur le dossier du cache."""
+        config.REP_CACHE.mkdir(parents=True, exist_ok=True)
+        with (config.REP_CACHE / "verrou").open("a") as fichier:
+            fcntl.flock(fichier, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fichier, fcntl.LOCK_UN)
+    
+    def _retirer(self, key: str) -> None:
+        """Retirer une entrée de l'index et du disque (verrou détenu)."""
+        entree = self._index.pop(key, None)
+        if entree is not None:
+            self._taille_totale -= entree[0]
+        chemin = self._chemin(key)
+        chemin.unlink(missing_ok=True)
+        chemin.with_suffix(".json").unlink(missing_ok=True)
+    
+    def _charger_index(self, relire: bool = False) -> None:
+        """Construire l'index depuis le disque (verrou détenu).
+        
+        L'index est construit au premier accès ou si le dossier a changé;
+        `relire` le reconstruit depuis les fichiers présents pour voir les
+        ajouts et évictions des autres processus. Seules les métadonnées des
+        entrées inconnues sont relues.
+        """
+        if self._rep_charge == config.REP_CACHE and not relire:
+            return
+        
+        connues = self._index.copy() if self._rep_charge == config.REP_CACHE else {}
+        self._index.clear()
+        self._taille_totale = 0
+        self._rep_charge = config.REP_CACHE
+        if not config.REP_CACHE.exists():
+            return
+        
+        entrees = []
+        for chemin in config.REP_CACHE.glob("*/*.bin"):
+            try:
+                stat = chemin.stat()
+                if chemin.stem in connues:
+                    _, output_format, mimetype = connues[chemin.stem]
+                else:
+                    meta = json.loads(chemin.with_suffix(".json").read_text(encoding="utf-8"))
+                    output_format, mimetype = meta.get("output_format", ""), meta.get("mimetype", "")
+            except (OSError, ValueError):
+                continue
+            entrees.append((stat.st_mtime_ns, chemin.stem, stat.st_size, output_format, mimetype))
+        
+        # Du moins récemment utilisé au plus récent
+        for _, key, taille, output_format, mimetype in sorted(entrees):
+            self._index[key] = (taille, output_format, mimetype)
+            self._taille_totale += taille
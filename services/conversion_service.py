@@ -1,144 +1,444 @@
 """Service d'orchestration des conversions."""
 
 from pathlib import Path
+import multiprocessing
 import uuid
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from typing import Iterator
 from werkzeug.datastructures import FileStorage
 
-from models import ConversionError
+from models import ConversionError, ConversionResult
+from services.cache_service import CacheService
 import config
 import utils
 import converters
 
 
+def _convertir_dans_processus(
+    conversion_type: str,
+    target_format: str,
+    original_filename: str,
+    input_bytes: bytes | Path,
+    mimetype_input: str,
+    txt_encoding: str,
+    options: dict | None = None,
+) -> tuple[bytes | Path, str, str]:
+    """Point d'entrée des workers du pool de processus.
+    
+    Seules des ConversionError (picklables) remontent au processus parent.
+    Une entrée (ou une sortie) sur disque ne transite que par son chemin.
+    """
+    try:
+        return ConversionService().convert_file(
+            conversion_type=conversion_type,
+            target_format=target_format,
+            original_filename=original_filename,
+            input_bytes=input_bytes,
+            mimetype_input=mimetype_input,
+            txt_encoding=txt_encoding,
+            options=options,
+        )
+    except ConversionError:
+        raise
+    except Exception as e:
+        raise ConversionError("erreur inattendue pendant la conversion") from e
+
+
+def _liberer_sorties(resultats: list) -> None:
+    """Supprimer les sorties sur disque de résultats qui ne seront pas remis."""
+    for resultat in resultats:
+        if isinstance(resultat, tuple):
+            utils.delete_spooled(resultat[0])
+
+
+def _liberer_future(future) -> None:
+    """Supprimer la sortie sur disque d'une conversion abandonnée, une fois terminée."""
+    if not future.cancelled() and future.exception() is None:
+        _liberer_sorties([future.result()])
+
+
 class ConversionService:
     """Orchestre les conversions de fichiers."""
     
+    def __init__(self, cache: CacheService | None = None):
+        self._cache = cache
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._pool_lock = Lock()
+    
+    def convert_batch(
+        self,
+        conversion_type: str,
+        target_format: str,
+        items: list[tuple[str, bytes | Path, str]],
+        txt_encoding: str = "utf-8",
+        options: dict | None = None,
+    ) -> list[tuple[bytes | Path, str, str] | ConversionError]:
+        """Convertir un lot de fichiers, en parallèle si configuré.
+        
+        Args:
+            conversion_type: Type de conversion
+            target_format: Format cible
+            items: Tuples (nom_fichier, octets ou chemin, mimetype)
+            txt_encoding: Encodage pour TXT
+            options: Options du convertisseur (voir utils.parse_conversion_options)
+        
+        Returns:
+            Un élément par fichier, dans l'ordre d'entrée: le tuple
+            (output_bytes, output_format, mimetype) ou la ConversionError.
+            Pour une entrée sur disque, la sortie peut être un chemin dans
+            REP_SPOOL, à supprimer par l'appelant.
+        """
+        return list(self.iter_batch(conversion_type, target_format, items, txt_encoding, options))
+    
+    def iter_batch(
+        self,
+        conversion_type: str,
+        target_format: str,
+        items: list[tuple[str, bytes | Path, str]],
+        txt_encoding: str = "utf-8",
+        options: dict | None = None,
+    ) -> Iterator[tuple[bytes | Path, str, str] | ConversionError]:
+        """Convertir un lot en produisant chaque résultat dès qu'il est prêt.
+        
+        Même contrat que convert_batch (un élément par fichier, dans l'ordre
+        d'entrée), mais le premier résultat est disponible sans attendre la
+        fin du lot: utile pour diffuser une archive pendant la conversion.
+        """
+        # Servir depuis le cache ce qui peut l'être, convertir le reste
+        caches: list[tuple[bytes | Path, str, str] | None] = []
+        cles: list[str | None] = []
+        a_convertir = []
+        for name, data, mime in items:
+            cle = self._cle_cache(conversion_type, target_format, name, data, mime, txt_encoding, options)
+            cles.append(cle)
+            caches.append(self._lire_cache(cle, data))
+            if caches[-1] is None:
+                a_convertir.append((name, data, mime))
+        
+        converties = self._iter_batch_sans_cache(
+            conversion_type, target_format, a_convertir, txt_encoding, options
+        )
+        produits = 0
+        try:
+            for cle, resultat in zip(cles, caches):
+                if resultat is None:
+                    resultat = next(converties)
+                    if not isinstance(resultat, ConversionError):
+                        self._ecrire_cache(cle, resultat)
+                produits += 1
+                yield resultat
+        finally:
+            # Lot abandonné: supprimer les sorties en cache déjà extraites et jamais remises
+            converties.close()
+            _liberer_sorties(caches[produits:])
+    
+    def _iter_batch_sans_cache(
+        self,
+        conversion_type: str,
+        target_format: str,
+        items: list[tuple[str, bytes | Path, str]],
+        txt_encoding: str,
+        options: dict | None = None,
+    ) -> Iterator[tuple[bytes | Path, str, str] | ConversionError]:
+        """Convertir un lot sans consulter le cache (voir iter_batch)."""
+        if conversion_type == "document" and len(items) > 1:
+            # LibreOffice tourne déjà hors processus: regrouper plutôt que paralléliser
+            yield from self._iter_document_batch(target_format, items, txt_encoding)
+            return
+        
+        if not self._utiliser_pool(len(items)):
+            for name, data, mime in items:
+                yield self._convert_safe(conversion_type, target_format, name, data, mime, txt_encoding, options)
+            return
+        
+        pool = self._get_process_pool()
+        try:
+            futures = [
+                pool.submit(
+                    _convertir_dans_processus,
+                    conversion_type,
+                    target_format,
+                    name,
+                    data,
+                    mime,
+                    txt_encoding,
+                    options,
+                )
+                for name, data, mime in items
+            ]
+        except BrokenProcessPool:
+            # Pool inutilisable: repli sur une exécution dans le processus courant
+            self._reset_process_pool()
+            for name, data, mime in items:
+                yield self._convert_safe(conversion_type, target_format, name, data, mime, txt_encoding, options)
+            return
+        
+        produits = 0
+        try:
+            for future in futures:
+                produits += 1
+                try:
+                    yield future.result()
+                except ConversionError as e:
+                    yield e
+                except BrokenProcessPool:
+                    self._reset_process_pool()
+                    yield ConversionError("erreur inattendue pendant la conversion")
+                except Exception:
+                    yield ConversionError("erreur inattendue pendant la conversion")
+        finally:
+            # Lot abandonné en cours de route: ne pas convertir pour rien, et
+            # supprimer les sorties sur disque des conversions déjà lancées
+            for future in futures[produits:]:
+                if not future.cancel():
+                    future.add_done_callback(_liberer_future)
+    
+    def _convert_safe(
+        self,
+        conversion_type: str,
+        target_format: str,
+        original_filename: str,
+        input_bytes: bytes | Path,
+        mimetype_input: str,
+        txt_encoding: str,
+        options: dict | None = None,
+    ) -> tuple[bytes | Path, str, str] | ConversionError:
+        """Convertir un fichier (sans cache) en capturant l'erreur au lieu de la lever."""
+        try:
+            return self._convert_file_sans_cache(
+                conversion_type, target_format, original_filename, input_bytes, mimetype_input, txt_encoding,
+                options,
+            )
+        except ConversionError as e:
+            return e
+        except Exception:
+            return ConversionError("erreur inattendue pendant la conversion")
+    
+    @staticmethod
+    def _utiliser_pool(nb_fichiers: int) -> bool:
+        """Déterminer si un lot doit être réparti sur le pool de processus."""
+        if config.BATCH_EXECUTEUR == "processus":
+            return nb_fichiers > 0
+        if config.BATCH_EXECUTEUR == "auto":
+            return config.BATCH_WORKERS > 1 and nb_fichiers >= config.BATCH_SEUIL_PARALLELE
+        return False
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Obtenir (ou créer) le pool de processus partagé."""
+        with self._pool_lock:
+            if self._process_pool is None:
+                # "spawn" évite de forker un processus qui contient des threads (workers, serveur)
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=max(1, config.BATCH_WORKERS),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+    
+    def _reset_process_pool(self) -> None:
+        """Abandonner un pool cassé (worker tué) pour le recréer au prochain lot."""
+        with self._pool_lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
     def convert_file(
         self,
         conversion_type: str,
         target_format: str,
         original_filename: str,
-        input_bytes: bytes,
+        input_bytes: bytes | Path,
         mimetype_input: str = "",
         txt_encoding: str = "utf-8",
-    ) -> tuple[bytes, str, str]:
+        options: dict | None = None,
+    ) -> tuple[bytes | Path, str, str]:
         """Convertir un fichier unique.
         
         Args:
             conversion_type: Type de conversion
             target_format: Format cible
             original_filename: Nom du fichier original
-            input_bytes: Octets d'entrée
+            input_bytes: Octets d'entrée, ou chemin d'un fichier sur disque
             mimetype_input: Type MIME d'entrée
             txt_encoding: Encodage pour TXT
-            
+            options: Options du convertisseur (voir utils.parse_conversion_options)
+        
         Returns:
-            Tuple (output_bytes, output_format, mimetype)
-            
+            Tuple (output_bytes, output_format, mimetype); pour une entrée
+            sur disque, output_bytes peut être un chemin dans REP_SPOOL
+        
         Raises:
             ConversionError: En cas d'erreur
         """
-        # Extraire extension source
-        ext_source = Path(original_filename).suffix.lower().lstrip(".")
-        if not ext_source:
-            raise ConversionError("Impossible de détecter le format du fichier.")
-        
-        # Valider MIME
-        utils.validate_mime_type(conversion_type, ext_source, mimetype_input)
+        cle = self._cle_cache(
+            conversion_type, target_format, original_filename, input_bytes, mimetype_input, txt_encoding, options
+        )
+        resultat = self._lire_cache(cle, input_bytes)
+        if resultat is not None:
+            return resultat
         
-        # Traiter selon le type de conversion
-        if conversion_type == "image":
-            return self._convert_image(ext_source, target_format, input_bytes)
-        elif conversion_type == "audio":
-            return self._convert_audio(ext_source, target_format, input_bytes)
-        elif conversion_type == "document":
-            return self._convert_document(ext_source, target_format, input_bytes, txt_encoding)
-        elif conversion_type == "data":
-            return self._convert_data(ext_source, target_format, input_bytes)
-        else:
-            raise ConversionError(f"Type de conversion inconnu: {conversion_type}")
+        resultat = self._convert_file_sans_cache(
+            conversion_type, target_format, original_filename, input_bytes, mimetype_input, txt_encoding, options
+        )
+        self._ecrire_cache(cle, resultat)
+        return resultat
     
-    def _convert_image(self, source_ext: str, target_format: str, input_bytes: bytes) -> tuple[bytes, str, str]:
-        """Convertir une image."""
-        source_fmt = utils.normalize_image_format(source_ext)
-        target_fmt = utils.normalize_image_format(target_format)
-        
-        if source_fmt == target_fmt and source_ext != "svg":
-            raise ConversionError(f"L'image est déjà au format {target_format.upper()}.")
-        
-        if target_format not in {"png", "jpg", "jpeg", "webp", "pdf"}:
-            raise ConversionError("Format de sortie invalide pour les images (PNG, JPG, WebP, PDF).")
-        
-        converter = converters.get_converter("image", source_fmt, target_fmt)
-        result = converter.convert(input_bytes, source_fmt, target_fmt)
-        
-        return result.output_bytes, result.output_format, result.mimetype
-    
-    def _convert_audio(self, source_ext: str, target_format: str, input_bytes: bytes) -> tuple[bytes, str, str]:
-        """Convertir un fichier audio."""
-        if source_ext not in {"mp4", "mp3"}:
-            raise ConversionError("Format audio source non supporté (MP4 ou MP3).")
+    def _convert_file_sans_cache(
+        self,
+        conversion_type: str,
+        target_format: str,
+        original_filename: str,
+        input_bytes: bytes | Path,
+        mimetype_input: str,
+        txt_encoding: str,
+        options: dict | None = None,
+    ) -> tuple[bytes | Path, str, str]:
+        """Convertir un fichier unique sans consulter le cache."""
+        ext_source = self._extension_source(conversion_type, original_filename, mimetype_input)
         
-        if target_format not in {"mp3", "wav"}:
-            raise ConversionError("Format de sortie invalide pour l'audio (MP3 ou WAV).")
+        # Une recherche dans le registre remplace la validation propre à chaque type
+        converter, source_fmt, target_fmt = converters.registry.resolve(conversion_type, ext_source, target_format)
+        options = dict(options or {})
         
-        if source_ext == target_format:
+        # Même format accepté s'il s'agit de redimensionner ou réencoder une image
+        if source_fmt == target_fmt and not options:
             raise ConversionError(f"Le fichier est déjà au format {target_format.upper()}.")
         
-        # Validations de conversion supportée
-        if source_ext == "mp4" and target_format != "mp3":
-            raise ConversionError("Pour les MP4, seul le format MP3 est supporté.")
-        if source_ext == "mp3" and target_format != "wav":
-            raise ConversionError("Pour les MP3, seul le format WAV est supporté.")
-        
-        converter = converters.get_converter("audio", source_ext, target_format)
-        result = converter.convert(input_bytes, source_ext, target_format)
+        if conversion_type == "document":
+            options["txt_encoding"] = txt_encoding
         
-        return result.output_bytes, result.output_format, result.mimetype
+        # Une entrée sur disque passe par convert_path: les convertisseurs en
+        # flux ou délégués à un processus externe écrivent leur sortie sur disque
+        if isinstance(input_bytes, Path):
+            return self._sortie(
+                converter.convert_path(input_bytes, source_fmt, target_fmt, config.REP_SPOOL, **options)
+            )
+        return self._sortie(converter.convert(input_bytes, source_fmt, target_fmt, **options))
     
-    def _convert_document(
+    def _cle_cache(
         self,
-        source_ext: str,
+        conversion_type: str,
         target_format: str,
-        input_bytes: bytes,
+        original_filename: str,
+        input_bytes: bytes | Path,
+        mimetype_input: str,
         txt_encoding: str,
-    ) -> tuple[bytes, str, str]:
-        """Convertir un document."""
-        formats_docs = {"pdf", "docx", "txt"}
-        
-        if source_ext not in formats_docs:
-            raise ConversionError("Format document source non supporté (PDF, DOCX ou TXT).")
-        if target_format not in formats_docs:
-            raise ConversionError("Format de sortie invalide pour les documents (PDF, DOCX ou TXT).")
-        if source_ext == target_format:
-            raise ConversionError(f"Le fichier est déjà au format {target_format.upper()}.")
+        options: dict | None = None,
+    ) -> str | None:
+        """Calculer la clé de cache d'une conversion (None si cache inactif ou entrée invalide)."""
+        if self._cache is None or not config.CACHE_ACTIF:
+            return None
         
-        converter = converters.get_converter("document", source_ext, target_format)
-        result = converter.convert(input_bytes, source_ext, target_format, txt_encoding=txt_encoding)
+        try:
+            ext_source = self._extension_source(conversion_type, original_filename, mimetype_input)
+        except ConversionError:
+            return None
         
-        return result.output_bytes, result.output_format, result.mimetype
+        # Les options font partie de la clé: une sortie 800 px ne sert pas une demande 1920 px
+        options = dict(options or {})
+        if conversion_type == "document":
+            options["txt_encoding"] = txt_encoding
+        if conversion_type in {"image", "audio"}:
+            # Niveau effectif: changer ENCODER_TIER ne sert pas d'anciennes sorties
+            options.setdefault("tier", config.NIVEAU_ENCODAGE_DEFAUT)
+        return self._cache.make_key(input_bytes, conversion_type, ext_source, target_format, options)
     
-    def _convert_data(self, source_ext: str, target_format: str, input_bytes: bytes) -> tuple[bytes, str, str]:
-        """Convertir des données (JSON/YAML)."""
-        if target_format not in {"json", "yaml"}:
-            raise ConversionError("Format de sortie invalide (JSON ou YAML).")
-        
-        if source_ext not in {"json", "yaml", "yml", "txt", "conf"}:
-            raise ConversionError("Format de fichier source non supporté pour les données.")
+    def _lire_cache(self, cle: str | None, entree: bytes | Path) -> tuple[bytes | Path, str, str] | None:
+        """Lire un résultat en cache (sous forme de fichier si l'entrée est sur disque)."""
+        if cle is None:
+            return None
+        if isinstance(entree, Path):
+            return self._cache.get_file(cle, config.REP_SPOOL)
+        return self._cache.get(cle)
+    
+    def _ecrire_cache(self, cle: str | None, resultat: tuple[bytes | Path, str, str]) -> None:
+        """Stocker un résultat en cache (les erreurs de stockage sont ignorées)."""
+        if cle is None:
+            return
+        try:
+            self._cache.put(cle, *resultat)
+        except OSError:
+            pass
+    
+    @staticmethod
+    def _extension_source(conversion_type: str, original_filename: str, mimetype_input: str) -> str:
+        """Extraire l'extension source et valider le type MIME.
         
-        # Normaliser l'extension source
-        source_fmt = "json" if source_ext == "json" else "yaml"
+        Raises:
+            ConversionError: Si l'extension est absente ou le MIME incohérent
+        """
+        ext_source = Path(original_filename).suffix.lower().lstrip(".")
+        if not ext_source:
+            raise ConversionError("Impossible de détecter le format du fichier.")
         
-        if source_fmt == target_format:
-            raise ConversionError(f"Le fichier est déjà au format {target_format.upper()}.")
+        utils.validate_mime_type(conversion_type, ext_source, mimetype_input)
+        return ext_source
+    
+    def _iter_document_batch(
+        self,
+        target_format: str,
+        items: list[tuple[str, bytes | Path, str]],
+        txt_encoding: str,
+    ) -> Iterator[tuple[bytes | Path, str, str] | ConversionError]:
+        """Convertir un lot de documents avec un appel LibreOffice par format source.
         
-        try:
-            text = input_bytes.decode("utf-8")
-        except UnicodeDecodeError as e:
-            raise ConversionError("Le fichier doit être un texte UTF-8 (JSON/YAML).") from e
+        Les documents de même paire (source, cible) sont convertis ensemble;
+        un document en échec n'affecte que sa propre entrée. Les groupes sont
+        traités dans l'ordre de leur premier document: à la fin de chacun, les
+        résultats prêts sont produits dans l'ordre d'entrée, sans attendre
+        les groupes suivants.
+        """
+        resultats: list[tuple[bytes | Path, str, str] | ConversionError | None] = [None] * len(items)
+        groupes: dict[str, list[int]] = {}
         
-        converter = converters.get_converter("data", source_fmt, target_format)
-        result = converter.convert(text.encode("utf-8"), source_fmt, target_format)
+        for index, (original_filename, _, mimetype_input) in enumerate(items):
+            try:
+                source_ext = self._extension_source("document", original_filename, mimetype_input)
+                converters.registry.resolve("document", source_ext, target_format)
+            except ConversionError as e:
+                resultats[index] = e
+                continue
+            groupes.setdefault(source_ext, []).append(index)
         
-        return result.output_bytes, result.output_format, result.mimetype
+        produits = 0
+        try:
+            for source_ext, indexes in groupes.items():
+                # Produire les résultats déjà prêts (erreurs de validation) avant ce groupe
+                while produits < len(items) and resultats[produits] is not None:
+                    produits += 1
+                    yield resultats[produits - 1]
+                
+                entrees = [items[index][1] for index in indexes]
+                sur_disque = any(isinstance(entree, Path) for entree in entrees)
+                try:
+                    converter = converters.registry.get("document", source_ext, target_format)
+                    sorties = converter.convert_many(
+                        entrees,
+                        source_ext,
+                        target_format,
+                        txt_encoding=txt_encoding,
+                        output_dir=config.REP_SPOOL if sur_disque else None,
+                    )
+                except ConversionError as e:
+                    sorties = [e] * len(indexes)
+                
+                for index, sortie in zip(indexes, sorties):
+                    if isinstance(sortie, ConversionError):
+                        resultats[index] = sortie
+                    else:
+                        resultats[index] = self._sortie(sortie)
+            
+            while produits < len(items):
+                produits += 1
+                yield resultats[produits - 1]
+        finally:
+            # Lot abandonné: supprimer les sorties sur disque converties mais jamais remises
+            _liberer_sorties(resultats[produits:])
+    
+    @staticmethod
+    def _sortie(result: ConversionResult) -> tuple[bytes | Path, str, str]:
+        """Tuple de résultat: chemin de sortie s'il y en a un, octets sinon."""
+        sortie = result.output_path if result.output_path is not None else result.output_bytes
+        return sortie, result.output_format, result.mimetype
@@ -1,19 +1,51 @@
 """Service de gestion de l'historique."""
 
+import fcntl
 import json
+import os
 import uuid
-from threading import Lock
+from contextlib import contextmanager
+from threading import Lock, Thread
 from pathlib import Path
+from typing import Iterator
 from models import HistoryEntry, ConversionError
+from services.history_sqlite import SQLiteHistoryStore
 import config
 import utils
 
 
 class HistoryService:
-    """Gère l'historique des conversions."""
+    """Gère l'historique des conversions.
+    
+    L'historique est un journal NDJSON en ajout seul, découpé en segments
+    `<séquence de début>.ndjson` dans le dossier `history_log/` voisin de
+    `HISTORIQUE_PATH`. Un ajout écrit une ligne à la fin du dernier segment;
+    les segments entièrement sortis de la fenêtre `MAX_HISTORY_ENTRIES`
+    sont supprimés en arrière-plan. Un ancien `history.json` est lu tel quel
+    puis migré vers le journal lors de la première écriture.
+    
+    Plusieurs processus (workers gunicorn) partagent le même dossier: l'état
+    du journal est relu sur disque à chaque appel et les écritures sont
+    sérialisées par un verrou de fichier (`fcntl.flock`) sur le dossier.
+    
+    Avec `HISTORIQUE_BACKEND = "sqlite"`, les entrées sont stockées dans une
+    base SQLite indexée, sans limite de taille (voir SQLiteHistoryStore).
+    Dans les deux cas, chaque entrée a une séquence croissante qui sert de
+    curseur de pagination.
+    """
     
     def __init__(self):
         self._lock = Lock()
+        self._rep_charge: Path | None = None
+        # [séquence de début, nombre d'entrées] par segment, du plus ancien au plus récent
+        self._segments: list[list[int]] = []
+        self._prochain = 0
+        # (séquence de début, octets comptés, lignes complètes) du dernier segment lu
+        self._dernier: tuple[int, int, int] | None = None
+        # Époque du journal chargé (fichier `epoque` du dossier), None tant qu'il n'existe pas
+        self._epoque: str | None = None
+        self._compaction: Thread | None = None
+        self._sqlite: SQLiteHistoryStore | None = None
     
     def add_entry(
         self,
@@ -42,16 +74,17 @@ class HistoryService:
             status=status,
         )
         
-        with self._lock:
-            history = self._load()
-            history.append(entry.to_dict())
-            
-            # Limiter la taille de l'historique
-            if len(history) > config.MAX_HISTORY_ENTRIES:
-                history = history[-config.MAX_HISTORY_ENTRIES:]
-            
-            self._save(history)
+        store = self._store_sqlite()
+        if store is not None:
+            store.add(entry.to_dict())
+            return entry
+        
+        with self._lock, self._verrou_journal():
+            self._charger()
+            self._migrer()
+            self._ajouter([entry.to_dict()])
         
+        self._planifier_compaction()
         return entry
     
     def get_recent(self, limit: int = 20) -> list[dict]:
@@ -59,20 +92,292 @@ class HistoryService:
         
         Args:
             limit: Nombre d'entrées (max: MAX_API_HISTORY_RETURNS)
-            
+        
         Returns:
             Liste des entrées
         """
+        return self.query(limit)[0]
+    
+    def query(
+        self,
+        limit: int = 20,
+        cursor: int | None = None,
+        filtres: dict | None = None,
+        since: int | None = None,
+    ) -> tuple[list[dict], int | None]:
+        """Obtenir une page d'entrées filtrées, de la plus récente à la plus ancienne.
+        
+        Sans filtre, seuls les derniers segments du journal sont lus.
+        
+        Args:
+            limit: Nombre d'entrées (max: MAX_API_HISTORY_RETURNS)
+            cursor: Curseur retourné par la page précédente
+            filtres: type, status, target_format, date_from (inclus), date_to (exclu)
+            since: Ne retourner que les entrées ajoutées après cette version (voir `version`)
+        
+        Returns:
+            Tuple (entrées, curseur de la page suivante ou None)
+        """
         limit = max(1, min(limit, config.MAX_API_HISTORY_RETURNS))
         
+        store = self._store_sqlite()
+        if store is not None:
+            page = store.query(limit + 1, before=cursor, filtres=filtres, after=since)
+        else:
+            page = []
+            with self._lock:
+                self._charger()
+                for seq, entry in self._iter_recentes():
+                    # L'entrée de séquence `seq` a porté la version à `seq + 1`
+                    if since is not None and seq + 1 <= since:
+                        break
+                    if cursor is not None and seq >= cursor:
+                        continue
+                    if self._correspond(entry, filtres or {}):
+                        page.append((seq, entry))
+                        if len(page) > limit:
+                            break
+        
+        # Une entrée de plus que demandé indique qu'une page suivante existe
+        suivant = page[limit - 1][0] if len(page) > limit else None
+        return [entry for _, entry in page[:limit]], suivant
+    
+    @property
+    def version(self) -> int:
+        """Version de l'historique: croît à chaque entrée ajoutée, sans rien relire."""
+        store = self._store_sqlite()
+        if store is not None:
+            return store.version()
+        
         with self._lock:
-            history = self._load()
+            self._charger()
+            if not self._segments:
+                return len(self._lire_ancien()[-config.MAX_HISTORY_ENTRIES:])
+            return self._prochain
+    
+    @property
+    def epoque(self) -> str:
+        """Identifiant du stockage: la version d'un autre backend ou d'un journal recréé n'est pas comparable."""
+        store = self._store_sqlite()
+        if store is not None:
+            return f"sqlite-{store.epoque}"
+        
+        with self._lock:
+            self._charger()
+            return f"journal-{self._epoque}" if self._epoque else "ancien"
+    
+    @staticmethod
+    def _correspond(entry: dict, filtres: dict) -> bool:
+        """Vérifier qu'une entrée satisfait les filtres."""
+        for champ in ("type", "status", "target_format"):
+            if filtres.get(champ) and entry.get(champ) != filtres[champ]:
+                return False
+        date = entry.get("date", "")
+        if filtres.get("date_from") and date < filtres["date_from"]:
+            return False
+        if filtres.get("date_to") and date >= filtres["date_to"]:
+            return False
+        return True
+    
+    def _iter_recentes(self) -> Iterator[tuple[int, dict]]:
+        """Parcourir les entrées conservées (seq, entrée), de la plus récente à la plus ancienne (verrou détenu)."""
+        if not self._segments:
+            ancien = self._lire_ancien()[-config.MAX_HISTORY_ENTRIES:]
+            for seq in range(len(ancien) - 1, -1, -1):
+                yield seq, ancien[seq]
+            return
+        
+        # Les segments sont lus un par un, du dernier au premier
+        premiere_sequence = self._prochain - config.MAX_HISTORY_ENTRIES
+        for debut, _ in reversed(self._segments):
+            try:
+                contenu = self._chemin_segment(debut).read_text(encoding="utf-8")
+            except FileNotFoundError:
+                # Compacté par un autre processus: hors de la fenêtre conservée
+                return
+            # Le dernier morceau est vide ou une ligne en cours d'écriture par un autre processus
+            lignes = contenu.split("\n")[:-1]
+            for position in range(len(lignes) - 1, -1, -1):
+                if debut + position >= self._prochain:
+                    # Ajoutée après la lecture de l'état: sera vue avec la version suivante
+                    continue
+                if debut + position < premiere_sequence:
+                    return
+                try:
+                    yield debut + position, json.loads(lignes[position])
+                except ValueError:
+                    continue
+    
+    def _store_sqlite(self) -> SQLiteHistoryStore | None:
+        """Base SQLite courante si ce backend est configuré (créée et alimentée au premier usage)."""
+        if config.HISTORIQUE_BACKEND != "sqlite":
+            return None
         
-        # Retourner dans l'ordre inverse (plus récent en premier)
-        return list(reversed(history[-limit:]))
+        chemin = config.HISTORIQUE_PATH.with_suffix(".sqlite3")
+        with self._lock:
+            if self._sqlite is not None and self._sqlite.chemin == chemin:
+                return self._sqlite
+            if self._sqlite is not None:
+                self._sqlite.close()
+            self._sqlite = SQLiteHistoryStore(chemin)
+            if self._sqlite.count() == 0:
+                # Reprendre l'historique existant (journal ou ancien history.json)
+                self._charger()
+                self._sqlite.add_many([entry for _, entry in reversed(list(self._iter_recentes()))])
+            return self._sqlite
     
     def _load(self) -> list[dict]:
-        """Charger l'historique depuis le fichier."""
+        """Charger tout l'historique conservé (du plus ancien au plus récent)."""
+        store = self._store_sqlite()
+        if store is not None:
+            return [entry for _, entry in reversed(store.query(config.MAX_HISTORY_ENTRIES))]
+        
+        with self._lock:
+            self._charger()
+            return [entry for _, entry in reversed(list(self._iter_recentes()))]
+    
+    def _save(self, history: list[dict]) -> None:
+        """Remplacer l'historique complet (réécrit le journal)."""
+        store = self._store_sqlite()
+        if store is not None:
+            store.clear()
+            store.add_many(history)
+            return
+        
+        with self._lock, self._verrou_journal():
+            self._charger()
+            for debut, _ in self._segments:
+                self._chemin_segment(debut).unlink(missing_ok=True)
+            self._segments = []
+            self._archiver_ancien()
+            self._ajouter(history[-config.MAX_HISTORY_ENTRIES:])
+    
+    @staticmethod
+    def _rep_journal() -> Path:
+        """Dossier des segments, dérivé de HISTORIQUE_PATH."""
+        return config.HISTORIQUE_PATH.with_name(f"{config.HISTORIQUE_PATH.stem}_log")
+    
+    def _chemin_segment(self, debut: int) -> Path:
+        """Chemin du segment commençant à la séquence `debut`."""
+        return self._rep_journal() / f"{debut:012d}.ndjson"
+    
+    def _charger(self) -> None:
+        """Relire l'état du journal sur disque (verrou détenu).
+        
+        D'autres processus écrivent dans le même dossier: la liste des
+        segments est relue à chaque appel. Seule la fin du dernier segment,
+        au-delà des octets déjà comptés, est lue pour connaître la prochaine
+        séquence.
+        """
+        rep = self._rep_journal()
+        if self._rep_charge != rep:
+            self._rep_charge = rep
+            self._dernier = None
+        
+        self._segments = []
+        self._prochain = 0
+        self._epoque = None
+        if not rep.exists():
+            return
+        
+        self._epoque = self._lire_epoque(rep)
+        debuts = sorted(int(chemin.stem) for chemin in rep.glob("*.ndjson") if chemin.stem.isdigit())
+        for debut, suivant in zip(debuts, debuts[1:]):
+            self._segments.append([debut, suivant - debut])
+        if debuts:
+            dernier = debuts[-1]
+            self._segments.append([dernier, self._compter_dernier(dernier)])
+            self._prochain = dernier + self._segments[-1][1]
+    
+    def _compter_dernier(self, debut: int) -> int:
+        """Nombre de lignes complètes du dernier segment, en ne lisant que les octets nouveaux."""
+        compte, lignes = 0, 0
+        if self._dernier is not None and self._dernier[0] == debut:
+            _, compte, lignes = self._dernier
+        
+        try:
+            with self._chemin_segment(debut).open("rb") as fichier:
+                if os.fstat(fichier.fileno()).st_size < compte:
+                    # Segment réécrit entre-temps: tout recompter
+                    compte, lignes = 0, 0
+                fichier.seek(compte)
+                suite = fichier.read()
+        except FileNotFoundError:
+            suite = b""
+        
+        # Une ligne sans fin (en cours d'écriture ou arrêt brutal) n'est pas comptée
+        fin = suite.rfind(b"\n") + 1
+        self._dernier = (debut, compte + fin, lignes + suite.count(b"\n", 0, fin))
+        return self._dernier[2]
+    
+    @contextmanager
+    def _verrou_journal(self):
+        """Verrou exclusif entre processus sur le dossier du journal (écritures seulement)."""
+        rep = self._rep_journal()
+        rep.mkdir(parents=True, exist_ok=True)
+        with (rep / "verrou").open("a") as fichier:
+            fcntl.flock(fichier, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fichier, fcntl.LOCK_UN)
+    
+    @staticmethod
+    def _lire_epoque(rep: Path) -> str:
+        """Lire l'époque du journal, en la créant au besoin (commune à tous les processus)."""
+        chemin = rep / "epoque"
+        if not chemin.exists():
+            # Écrite à part puis liée: un autre processus ne lit jamais un fichier vide
+            temporaire = rep / f"epoque-{uuid.uuid4().hex}"
+            temporaire.write_text(uuid.uuid4().hex[:8], encoding="utf-8")
+            try:
+                os.link(temporaire, chemin)
+            except FileExistsError:
+                pass
+            finally:
+                temporaire.unlink(missing_ok=True)
+        return chemin.read_text(encoding="utf-8").strip()
+    
+    def _reparer_dernier(self) -> None:
+        """Tronquer la ligne incomplète d'un arrêt brutal en fin de dernier segment (verrous détenus).
+        
+        Sous le verrou de fichier, aucun autre processus n'est en train
+        d'écrire: les octets au-delà de la dernière ligne complète sont perdus.
+        """
+        if not self._segments or self._dernier is None:
+            return
+        
+        chemin = self._chemin_segment(self._dernier[0])
+        if chemin.exists() and chemin.stat().st_size > self._dernier[1]:
+            with chemin.open("r+b") as fichier:
+                fichier.truncate(self._dernier[1])
+    
+    def _ajouter(self, entries: list[dict]) -> None:
+        """Écrire des entrées en fin de journal, en ouvrant des segments au besoin (verrous détenus)."""
+        if not entries:
+            return
+        
+        self._reparer_dernier()
+        position = 0
+        while position < len(entries):
+            if not self._segments or self._segments[-1][1] >= config.HISTORIQUE_SEGMENT_ENTREES:
+                self._segments.append([self._prochain, 0])
+            
+            segment = self._segments[-1]
+            nombre = min(len(entries) - position, config.HISTORIQUE_SEGMENT_ENTREES - segment[1])
+            lignes = "".join(
+                json.dumps(entry, ensure_ascii=False) + "\n"
+                for entry in entries[position:position + nombre]
+            )
+            with self._chemin_segment(segment[0]).open("a", encoding="utf-8") as fichier:
+                fichier.write(lignes)
+            
+            segment[1] += nombre
+            self._prochain += nombre
+            position += nombre
+    
+    def _lire_ancien(self) -> list[dict]:
+        """Lire l'ancien fichier `history.json` (format avant le journal)."""
         if not config.HISTORIQUE_PATH.exists():
             return []
         
@@ -82,9 +387,38 @@ class HistoryService:
         except Exception:
             return []
     
-    def _save(self, history: list[dict]) -> None:
-        """Sauvegarder l'historique dans le fichier."""
-        config.HISTORIQUE_PATH.write_text(
-            json.dumps(history, ensure_ascii=False, indent=2) + "\n",
-            encoding="utf-8"
-        )
+    def _migrer(self) -> None:
+        """Importer l'ancien `history.json` dans le journal s'il est encore vide (verrous détenus)."""
+        if self._segments or not config.HISTORIQUE_PATH.exists():
+            return
+        
+        self._ajouter(self._lire_ancien()[-config.MAX_HISTORY_ENTRIES:])
+        self._archiver_ancien()
+    
+    @staticmethod
+    def _archiver_ancien() -> None:
+        """Renommer l'ancien `history.json` pour qu'il ne soit plus relu."""
+        if config.HISTORIQUE_PATH.exists():
+            config.HISTORIQUE_PATH.replace(config.HISTORIQUE_PATH.with_name(f"{config.HISTORIQUE_PATH.name}.migre"))
+    
+    def _planifier_compaction(self) -> None:
+        """Lancer la compaction en arrière-plan si des segments sont périmés."""
+        with self._lock:
+            if len(self._segments) < 2 or self._prochain - self._segments[1][0] < config.MAX_HISTORY_ENTRIES:
+                return
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._compaction = Thread(target=self._compacter, daemon=True)
+            self._compaction.start()
+    
+    def _compacter(self) -> None:
+        """Supprimer les segments entièrement sortis de la fenêtre conservée."""
+        with self._lock:
+            self._charger()
+            perimes = []
+            while len(self._segments) > 1 and self._prochain - self._segments[1][0] >= config.MAX_HISTORY_ENTRIES:
+                perimes.append(self._chemin_segment(self._segments.pop(0)[0]))
+        
+        # Les lecteurs ne voient plus ces segments: suppression hors verrou
+        for chemin in perimes:
+            chemin.unlink(missing_ok=True)
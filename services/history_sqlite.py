@@ -0,0 +1,158 @@
+"""Stockage SQLite de l'historique."""
+
+import json
+import sqlite3
+import uuid
+from pathlib import Path
+from threading import Lock
+
+
+# Colonnes indexées, extraites de l'entrée (le reste est stocké en JSON)
+COLONNES_FILTRABLES = ("type", "status", "target_format")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    job_id TEXT NOT NULL DEFAULT '',
+    date TEXT NOT NULL DEFAULT '',
+    type TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    target_format TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_date ON history(date);
+CREATE INDEX IF NOT EXISTS idx_history_type ON history(type, seq);
+CREATE INDEX IF NOT EXISTS idx_history_status ON history(status, seq);
+CREATE INDEX IF NOT EXISTS idx_history_target ON history(target_format, seq);
+CREATE INDEX IF NOT EXISTS idx_history_job ON history(job_id);
+CREATE TABLE IF NOT EXISTS meta (
+    cle TEXT PRIMARY KEY,
+    valeur TEXT NOT NULL
+);
+"""
+
+
+class SQLiteHistoryStore:
+    """Historique dans une base SQLite (mode WAL), sans limite de taille.
+    
+    Chaque entrée reçoit une séquence croissante (`seq`) qui sert de curseur:
+    les pages sont lues par `seq < curseur ORDER BY seq DESC`, ce qui garde
+    un coût constant quelle que soit la profondeur de pagination.
+    """
+    
+    def __init__(self, chemin: Path):
+        self.chemin = chemin
+        self._lock = Lock()
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        self._connexion = sqlite3.connect(str(chemin), check_same_thread=False)
+        self._connexion.execute("PRAGMA journal_mode=WAL")
+        self._connexion.execute("PRAGMA synchronous=NORMAL")
+        self._connexion.executescript(SCHEMA)
+        with self._connexion:
+            self._connexion.execute(
+                "INSERT OR IGNORE INTO meta (cle, valeur) VALUES ('epoque', ?)", (uuid.uuid4().hex[:8],)
+            )
+        # Propre à la base: une base recréée repart avec une autre époque
+        self.epoque = self._connexion.execute("SELECT valeur FROM meta WHERE cle = 'epoque'").fetchone()[0]
+    
+    def add(self, entry: dict) -> int:
+        """Ajouter une entrée et retourner sa séquence."""
+        with self._lock, self._connexion:
+            curseur = self._connexion.execute(
+                "INSERT INTO history (id, job_id, date, type, status, target_format, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._ligne(entry),
+            )
+            return curseur.lastrowid
+    
+    def add_many(self, entries: list[dict]) -> None:
+        """Ajouter des entrées (du plus ancien au plus récent) en une transaction."""
+        with self._lock, self._connexion:
+            self._connexion.executemany(
+                "INSERT INTO history (id, job_id, date, type, status, target_format, data)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._ligne(entry) for entry in entries],
+            )
+    
+    def query(
+        self,
+        limit: int,
+        before: int | None = None,
+        filtres: dict | None = None,
+        after: int | None = None,
+    ) -> list[tuple[int, dict]]:
+        """Lire des entrées, de la plus récente à la plus ancienne.
+        
+        Args:
+            limit: Nombre maximal d'entrées
+            before: Ne retourner que les séquences strictement inférieures
+            filtres: type, status, target_format, date_from (inclus), date_to (exclu)
+            after: Ne retourner que les séquences strictement supérieures
+        
+        Returns:
+            Liste de tuples (seq, entrée)
+        """
+        filtres = filtres or {}
+        conditions = []
+        parametres: list = []
+        if before is not None:
+            conditions.append("seq < ?")
+            parametres.append(before)
+        if after is not None:
+            conditions.append("seq > ?")
+            parametres.append(after)
+        for colonne in COLONNES_FILTRABLES:
+            if filtres.get(colonne):
+                conditions.append(f"{colonne} = ?")
+                parametres.append(filtres[colonne])
+        if filtres.get("date_from"):
+            conditions.append("date >= ?")
+            parametres.append(filtres["date_from"])
+        if filtres.get("date_to"):
+            conditions.append("date < ?")
+            parametres.append(filtres["date_to"])
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            lignes = self._connexion.execute(
+                f"SELECT seq, data FROM history {where} ORDER BY seq DESC LIMIT ?",
+                (*parametres, limit),
+            ).fetchall()
+        return [(seq, json.loads(data)) for seq, data in lignes]
+    
+    def version(self) -> int:
+        """Dernière séquence attribuée (ne diminue jamais, même après `clear`)."""
+        with self._lock:
+            ligne = self._connexion.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'history'"
+            ).fetchone()
+        return ligne[0] if ligne else 0
+    
+    def count(self) -> int:
+        """Nombre total d'entrées."""
+        with self._lock:
+            return self._connexion.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+    
+    def clear(self) -> None:
+        """Supprimer toutes les entrées (les séquences continuent de croître)."""
+        with self._lock, self._connexion:
+            self._connexion.execute("DELETE FROM history")
+    
+    def close(self) -> None:
+        """Fermer la connexion."""
+        with self._lock:
+            self._connexion.close()
+    
+    @staticmethod
+    def _ligne(entry: dict) -> tuple:
+        """Valeurs d'insertion d'une entrée."""
+        return (
+            str(entry.get("id", "")),
+            str(entry.get("job_id", "")),
+            str(entry.get("date", "")),
+            str(entry.get("type", "")),
+            str(entry.get("status", "")),
+            str(entry.get("target_format", "")),
+            json.dumps(entry, ensure_ascii=False),
+        )
@@ -1,19 +1,40 @@
 """Service de gestion des jobs."""
 
+import time
 import uuid
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+from threading import Condition, Lock, Thread
 from models import Job, ConversionError
+from services.job_store import MemoryJobStore
+from services.job_sqlite import SQLiteJobStore
 import config
 import utils
 
 
 class JobService:
-    """Gère les jobs de conversion."""
+    """Gère les jobs de conversion.
+    
+    Les jobs sont conservés par un store interchangeable selon `JOBS_BACKEND`:
+    en mémoire (défaut, propre au processus) ou dans une base SQLite partagée
+    par tous les workers et conservée au redémarrage (voir SQLiteJobStore).
+    Dans les deux cas, chaque changement reçoit un numéro de séquence croissant
+    qui alimente les ETag et le flux SSE. Les sorties des jobs évincés sont
+    supprimées par un thread dédié, hors de tout verrou.
+    """
     
     def __init__(self):
-        self._jobs: dict[str, Job] = {}
-        self._job_order: list[str] = []
         self._lock = Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._jobs_en_file = 0
+        # Réveil des flux SSE en attente d'un changement
+        self._changement = Condition(Lock())
+        self._memoire = MemoryJobStore()
+        self._sqlite: SQLiteJobStore | None = None
+        # Fichiers de sortie à supprimer en arrière-plan
+        self._a_supprimer: Queue[str] = Queue()
+        self._ramasseur: Thread | None = None
     
     def create_job(self, conversion_type: str, target_format: str, files_count: int) -> str:
         """Créer un nouveau job.
@@ -32,51 +53,167 @@ class JobService:
             updated_at=utils.now_iso(),
         )
         
-        with self._lock:
-            self._jobs[job_id] = job
-            self._job_order.append(job_id)
-            
-            # Nettoyer les anciens jobs si limite dépassée
-            while len(self._job_order) > config.MAX_JOBS_MEMOIRE:
-                old_id = self._job_order.pop(0)
-                old_job = self._jobs.pop(old_id, None)
-                if old_job and old_job.api_output_path:
-                    utils.delete_file(old_job.api_output_path)
+        # Nettoyer les anciens jobs si limite dépassée
+        evinces = self._store().add(job, config.MAX_JOBS_MEMOIRE)
+        self._planifier_suppression([
+            chemin
+            for old_job in evinces if old_job.api_output_path
+            for chemin in (old_job.api_output_path, str(utils.thumbnail_path(Path(old_job.api_output_path))))
+        ])
         
+        self._notifier()
         return job_id
     
     def update_job(self, job_id: str, **kwargs) -> None:
         """Mettre à jour un job."""
-        with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
-                return
-            
-            for key, value in kwargs.items():
-                if hasattr(job, key):
-                    setattr(job, key, value)
-            job.updated_at = utils.now_iso()
+        if self._store().update(job_id, {**kwargs, "updated_at": utils.now_iso()}) is not None:
+            self._notifier()
     
     def get_job(self, job_id: str) -> Job | None:
         """Obtenir un job."""
-        with self._lock:
-            return self._jobs.get(job_id)
+        return self._store().get(job_id)
     
-    def get_recent_jobs(self, limit: int = 30) -> list[Job]:
+    def get_recent_jobs(self, limit: int = 30, status: str = "", conversion_type: str = "") -> list[Job]:
         """Obtenir les jobs récents.
         
         Args:
             limit: Nombre de jobs à retourner
-            
+            status: Filtrer par statut (index, sans parcourir tous les jobs)
+            conversion_type: Filtrer par type de conversion
+        
         Returns:
             Liste des jobs
         """
+        return self._store().recent(limit, status, conversion_type)
+    
+    @property
+    def epoque(self) -> str:
+        """Identifiant du store: la séquence d'un autre store (ou d'une autre instance) n'est pas comparable."""
+        return self._store().epoque
+    
+    @property
+    def sequence(self) -> int:
+        """Numéro du dernier changement (création ou mise à jour de job)."""
+        return self._store().sequence()
+    
+    def get_job_version(self, job_id: str) -> int | None:
+        """Séquence du dernier changement d'un job (None si inconnu)."""
+        return self._store().version(job_id)
+    
+    def snapshot(self, limit: int = 30, status: str = "", conversion_type: str = "") -> tuple[list[dict], int]:
+        """Obtenir les jobs récents (éventuellement filtrés) et la séquence correspondante, de façon cohérente.
+        
+        Returns:
+            Tuple (jobs sérialisés, séquence)
+        """
+        return self._store().snapshot(limit, status, conversion_type)
+    
+    def changes_since(self, sequence: int) -> tuple[list[dict], int]:
+        """Obtenir les jobs modifiés après `sequence`, du plus ancien changement au plus récent.
+        
+        Returns:
+            Tuple (jobs sérialisés, séquence courante)
+        """
+        return self._store().changes_since(sequence)
+    
+    def wait_for_changes(self, sequence: int, timeout: float) -> tuple[list[dict], int]:
+        """Attendre un changement postérieur à `sequence` (au plus `timeout` secondes).
+        
+        Returns:
+            Tuple (jobs modifiés, séquence courante); liste vide si rien n'a changé
+        """
+        store = self._store()
+        fin = time.monotonic() + timeout
+        with self._changement:
+            while store.sequence() <= sequence:
+                reste = fin - time.monotonic()
+                if reste <= 0:
+                    break
+                if store.INTERVALLE_SCRUTATION is not None:
+                    # Changements d'autres processus: seule la relecture les révèle
+                    reste = min(reste, store.INTERVALLE_SCRUTATION)
+                self._changement.wait(reste)
+        return store.changes_since(sequence)
+    
+    def _notifier(self) -> None:
+        """Réveiller les flux en attente d'un changement."""
+        with self._changement:
+            self._changement.notify_all()
+    
+    def _store(self) -> MemoryJobStore | SQLiteJobStore:
+        """Store courant selon JOBS_BACKEND (base SQLite ouverte au premier usage)."""
+        if config.JOBS_BACKEND != "sqlite":
+            return self._memoire
+        
+        with self._lock:
+            if self._sqlite is not None and self._sqlite.chemin == config.JOBS_PATH:
+                return self._sqlite
+            if self._sqlite is not None:
+                self._sqlite.close()
+            self._sqlite = SQLiteJobStore(config.JOBS_PATH)
+            return self._sqlite
+    
+    def wait_for_deletions(self) -> None:
+        """Attendre que les suppressions de fichiers planifiées soient faites."""
+        self._a_supprimer.join()
+    
+    def _planifier_suppression(self, chemins: list[str]) -> None:
+        """Confier des fichiers de sortie au thread de suppression."""
+        if not chemins:
+            return
+        
+        for chemin in chemins:
+            self._a_supprimer.put(chemin)
         with self._lock:
-            job_ids = list(reversed(self._job_order[-limit:]))
-            return [self._jobs[jid] for jid in job_ids if jid in self._jobs]
+            if self._ramasseur is None or not self._ramasseur.is_alive():
+                self._ramasseur = Thread(target=self._supprimer_en_fond, name="job-reaper", daemon=True)
+                self._ramasseur.start()
+    
+    def _supprimer_en_fond(self) -> None:
+        """Supprimer les fichiers planifiés, un par un."""
+        while True:
+            chemin = self._a_supprimer.get()
+            try:
+                utils.delete_file(chemin)
+            finally:
+                self._a_supprimer.task_done()
     
     def delete_job_output(self, job_id: str) -> None:
         """Supprimer le fichier de sortie d'un job."""
         job = self.get_job(job_id)
         if job and job.api_output_path:
             utils.delete_file(job.api_output_path)
+            utils.delete_file(str(utils.thumbnail_path(Path(job.api_output_path))))
+    
+    def submit(self, job_id: str, fonction, *args, **kwargs) -> None:
+        """Soumettre l'exécution d'un job au pool de workers.
+        
+        Le job reste `en_attente` jusqu'à sa prise en charge par un worker,
+        qui le passe `en_cours` avant d'appeler `fonction(*args, **kwargs)`.
+        
+        Raises:
+            ConversionError: Si la file d'attente est pleine
+        """
+        with self._lock:
+            if self._jobs_en_file >= config.MAX_JOBS_EN_ATTENTE:
+                raise ConversionError("File d'attente des jobs pleine, réessayez plus tard.")
+            self._jobs_en_file += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, config.JOBS_WORKERS),
+                    thread_name_prefix="job-worker",
+                )
+            executor = self._executor
+        
+        executor.submit(self._executer, job_id, fonction, args, kwargs)
+    
+    def _executer(self, job_id: str, fonction, args: tuple, kwargs: dict) -> None:
+        """Exécuter un job dans un worker."""
+        try:
+            self.update_job(job_id, status="en_cours")
+            fonction(*args, **kwargs)
+        except Exception:
+            self.update_job(job_id, status="erreur", message="Erreur inattendue")
+        finally:
+            with self._lock:
+                self._jobs_en_file -= 1
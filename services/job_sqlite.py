@@ -0,0 +1,200 @@
+"""Stockage SQLite des jobs, partagé entre processus."""
+
+import json
+import os
+import sqlite3
+import uuid
+from pathlib import Path
+from threading import Lock
+from models import Job
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    ordre INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    version INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT '',
+    type TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_version ON jobs(version);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, ordre);
+CREATE INDEX IF NOT EXISTS idx_jobs_type ON jobs(type, ordre);
+CREATE TABLE IF NOT EXISTS meta (
+    cle TEXT PRIMARY KEY,
+    valeur TEXT NOT NULL
+);
+"""
+
+
+class SQLiteJobStore:
+    """Jobs dans une base SQLite (mode WAL) lisible et modifiable par tous les workers.
+    
+    Les écritures sont des transactions `BEGIN IMMEDIATE`: la séquence globale
+    (table `meta`) et la version du job sont incrémentées atomiquement, même
+    si plusieurs processus écrivent en même temps. Les lectures de statut
+    passent par la clé primaire `id` et ne bloquent pas les écritures (WAL).
+    """
+    
+    # Les autres processus ne peuvent pas réveiller nos flux: la séquence est relue périodiquement
+    INTERVALLE_SCRUTATION: float | None = 0.5
+    
+    def __init__(self, chemin: Path):
+        self.chemin = chemin
+        self._lock = Lock()
+        self._pid: int | None = None
+        self._connexion: sqlite3.Connection | None = None
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        
+        with self._lock:
+            connexion = self._connecter()
+            connexion.execute("BEGIN IMMEDIATE")
+            connexion.execute("INSERT OR IGNORE INTO meta (cle, valeur) VALUES ('sequence', '0')")
+            connexion.execute(
+                "INSERT OR IGNORE INTO meta (cle, valeur) VALUES ('epoque', ?)", (uuid.uuid4().hex[:8],)
+            )
+            connexion.execute("COMMIT")
+            # Commune à tous les processus: les ETag restent valables d'un worker à l'autre
+            self.epoque = connexion.execute("SELECT valeur FROM meta WHERE cle = 'epoque'").fetchone()[0]
+    
+    def add(self, job: Job, limite: int) -> list[Job]:
+        """Ajouter un job et retourner les jobs évincés au-delà de `limite`."""
+        with self._lock:
+            connexion = self._connecter()
+            connexion.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._incrementer(connexion)
+                connexion.execute(
+                    "INSERT INTO jobs (id, version, status, type, data) VALUES (?, ?, ?, ?, ?)",
+                    (job.id, version, job.status, job.type, json.dumps(job.to_dict(), ensure_ascii=False)),
+                )
+                evinces = connexion.execute(
+                    "SELECT ordre, data FROM jobs ORDER BY ordre DESC LIMIT -1 OFFSET ?", (limite,)
+                ).fetchall()
+                if evinces:
+                    connexion.execute("DELETE FROM jobs WHERE ordre <= ?", (evinces[0][0],))
+                connexion.execute("COMMIT")
+            except BaseException:
+                connexion.execute("ROLLBACK")
+                raise
+        return [Job.from_dict(json.loads(data)) for _, data in evinces]
+    
+    def update(self, job_id: str, champs: dict) -> Job | None:
+        """Modifier les champs d'un job (None si inconnu)."""
+        with self._lock:
+            connexion = self._connecter()
+            connexion.execute("BEGIN IMMEDIATE")
+            try:
+                ligne = connexion.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+                if ligne is None:
+                    connexion.execute("ROLLBACK")
+                    return None
+                
+                job = Job.from_dict(json.loads(ligne[0]))
+                for key, value in champs.items():
+                    if hasattr(job, key):
+                        setattr(job, key, value)
+                connexion.execute(
+                    "UPDATE jobs SET version = ?, status = ?, type = ?, data = ? WHERE id = ?",
+                    (
+                        self._incrementer(connexion),
+                        job.status,
+                        job.type,
+                        json.dumps(job.to_dict(), ensure_ascii=False),
+                        job_id,
+                    ),
+                )
+                connexion.execute("COMMIT")
+            except BaseException:
+                connexion.execute("ROLLBACK")
+                raise
+        return job
+    
+    def get(self, job_id: str) -> Job | None:
+        """Obtenir un job."""
+        with self._lock:
+            ligne = self._connecter().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_dict(json.loads(ligne[0])) if ligne else None
+    
+    def recent(self, limit: int, status: str = "", conversion_type: str = "") -> list[Job]:
+        """Jobs les plus récents en premier, éventuellement filtrés par statut et type."""
+        return [Job.from_dict(data) for data in self.snapshot(limit, status, conversion_type)[0]]
+    
+    def snapshot(self, limit: int, status: str = "", conversion_type: str = "") -> tuple[list[dict], int]:
+        """Jobs récents sérialisés et séquence correspondante (lus dans une même transaction)."""
+        conditions = []
+        parametres: list = []
+        if status:
+            conditions.append("status = ?")
+            parametres.append(status)
+        if conversion_type:
+            conditions.append("type = ?")
+            parametres.append(conversion_type)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with self._lock:
+            connexion = self._connecter()
+            connexion.execute("BEGIN")
+            lignes = connexion.execute(
+                f"SELECT data FROM jobs {where} ORDER BY ordre DESC LIMIT ?", (*parametres, limit)
+            ).fetchall()
+            sequence = self._lire_sequence(connexion)
+            connexion.execute("COMMIT")
+        return [json.loads(data) for data, in lignes], sequence
+    
+    def changes_since(self, sequence: int) -> tuple[list[dict], int]:
+        """Jobs modifiés après `sequence` (du plus ancien changement au plus récent) et séquence courante."""
+        with self._lock:
+            connexion = self._connecter()
+            connexion.execute("BEGIN")
+            lignes = connexion.execute(
+                "SELECT data FROM jobs WHERE version > ? ORDER BY version", (sequence,)
+            ).fetchall()
+            courante = self._lire_sequence(connexion)
+            connexion.execute("COMMIT")
+        return [json.loads(data) for data, in lignes], courante
+    
+    def sequence(self) -> int:
+        """Numéro du dernier changement, tous processus confondus."""
+        with self._lock:
+            return self._lire_sequence(self._connecter())
+    
+    def version(self, job_id: str) -> int | None:
+        """Séquence du dernier changement d'un job (None si inconnu)."""
+        with self._lock:
+            ligne = self._connecter().execute("SELECT version FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return ligne[0] if ligne else None
+    
+    def close(self) -> None:
+        """Fermer la connexion."""
+        with self._lock:
+            if self._connexion is not None:
+                self._connexion.close()
+                self._connexion = None
+    
+    def _connecter(self) -> sqlite3.Connection:
+        """Connexion du processus courant (rouverte après un fork) (verrou détenu)."""
+        if self._connexion is not None and self._pid == os.getpid():
+            return self._connexion
+        
+        # Une connexion héritée d'un fork ne doit pas être réutilisée
+        self._connexion = sqlite3.connect(
+            str(self.chemin), check_same_thread=False, isolation_level=None, timeout=5
+        )
+        self._pid = os.getpid()
+        self._connexion.execute("PRAGMA journal_mode=WAL")
+        self._connexion.execute("PRAGMA synchronous=NORMAL")
+        self._connexion.executescript(SCHEMA)
+        return self._connexion
+    
+    @staticmethod
+    def _lire_sequence(connexion: sqlite3.Connection) -> int:
+        """Lire la séquence globale."""
+        return int(connexion.execute("SELECT valeur FROM meta WHERE cle = 'sequence'").fetchone()[0])
+    
+    def _incrementer(self, connexion: sqlite3.Connection) -> int:
+        """Incrémenter la séquence globale (transaction d'écriture ouverte)."""
+        sequence = self._lire_sequence(connexion) + 1
+        connexion.execute("UPDATE meta SET valeur = ? WHERE cle = 'sequence'", (str(sequence),))
+        return sequence
@@ -0,0 +1,141 @@
+"""Stockage des jobs en mémoire."""
+
+import heapq
+import uuid
+from collections import OrderedDict
+from itertools import count, islice
+from threading import Lock
+from models import Job
+
+
+class MemoryJobStore:
+    """Jobs gardés dans le processus courant (perdus au redémarrage).
+    
+    Les jobs sont rangés par ordre de création (OrderedDict: éviction du plus
+    ancien en O(1)) et indexés par statut et par type. Chaque création ou
+    mise à jour incrémente une séquence globale; `_versions` est gardé trié
+    par dernier changement, si bien que `changes_since` ne parcourt que les
+    jobs réellement modifiés. Interface commune avec SQLiteJobStore,
+    utilisée par JobService.
+    """
+    
+    # Les changements sont notifiés par JobService: pas besoin de scruter
+    INTERVALLE_SCRUTATION: float | None = None
+    
+    def __init__(self):
+        self._lock = Lock()
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        # Rang de création, pour trier les résultats d'un index
+        self._rangs: dict[str, int] = {}
+        self._compteur = count()
+        self._par_statut: dict[str, set[str]] = {}
+        self._par_type: dict[str, set[str]] = {}
+        self._sequence = 0
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        # La séquence repart de zéro au redémarrage: l'époque distingue les instances (ETag)
+        self.epoque = uuid.uuid4().hex[:8]
+    
+    def add(self, job: Job, limite: int) -> list[Job]:
+        """Ajouter un job et retourner les jobs évincés au-delà de `limite`."""
+        evinces = []
+        with self._lock:
+            self._jobs[job.id] = job
+            self._rangs[job.id] = next(self._compteur)
+            self._indexer(job)
+            
+            while len(self._jobs) > limite:
+                old_id, old_job = self._jobs.popitem(last=False)
+                del self._rangs[old_id]
+                self._versions.pop(old_id, None)
+                self._desindexer(old_job)
+                evinces.append(old_job)
+            
+            self._signaler(job.id)
+        return evinces
+    
+    def update(self, job_id: str, champs: dict) -> Job | None:
+        """Modifier les champs d'un job (None si inconnu)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            
+            self._desindexer(job)
+            for key, value in champs.items():
+                if hasattr(job, key):
+                    setattr(job, key, value)
+            self._indexer(job)
+            self._signaler(job_id)
+            return job
+    
+    def get(self, job_id: str) -> Job | None:
+        """Obtenir un job."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def recent(self, limit: int, status: str = "", conversion_type: str = "") -> list[Job]:
+        """Jobs les plus récents en premier, éventuellement filtrés par statut et type."""
+        with self._lock:
+            return self._recents(limit, status, conversion_type)
+    
+    def snapshot(self, limit: int, status: str = "", conversion_type: str = "") -> tuple[list[dict], int]:
+        """Jobs récents sérialisés et séquence correspondante."""
+        with self._lock:
+            return [job.to_dict() for job in self._recents(limit, status, conversion_type)], self._sequence
+    
+    def changes_since(self, sequence: int) -> tuple[list[dict], int]:
+        """Jobs modifiés après `sequence` (du plus ancien changement au plus récent) et séquence courante."""
+        with self._lock:
+            modifies = []
+            for job_id, version in reversed(self._versions.items()):
+                if version <= sequence:
+                    break
+                modifies.append(self._jobs[job_id].to_dict())
+            return modifies[::-1], self._sequence
+    
+    def sequence(self) -> int:
+        """Numéro du dernier changement."""
+        with self._lock:
+            return self._sequence
+    
+    def version(self, job_id: str) -> int | None:
+        """Séquence du dernier changement d'un job (None si inconnu)."""
+        with self._lock:
+            return self._versions.get(job_id)
+    
+    def close(self) -> None:
+        """Rien à libérer."""
+    
+    def _recents(self, limit: int, status: str, conversion_type: str) -> list[Job]:
+        """Jobs récents filtrés (verrou détenu)."""
+        if not status and not conversion_type:
+            return [self._jobs[jid] for jid in islice(reversed(self._jobs), limit)]
+        
+        # Intersection des index, puis les `limit` rangs de création les plus élevés
+        candidats = None
+        for index, valeur in ((self._par_statut, status), (self._par_type, conversion_type)):
+            if valeur:
+                ids = index.get(valeur, set())
+                candidats = ids if candidats is None else candidats & ids
+        job_ids = heapq.nlargest(limit, candidats, key=self._rangs.__getitem__)
+        return [self._jobs[jid] for jid in job_ids]
+    
+    def _indexer(self, job: Job) -> None:
+        """Ajouter un job aux index statut et type (verrou détenu)."""
+        self._par_statut.setdefault(job.status, set()).add(job.id)
+        self._par_type.setdefault(job.type, set()).add(job.id)
+    
+    def _desindexer(self, job: Job) -> None:
+        """Retirer un job des index statut et type (verrou détenu)."""
+        for index, valeur in ((self._par_statut, job.status), (self._par_type, job.type)):
+            ids = index.get(valeur)
+            if ids is not None:
+                ids.discard(job.id)
+                if not ids:
+                    del index[valeur]
+    
+    def _signaler(self, job_id: str) -> None:
+        """Enregistrer un changement de job (verrou détenu)."""
+        self._sequence += 1
+        self._versions[job_id] = self._sequence
+        self._versions.move_to_end(job_id)
@@ -1,46 +1,72 @@
 """Service de gestion des profils de conversion."""
 
+import copy
 import json
+import os
 import uuid
-from threading import Lock
+from threading import RLock
 from pathlib import Path
 from models import Profile
 import config
 
 
 class ProfileService:
-    """Gère les profils de conversion."""
+    """Gère les profils de conversion.
+    
+    Les profils sont gardés en mémoire (listes par type et index par id) et
+    `profiles.json` n'est relu que si sa date de modification ou sa taille a
+    changé (modification externe). Les écritures passent par un fichier
+    temporaire renommé atomiquement, puis mettent le cache à jour.
+    """
     
     def __init__(self):
-        self._lock = Lock()
+        self._lock = RLock()
+        # (chemin, mtime_ns, taille) du fichier correspondant au cache
+        self._signature: tuple | None = None
+        self._profils: dict[str, list[dict]] = {}
+        self._par_id: dict[str, tuple[str, dict]] = {}
     
     def load_all(self) -> dict[str, list[dict]]:
-        """Charger tous les profils."""
-        if not config.PROFILS_PATH.exists():
-            return config.PROFILS_PAR_DEFAUT
-        
-        try:
-            data = json.loads(config.PROFILS_PATH.read_text(encoding="utf-8"))
-            return data if isinstance(data, dict) else config.PROFILS_PAR_DEFAUT
-        except Exception:
-            return config.PROFILS_PAR_DEFAUT
+        """Charger tous les profils (copie modifiable)."""
+        with self._lock:
+            self._actualiser()
+            return copy.deepcopy(self._profils)
     
     def get_profiles(self, conversion_type: str | None = None) -> dict[str, list[dict]] | list[dict]:
         """Obtenir les profils.
         
+        Les structures retournées sont partagées avec le cache: ne pas les modifier.
+        
         Args:
             conversion_type: Type spécifique ou None pour tous
-            
+        
         Returns:
             Profils filtrés ou tous les profils
         """
         with self._lock:
-            all_profiles = self.load_all()
+            self._actualiser()
             
             if conversion_type is None:
-                return all_profiles
+                return self._profils
             
-            return all_profiles.get(conversion_type, [])
+            return self._profils.get(conversion_type, [])
+    
+    def get_profile(self, profile_id: str, conversion_type: str | None = None) -> dict | None:
+        """Obtenir un profil par son id (recherche dans l'index, partagé avec le cache).
+        
+        Args:
+            profile_id: ID du profil
+            conversion_type: Type attendu, ou None pour tous types confondus
+        
+        Returns:
+            Le profil, ou None s'il est introuvable ou d'un autre type
+        """
+        with self._lock:
+            self._actualiser()
+            trouve = self._par_id.get(profile_id)
+            if trouve is None or conversion_type not in (None, trouve[0]):
+                return None
+            return trouve[1]
     
     def add_profile(
         self,
@@ -48,8 +74,9 @@ class ProfileService:
         name: str,
         source: str,
         target: str,
+        options: dict | None = None,
     ) -> dict:
-        """Ajouter un profil.
+        """Ajouter un profil, avec d'éventuelles options de conversion (ex. max_width).
         
         Returns:
             Le profil créé
@@ -61,14 +88,15 @@ class ProfileService:
             "source": source,
             "target": target,
         }
+        if options:
+            new_profile["options"] = options
         
         with self._lock:
-            profiles = self.load_all()
-            if conversion_type not in profiles:
-                profiles[conversion_type] = []
-            
-            profiles[conversion_type].append(new_profile)
-            self._save(profiles)
+            self._actualiser()
+            self._save({
+                **self._profils,
+                conversion_type: [*self._profils.get(conversion_type, []), new_profile],
+            })
         
         return new_profile
     
@@ -79,22 +107,71 @@ class ProfileService:
             True si supprimé, False si non trouvé
         """
         with self._lock:
-            profiles = self.load_all()
-            if conversion_type in profiles:
-                original_len = len(profiles[conversion_type])
-                profiles[conversion_type] = [
-                    p for p in profiles[conversion_type] if p["id"] != profile_id
-                ]
-                
-                if len(profiles[conversion_type]) < original_len:
-                    self._save(profiles)
-                    return True
-        
-        return False
+            self._actualiser()
+            restants = [
+                p for p in self._profils.get(conversion_type, []) if p.get("id") != profile_id
+            ]
+            if len(restants) == len(self._profils.get(conversion_type, [])):
+                return False
+            
+            self._save({**self._profils, conversion_type: restants})
+            return True
     
     def _save(self, profiles: dict[str, list[dict]]) -> None:
-        """Sauvegarder les profils."""
-        config.PROFILS_PATH.write_text(
-            json.dumps(profiles, ensure_ascii=False, indent=2) + "\n",
-            encoding="utf-8"
-        )
+        """Sauvegarder les profils (renommage atomique) et mettre le cache à jour."""
+        with self._lock:
+            chemin = config.PROFILS_PATH
+            temporaire = chemin.with_name(f".{chemin.name}.{uuid.uuid4().hex}.tmp")
+            temporaire.write_text(
+                json.dumps(profiles, ensure_ascii=False, indent=2) + "\n",
+                encoding="utf-8"
+            )
+            os.replace(temporaire, chemin)
+            
+            # Copie: l'appelant peut continuer à modifier son dictionnaire
+            self._indexer(copy.deepcopy(profiles))
+            self._signature = self._signature_fichier()
+    
+    def _actualiser(self) -> None:
+        """Recharger le cache si le fichier a changé depuis la dernière lecture (verrou détenu)."""
+        signature = self._signature_fichier()
+        if signature == self._signature:
+            return
+        
+        self._indexer(self._lire_fichier())
+        self._signature = signature
+    
+    @staticmethod
+    def _signature_fichier() -> tuple:
+        """Identifier la version du fichier sans le lire."""
+        chemin = config.PROFILS_PATH
+        try:
+            stat = chemin.stat()
+        except OSError:
+            return (chemin, None, None)
+        return (chemin, stat.st_mtime_ns, stat.st_size)
+    
+    @staticmethod
+    def _lire_fichier() -> dict[str, list[dict]]:
+        """Lire `profiles.json` (profils par défaut s'il est absent ou invalide)."""
+        if not config.PROFILS_PATH.exists():
+            return copy.deepcopy(config.PROFILS_PAR_DEFAUT)
+        
+        try:
+            data = json.loads(config.PROFILS_PATH.read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else copy.deepcopy(config.PROFILS_PAR_DEFAUT)
+        except Exception:
+            return copy.deepcopy(config.PROFILS_PAR_DEFAUT)
+    
+    def _indexer(self, profiles: dict[str, list[dict]]) -> None:
+        """Remplacer le cache: listes par type et index par id (verrou détenu)."""
+        self._profils = {
+            conversion_type: liste if isinstance(liste, list) else []
+            for conversion_type, liste in profiles.items()
+        }
+        self._par_id = {
+            profil["id"]: (conversion_type, profil)
+            for conversion_type, liste in self._profils.items()
+            for profil in liste
+            if isinstance(profil, dict) and "id" in profil
+        }
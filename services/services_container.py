@@ -4,11 +4,15 @@ from services.job_service import JobService
 from services.history_service import HistoryService
 from services.profile_service import ProfileService
 from services.conversion_service import ConversionService
+from services.cache_service import CacheService
+from services.upload_service import UploadService
 
 # Instances uniques et partagées pour toute l'application
 job_service = JobService()
 history_service = HistoryService()
 profile_service = ProfileService()
-conversion_service = ConversionService()
+cache_service = CacheService()
+conversion_service = ConversionService(cache=cache_service)
+upload_service = UploadService()
 
-__all__ = ["job_service", "history_service", "profile_service", "conversion_service"]
\ No newline at end of file
+__all__ = ["job_service", "history_service", "profile_service", "conversion_service", "cache_service", "upload_service"]
\ No newline at end of file
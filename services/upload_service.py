@@ -0,0 +1,253 @@
+"""Service des envois fractionnés (reprise possible)."""
+
+import hashlib
+import json
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO
+from werkzeug.utils import secure_filename
+
+from models import UploadError
+import config
+import utils
+
+
+class UploadService:
+    """Gère les envois fractionnés de gros fichiers.
+    
+    Chaque envoi a un dossier `REP_ENVOIS/<id>/` contenant `meta.json`
+    (écrit une fois à la création), `data` (fichier préalloué à sa taille
+    finale, où chaque fragment est écrit à sa position) et `recus/`: un
+    fichier vide `<début>-<fin>` par fragment vérifié. Aucun état n'est
+    réécrit: plusieurs workers peuvent recevoir les fragments d'un même
+    envoi, et l'état de reprise se lit en listant `recus/`.
+    """
+    
+    TAILLE_BLOC = 1024 * 1024
+    
+    def create(self, filename: str, size: int, mimetype: str = "") -> dict:
+        """Créer un envoi.
+        
+        Raises:
+            UploadError: Si le nom ou la taille est invalide
+        """
+        nom = secure_filename(filename or "")
+        if not Path(nom).suffix:
+            raise UploadError("Le nom du fichier doit comporter une extension.")
+        if size <= 0:
+            raise UploadError("La taille du fichier doit être positive.")
+        if size > config.ENVOI_TAILLE_MAX:
+            raise UploadError("Fichier au-delà de la limite autorisée pour un envoi fractionné.", 413)
+        
+        self._purger_expires()
+        
+        upload_id = uuid.uuid4().hex
+        dossier = self._dossier(upload_id)
+        (dossier / "recus").mkdir(parents=True)
+        with (dossier / "data").open("wb") as fichier:
+            # Fichier creux de la taille finale: les fragments peuvent arriver dans le désordre
+            fichier.truncate(size)
+        meta = {
+            "upload_id": upload_id,
+            "filename": nom,
+            "size": size,
+            "mimetype": mimetype,
+            "chunk_size": config.ENVOI_TAILLE_FRAGMENT,
+            "created_at": time.time(),
+        }
+        (dossier / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        return self.status(upload_id)
+    
+    def write_chunk(
+        self,
+        upload_id: str,
+        start: int,
+        length: int,
+        stream: BinaryIO,
+        sha256: str = "",
+    ) -> dict:
+        """Écrire un fragment à sa position en lisant le flux par blocs.
+        
+        Le fragment est d'abord reçu dans un fichier temporaire du dossier de
+        l'envoi; il n'est recopié dans `data` qu'une fois sa longueur et son
+        empreinte vérifiées. Un renvoi incomplet ou corrompu d'une plage déjà
+        reçue ne remplace donc pas des octets vérifiés.
+        
+        Args:
+            upload_id: ID de l'envoi
+            start: Position du premier octet
+            length: Nombre d'octets annoncés
+            stream: Flux du corps de la requête
+            sha256: Empreinte hexadécimale attendue du fragment (optionnelle)
+        
+        Returns:
+            État de l'envoi (voir `status`)
+        
+        Raises:
+            UploadError: Envoi inconnu (404), déjà terminé (409), plage invalide (416),
+                fragment incomplet ou empreinte incorrecte (400)
+        """
+        meta = self._meta(upload_id)
+        if start < 0 or length <= 0 or start + length > meta["size"]:
+            raise UploadError("Plage d'octets invalide pour cet envoi.", 416)
+        if length > config.ENVOI_TAILLE_FRAGMENT:
+            raise UploadError("Fragment plus grand que la taille autorisée.", 413)
+        if (self._dossier(upload_id) / "termine").exists():
+            raise UploadError("Envoi déjà terminé.", 409)
+        
+        dossier = self._dossier(upload_id)
+        temporaire = dossier / f"fragment-{uuid.uuid4().hex}"
+        try:
+            empreinte = hashlib.sha256()
+            restant = length
+            with temporaire.open("wb") as fichier:
+                while restant:
+                    bloc = stream.read(min(self.TAILLE_BLOC, restant))
+                    if not bloc:
+                        break
+                    fichier.write(bloc)
+                    empreinte.update(bloc)
+                    restant -= len(bloc)
+            
+            # Fragment non enregistré: `data` est intact, il sera renvoyé
+            if restant:
+                raise UploadError("Fragment incomplet: renvoyez-le.")
+            if sha256 and empreinte.hexdigest() != sha256.strip().lower():
+                raise UploadError("Empreinte SHA-256 du fragment incorrecte: renvoyez-le.")
+            
+            with temporaire.open("rb") as source, (dossier / "data").open("r+b") as fichier:
+                fichier.seek(start)
+                shutil.copyfileobj(source, fichier, self.TAILLE_BLOC)
+        finally:
+            temporaire.unlink(missing_ok=True)
+        
+        (dossier / "recus" / f"{start}-{start + length}").touch()
+        return self.status(upload_id)
+    
+    def status(self, upload_id: str) -> dict:
+        """Obtenir l'état d'un envoi: plages reçues (fin exclue) et complétude.
+        
+        Raises:
+            UploadError: Si l'envoi est inconnu (404)
+        """
+        meta = self._meta(upload_id)
+        plages = self._plages(upload_id)
+        recu = sum(fin - debut for debut, fin in plages)
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "chunk_size": meta["chunk_size"],
+            "received": recu,
+            "ranges": plages,
+            "complete": recu == meta["size"],
+            "finalized": (self._dossier(upload_id) / "termine").exists(),
+        }
+    
+    def finalize(self, upload_id: str, sha256: str = "") -> dict:
+        """Terminer un envoi: vérifier qu'il est complet et, si fournie, l'empreinte du fichier.
+        
+        Args:
+            upload_id: ID de l'envoi
+            sha256: Empreinte hexadécimale attendue du fichier complet (optionnelle)
+        
+        Returns:
+            État de l'envoi
+        
+        Raises:
+            UploadError: Envoi inconnu (404), incomplet (409) ou empreinte incorrecte (400)
+        """
+        etat = self.status(upload_id)
+        if not etat["complete"]:
+            raise UploadError("Envoi incomplet: des fragments sont manquants.", 409)
+        
+        dossier = self._dossier(upload_id)
+        if sha256 and utils.sha256_file(dossier / "data") != sha256.strip().lower():
+            raise UploadError("Empreinte SHA-256 du fichier incorrecte.")
+        
+        (dossier / "termine").touch()
+        return {**etat, "finalized": True}
+    
+    def take(self, upload_id: str) -> tuple[str, Path, str]:
+        """Retirer un envoi terminé pour le convertir.
+        
+        Le fichier est déplacé dans REP_SPOOL (l'appelant le supprime après
+        conversion) et le dossier de l'envoi est supprimé.
+        
+        Returns:
+            Tuple (nom_fichier, chemin, mimetype)
+        
+        Raises:
+            UploadError: Envoi inconnu (404) ou non terminé (409)
+        """
+        meta = self._meta(upload_id)
+        dossier = self._dossier(upload_id)
+        if not (dossier / "termine").exists():
+            raise UploadError("Envoi non terminé: appelez d'abord /complete.", 409)
+        
+        config.REP_SPOOL.mkdir(parents=True, exist_ok=True)
+        chemin = config.REP_SPOOL / f"{upload_id}{Path(meta['filename']).suffix.lower()}"
+        try:
+            (dossier / "data").replace(chemin)
+        except FileNotFoundError as e:
+            # Déjà retiré par une requête concurrente
+            raise UploadError("Envoi introuvable.", 404) from e
+        shutil.rmtree(dossier, ignore_errors=True)
+        return meta["filename"], chemin, meta["mimetype"]
+    
+    def delete(self, upload_id: str) -> bool:
+        """Abandonner un envoi.
+        
+        Returns:
+            True si supprimé, False si inconnu
+        """
+        dossier = self._dossier(upload_id)
+        if not dossier.exists():
+            return False
+        shutil.rmtree(dossier, ignore_errors=True)
+        return True
+    
+    def _dossier(self, upload_id: str) -> Path:
+        """Dossier d'un envoi (l'ID est vérifié: pas de chemin arbitraire)."""
+        if len(upload_id) != 32 or not all(c in "0123456789abcdef" for c in upload_id):
+            raise UploadError("Envoi introuvable.", 404)
+        return config.REP_ENVOIS / upload_id
+    
+    def _meta(self, upload_id: str) -> dict:
+        """Lire les métadonnées d'un envoi."""
+        try:
+            return json.loads((self._dossier(upload_id) / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise UploadError("Envoi introuvable.", 404) from e
+    
+    def _plages(self, upload_id: str) -> list[list[int]]:
+        """Plages reçues, fusionnées et triées."""
+        plages = []
+        for marqueur in (self._dossier(upload_id) / "recus").iterdir():
+            debut, _, fin = marqueur.name.partition("-")
+            if debut.isdigit() and fin.isdigit():
+                plages.append((int(debut), int(fin)))
+        
+        fusion: list[list[int]] = []
+        for debut, fin in sorted(plages):
+            if fusion and debut <= fusion[-1][1]:
+                fusion[-1][1] = max(fusion[-1][1], fin)
+            else:
+                fusion.append([debut, fin])
+        return fusion
+    
+    @staticmethod
+    def _purger_expires() -> None:
+        """Supprimer les envois non convertis (terminés ou non) créés depuis plus de ENVOI_EXPIRATION secondes."""
+        if not config.REP_ENVOIS.exists():
+            return
+        
+        limite = time.time() - config.ENVOI_EXPIRATION
+        for dossier in config.REP_ENVOIS.iterdir():
+            try:
+                if (dossier / "meta.json").stat().st_mtime < limite:
+                    shutil.rmtree(dossier, ignore_errors=True)
+            except OSError:
+                continue
@@ -0,0 +1,133 @@
+"""Écriture d'archives ZIP en flux."""
+
+import hashlib
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterator
+
+
+# Formats déjà compressés: les dégonfler coûte du CPU sans réduire la taille
+FORMATS_STOCKES = {"png", "jpg", "jpeg", "webp", "mp3", "mp4", "docx", "pdf"}
+
+# Taille des blocs écrits dans une entrée (et donc des morceaux produits)
+TAILLE_BLOC = 256 * 1024
+
+
+def compression_pour(nom: str) -> int:
+    """Choisir la méthode de compression d'une entrée selon son extension."""
+    extension = Path(nom).suffix.lower().lstrip(".")
+    if extension in FORMATS_STOCKES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _Tampon:
+    """Flux non positionnable qui accumule les octets écrits par zipfile.
+    
+    Sans `tell`/`seek`, zipfile écrit chaque entrée d'une traite suivie d'un
+    descripteur de données: rien n'est réécrit, tout peut partir sur le réseau.
+    """
+    
+    def __init__(self, copie=None):
+        self._morceaux: list[bytes] = []
+        self._copie = copie
+        self.empreinte = hashlib.sha256()
+    
+    def write(self, donnees) -> int:
+        donnees = bytes(donnees)
+        self._morceaux.append(donnees)
+        self.empreinte.update(donnees)
+        if self._copie is not None:
+            self._copie.write(donnees)
+        return len(donnees)
+    
+    def flush(self) -> None:
+        if self._copie is not None:
+            self._copie.flush()
+    
+    def detacher_copie(self) -> None:
+        """Ne plus recopier les écritures sur disque."""
+        self._copie = None
+    
+    def vider(self) -> bytes:
+        """Retirer et retourner les octets accumulés."""
+        donnees = b"".join(self._morceaux)
+        self._morceaux.clear()
+        return donnees
+
+
+class ZipStreamWriter:
+    """Produit une archive ZIP morceau par morceau, entrée après entrée.
+    
+    Chaque appel à `ajouter` produit les octets de l'entrée dès qu'ils sont
+    compressés; `terminer` produit le répertoire central. Si `copie` est
+    fourni, l'archive est aussi écrite sur disque (téléchargement ultérieur).
+    
+    Exemple:
+        writer = ZipStreamWriter()
+        yield from writer.ajouter("a.yaml", donnees)
+        yield from writer.terminer()
+    """
+    
+    def __init__(self, copie: Path | None = None):
+        self._chemin_copie = copie
+        self._fichier_copie = copie.open("wb") if copie is not None else None
+        self._tampon = _Tampon(self._fichier_copie)
+        self._zip = zipfile.ZipFile(self._tampon, mode="w")
+    
+    def ajouter(self, nom: str, donnees: bytes | Path) -> Iterator[bytes]:
+        """Écrire une entrée (octets, ou fichier lu par blocs) et produire les octets correspondants."""
+        info = zipfile.ZipInfo(nom, date_time=time.localtime()[:6])
+        info.compress_type = compression_pour(nom)
+        # Taille connue d'avance: zipfile choisit seul le format ZIP64 si nécessaire
+        info.file_size = donnees.stat().st_size if isinstance(donnees, Path) else len(donnees)
+        
+        with self._zip.open(info, mode="w") as entree:
+            for bloc in self._blocs(donnees):
+                entree.write(bloc)
+                morceau = self._tampon.vider()
+                if morceau:
+                    yield morceau
+        
+        morceau = self._tampon.vider()
+        if morceau:
+            yield morceau
+    
+    @staticmethod
+    def _blocs(donnees: bytes | Path) -> Iterator[bytes | memoryview]:
+        """Découper une entrée en blocs de TAILLE_BLOC."""
+        if isinstance(donnees, Path):
+            with donnees.open("rb") as fichier:
+                while bloc := fichier.read(TAILLE_BLOC):
+                    yield bloc
+            return
+        
+        vue = memoryview(donnees)
+        for debut in range(0, len(vue), TAILLE_BLOC):
+            yield vue[debut:debut + TAILLE_BLOC]
+    
+    def terminer(self) -> Iterator[bytes]:
+        """Écrire le répertoire central et fermer l'archive."""
+        self._zip.close()
+        if self._fichier_copie is not None:
+            self._fichier_copie.close()
+        yield self._tampon.vider()
+    
+    @property
+    def sha256(self) -> str:
+        """SHA-256 hexadécimal des octets produits (toute l'archive après `terminer`)."""
+        return self._tampon.empreinte.hexdigest()
+    
+    def abandonner(self) -> None:
+        """Interrompre l'archive (client déconnecté, erreur) et supprimer la copie."""
+        self._tampon.detacher_copie()
+        try:
+            self._zip.close()
+        except ValueError:
+            # Entrée encore ouverte: l'archive est de toute façon abandonnée
+            pass
+        self._tampon.vider()
+        if self._fichier_copie is not None:
+            self._fichier_copie.close()
+            self._chemin_copie.unlink(missing_ok=True)
@@ -149,7 +149,7 @@ async function renderPreviewForFile(file, container) {
 
   const ext = getFileExtension(file.name);
   const imageExt = new Set(['png', 'jpg', 'jpeg', 'webp', 'svg']);
-  const textExt = new Set(['txt', 'json', 'yaml', 'yml', 'csv', 'md', 'log', 'conf']);
+  const textExt = new Set(['txt', 'json', 'yaml', 'yml', 'ndjson', 'jsonl', 'csv', 'md', 'log', 'conf']);
   const audioExt = new Set(['mp3', 'wav', 'mp4', 'm4a', 'ogg']);
 
   const meta = document.createElement('div');
@@ -238,32 +238,107 @@ async function updateFilePreview(input) {
   await renderPreviewForFile(files[0], container);
 }
 
+// Suivi des jobs: flux SSE /api/jobs/stream, repli sur le polling de /api/jobs
+const JOBS_POLL_INTERVAL = 5000;
+const JOBS_MAX_DISPLAYED = 30;
+const jobsWatchers = [];
+const jobsById = new Map();
+let jobsSource = null;
+let jobsPollTimer = null;
+
+function currentJobs() {
+  return Array.from(jobsById.values())
+    .sort((a, b) => (b.created_at || '').localeCompare(a.created_at || ''));
+}
+
+function notifyJobsWatchers(error) {
+  const jobs = error ? null : currentJobs();
+  jobsWatchers.forEach(callback => callback(jobs, error));
+}
+
+// replace=true: liste complète (snapshot, polling); sinon seulement les jobs modifiés
+function applyJobs(jobs, replace) {
+  if (!Array.isArray(jobs)) return;
+  if (replace) jobsById.clear();
+  jobs.forEach(job => jobsById.set(job.id, job));
+  // Ne garder que les jobs affichés: la map ne grossit pas au fil des deltas
+  if (jobsById.size > JOBS_MAX_DISPLAYED) {
+    currentJobs().slice(JOBS_MAX_DISPLAYED).forEach(job => jobsById.delete(job.id));
+  }
+  notifyJobsWatchers(null);
+}
+
 async function refreshJobs() {
-  const tbody = document.getElementById('jobs_body');
   try {
-    const response = await fetch('/api/jobs', { cache: 'no-store' });
-    const jobs = await response.json();
-    if (!Array.isArray(jobs) || jobs.length === 0) {
-      tbody.innerHTML = '<tr><td colspan="6" class="text-muted">Aucun job pour le moment.</td></tr>';
-      return;
+    // no-cache: le navigateur revalide avec l'ETag et réutilise sa copie sur 304
+    const response = await fetch('/api/jobs', { cache: 'no-cache' });
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    applyJobs(await response.json(), true);
+  } catch (err) {
+    notifyJobsWatchers(err);
+  }
+}
+
+function startJobsPolling() {
+  if (jobsPollTimer) return;
+  refreshJobs();
+  jobsPollTimer = setInterval(refreshJobs, JOBS_POLL_INTERVAL);
+}
+
+function startJobsStream() {
+  if (!window.EventSource) {
+    startJobsPolling();
+    return;
+  }
+
+  jobsSource = new EventSource('/api/jobs/stream');
+  jobsSource.addEventListener('snapshot', event => applyJobs(JSON.parse(event.data), true));
+  jobsSource.addEventListener('jobs', event => applyJobs(JSON.parse(event.data), false));
+  jobsSource.onerror = () => {
+    // EventSource se reconnecte seul (avec Last-Event-ID); s'il abandonne, passer au polling
+    if (jobsSource.readyState === EventSource.CLOSED) {
+      jobsSource = null;
+      startJobsPolling();
     }
+  };
+}
 
-    tbody.innerHTML = jobs.map(job => {
-      const badge = badgeForStatus(job.status);
-      return `
-        <tr>
-          <td>${job.id.slice(0, 8)}</td>
-          <td>${job.type}</td>
-          <td>${job.target_format}</td>
-          <td><span class="badge status-pill text-bg-${badge}">${job.status}</span></td>
-          <td>${job.success_count ?? 0}/${job.files_count ?? 0}</td>
-          <td>${job.error_count ?? 0}</td>
-        </tr>
-      `;
-    }).join('');
-  } catch (_err) {
+function watchJobs(callback) {
+  jobsWatchers.push(callback);
+  if (!jobsSource && !jobsPollTimer) {
+    startJobsStream();
+  } else if (jobsById.size > 0) {
+    callback(currentJobs(), null);
+  }
+}
+
+function renderJobsTable(jobs, error) {
+  const tbody = document.getElementById('jobs_body');
+  // Une page peut fournir son propre rendu (ex: monitoring)
+  if (!tbody || tbody.dataset.jobsRenderer) return;
+
+  if (error) {
     tbody.innerHTML = '<tr><td colspan="6" class="text-danger">Impossible de charger les jobs.</td></tr>';
+    return;
+  }
+  if (jobs.length === 0) {
+    tbody.innerHTML = '<tr><td colspan="6" class="text-muted">Aucun job pour le moment.</td></tr>';
+    return;
   }
+
+  tbody.innerHTML = jobs.map(job => {
+    const badge = badgeForStatus(job.status);
+    return `
+      <tr>
+        <td>${job.id.slice(0, 8)}</td>
+        <td>${job.type}</td>
+        <td>${job.target_format}</td>
+        <td><span class="badge status-pill text-bg-${badge}">${job.status}</span></td>
+        <td>${job.success_count ?? 0}/${job.files_count ?? 0}</td>
+        <td>${job.error_count ?? 0}</td>
+      </tr>
+    `;
+  }).join('');
 }
 
 const targetFormatSelect = document.getElementById('target_format');
@@ -272,7 +347,8 @@ if (targetFormatSelect) {
 }
 
 const refreshJobsButton = document.getElementById('refresh_jobs');
-if (refreshJobsButton) {
+const jobsBody = document.getElementById('jobs_body');
+if (refreshJobsButton && !(jobsBody && jobsBody.dataset.jobsRenderer)) {
   refreshJobsButton.addEventListener('click', refreshJobs);
 }
 
@@ -287,8 +363,9 @@ document.querySelectorAll('form[enctype="multipart/form-data"]').forEach(form =>
 
 document.addEventListener('DOMContentLoaded', () => {
   toggleTxtEncoding();
-  refreshJobs();
-  setInterval(refreshJobs, 5000);
+  if (document.getElementById('jobs_body')) {
+    watchJobs(renderJobsTable);
+  }
 
   document.querySelectorAll('input[type="file"][data-preview-target]').forEach(input => {
     input.addEventListener('change', () => updateFilePreview(input));
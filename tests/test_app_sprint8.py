@@ -0,0 +1,2397 @@
+"""
+Sprint 8 Tests: performances et passage à l'échelle
+
+Tests pour:
+- Exécution asynchrone des jobs API
+- Conversion parallèle des lots (pool de processus)
+- Pool d'instances LibreOffice
+- Conversion groupée des documents (un appel LibreOffice par paire de formats)
+- FFmpeg alimenté par pipes (stdin/stdout)
+- Cache des résultats de conversion
+- Archives ZIP diffusées en flux
+- Historique en journal NDJSON segmenté
+- Historique SQLite, filtres et pagination par curseur
+- Cache mémoire des profils
+- Flux SSE des jobs
+- ETag versionnés, réponses 304 et deltas `since`
+- Stores de jobs en mémoire et SQLite (partagé entre processus)
+- Index des jobs par statut et type, suppression des sorties en arrière-plan
+- Conversion par chemin des fichiers déposés sur disque
+- Envois fractionnés avec reprise (/api/uploads)
+- Redimensionnement des images et décodage JPEG réduit
+- Miniatures des sorties image mises en cache
+- Aperçu texte à lecture bornée
+- Téléchargements par plages, ETag fort et cache immuable
+- Niveaux d'encodage (fast, balanced, max_compression)
+- Conversion JSON/YAML en flux
+- Détection du format des données et libyaml
+- NDJSON et YAML à plusieurs documents
+- Registre des convertisseurs et matrice des capacités
+"""
+
+import copy
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+import pytest
+from werkzeug.test import EnvironBuilder
+import config
+import utils
+from converters import AudioConverter, DataConverter, DocumentConverter, ImageConverter
+from converters import data_stream, libreoffice_pool
+import converters
+from models import ConversionError, Job, UploadError
+from services import CacheService, ConversionService, HistoryService, JobService, ProfileService, UploadService, ZipStreamWriter
+from services.services_container import history_service, job_service
+from services.zip_stream import compression_pour
+
+import app as app_module
+
+
+@pytest.fixture(autouse=True)
+def cache_isole(tmp_path, monkeypatch):
+    """Isoler le cache de conversion et le dossier de dépôt de chaque test."""
+    monkeypatch.setattr(config, "REP_CACHE", tmp_path / "cache")
+    monkeypatch.setattr(config, "REP_SPOOL", tmp_path / "spool")
+
+
+def _multipart_files(*entries):
+    """Helper pour créer des fichiers multipart."""
+    return [(io.BytesIO(content), name) for content, name in entries]
+
+
+def _attendre_job(client, job_id, timeout=10.0):
+    """Attendre qu'un job atteigne un statut final."""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] in {"termine", "erreur"}:
+            return job
+        time.sleep(0.05)
+    pytest.fail(f"Le job {job_id} n'est pas terminé après {timeout}s")
+
+
+FAUX_SOFFICE = """#!{python}
+# Faux LibreOffice pour les tests: journalise les appels et "convertit" en copiant.
+import os, sys
+from pathlib import Path
+from urllib.parse import urlparse, unquote
+
+args = sys.argv[1:]
+profil = next(Path(unquote(urlparse(a.split("=", 1)[1]).path)) for a in args if a.startswith("-env:UserInstallation="))
+with open(os.environ["FAUX_SOFFICE_LOG"], "a") as log:
+    log.write(("init " if "--terminate_after_init" in args else "convert ") + profil.name + "\\n")
+if "--terminate_after_init" in args:
+    profil.mkdir(parents=True, exist_ok=True)
+    (profil / "user").mkdir(exist_ok=True)
+    sys.exit(0)
+target = args[args.index("--convert-to") + 1]
+outdir = Path(args[args.index("--outdir") + 1])
+for entree in args[args.index("--outdir") + 2:]:
+    entree = Path(entree)
+    contenu = entree.read_bytes()
+    if b"CRASH" in contenu:
+        sys.exit(1)
+    (outdir / (entree.stem + "." + target)).write_bytes(b"CONVERTI:" + contenu)
+"""
+
+
+FAUX_FFMPEG = """#!{python}
+# Faux FFmpeg pour les tests: journalise le mode (pipe/fichier) et "encode" en préfixant.
+import os, sys
+
+args = sys.argv[1:]
+entree = args[args.index("-i") + 1]
+sortie = args[-1]
+with open(os.environ["FAUX_FFMPEG_LOG"], "a") as log:
+    log.write(("pipe" if entree == "pipe:0" else "fichier") + "\\n")
+donnees = sys.stdin.buffer.read() if entree == "pipe:0" else open(entree, "rb").read()
+if (args[args.index("-f") + 1] if "-f" in args else sortie.rsplit(".", 1)[-1]) == "wav":
+    # En-tête RIFF tel qu'écrit sur une sortie non seekable (tailles inconnues)
+    fmt = b"fmt " + (16).to_bytes(4, "little") + bytes(16)
+    donnees = b"RIFF\\xff\\xff\\xff\\xffWAVE" + fmt + b"data\\xff\\xff\\xff\\xff" + donnees
+else:
+    donnees = b"ID3" + donnees
+if sortie == "pipe:1":
+    sys.stdout.buffer.write(donnees)
+else:
+    open(sortie, "wb").write(donnees)
+"""
+
+
+def _installer_script(tmp_path, monkeypatch, nom, contenu):
+    """Installer un faux exécutable dans le PATH et retourner son journal."""
+    rep_bin = tmp_path / "bin"
+    rep_bin.mkdir(exist_ok=True)
+    script = rep_bin / nom
+    script.write_text(contenu.format(python=sys.executable), encoding="utf-8")
+    script.chmod(0o755)
+    log = tmp_path / f"{nom}.log"
+    log.touch()
+    monkeypatch.setenv("PATH", f"{rep_bin}{os.pathsep}{os.environ.get('PATH', '')}")
+    return log
+
+
+@pytest.fixture
+def faux_ffmpeg(tmp_path, monkeypatch):
+    """Installer un faux `ffmpeg` dans le PATH."""
+    log = _installer_script(tmp_path, monkeypatch, "ffmpeg", FAUX_FFMPEG)
+    monkeypatch.setenv("FAUX_FFMPEG_LOG", str(log))
+    return log
+
+
+@pytest.fixture
+def faux_soffice(tmp_path, monkeypatch):
+    """Installer un faux `soffice` dans le PATH et isoler le pool partagé."""
+    log = _installer_script(tmp_path, monkeypatch, "soffice", FAUX_SOFFICE)
+    monkeypatch.setenv("FAUX_SOFFICE_LOG", str(log))
+    monkeypatch.setattr(config, "REP_LIBREOFFICE_PROFILS", tmp_path / "profils")
+    monkeypatch.setattr(libreoffice_pool, "_pool", None)
+    return log
+
+
+@pytest.fixture
+def api_env(tmp_path, monkeypatch):
+    """Isoler les fichiers de l'API dans un dossier temporaire."""
+    exports_dir = tmp_path / "api_exports"
+    exports_dir.mkdir(parents=True, exist_ok=True)
+    monkeypatch.setattr(config, "HISTORIQUE_PATH", tmp_path / "history.json")
+    monkeypatch.setattr(config, "REP_API_EXPORTS", exports_dir)
+    monkeypatch.setattr(config, "REP_UPLOADS", tmp_path)
+    monkeypatch.setattr(config, "CLE_API", "")
+    return tmp_path
+
+
+class TestAsyncJobs:
+    """Tests pour l'exécution asynchrone de /api/convert."""
+    
+    def test_async_convert_returns_202_then_completes(self, api_env):
+        """Test que le mode asynchrone répond 202 puis termine le job."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "async": "1",
+                "file": _multipart_files((b'{"name":"alice"}', "a.json")),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.status_code == 202
+        payload = response.get_json()
+        assert payload["status"] == "en_attente"
+        assert payload["status_url"].endswith(payload["job_id"])
+        
+        job = _attendre_job(client, payload["job_id"])
+        assert job["status"] == "termine"
+        assert job["success_count"] == 1
+        
+        download = client.get(payload["download_url"])
+        assert download.status_code == 200
+        assert b"name: alice" in download.data
+    
+    def test_async_batch_with_errors_builds_zip(self, api_env):
+        """Test qu'un lot asynchrone avec erreurs produit un ZIP."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "async": "true",
+                "file": _multipart_files(
+                    (b'{"ok": true}', "ok.json"),
+                    (b"\xff\xfe\xfd", "broken.json"),
+                ),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.status_code == 202
+        job = _attendre_job(client, response.get_json()["job_id"])
+        assert job["status"] == "erreur"
+        assert job["success_count"] == 1
+        assert job["error_count"] == 1
+        
+        archive = zipfile.ZipFile(io.BytesIO(client.get(response.get_json()["download_url"]).data))
+        assert "errors.txt" in archive.namelist()
+    
+    def test_async_queue_full_returns_503(self, api_env, monkeypatch):
+        """Test que la file d'attente bornée refuse les jobs en excès."""
+        monkeypatch.setattr(config, "MAX_JOBS_EN_ATTENTE", 0)
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "async": "1",
+                "file": _multipart_files((b'{"a": 1}', "a.json")),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.status_code == 503
+        job = client.get(f"/api/jobs/{response.get_json()['job_id']}").get_json()
+        assert job["status"] == "erreur"
+
+
+class TestBatchExecutor:
+    """Tests pour l'exécuteur de lots."""
+    
+    def test_process_pool_keeps_order_and_errors(self, monkeypatch):
+        """Test que le pool de processus conserve l'ordre et les erreurs par fichier."""
+        monkeypatch.setattr(config, "BATCH_EXECUTEUR", "processus")
+        monkeypatch.setattr(config, "BATCH_WORKERS", 2)
+        service = ConversionService()
+        
+        items = [
+            ("a.json", b'{"name": "a"}', "application/json"),
+            ("broken.json", b"\xff\xfe\xfd", "application/json"),
+            ("c.json", b'{"name": "c"}', "application/json"),
+        ]
+        resultats = service.convert_batch("data", "yaml", items)
+        
+        assert len(resultats) == 3
+        assert resultats[0][0] == b"name: a\n"
+        assert isinstance(resultats[1], ConversionError)
+        assert resultats[2][0] == b"name: c\n"
+    
+    def test_sequential_executor_below_threshold(self, monkeypatch):
+        """Test que les petits lots restent dans le processus courant en mode auto."""
+        monkeypatch.setattr(config, "BATCH_EXECUTEUR", "auto")
+        monkeypatch.setattr(config, "BATCH_SEUIL_PARALLELE", 10)
+        service = ConversionService()
+        
+        resultats = service.convert_batch("data", "json", [("a.yaml", b"a: 1\n", "")])
+        
+        assert resultats[0][1] == "json"
+        assert service._process_pool is None
+    
+    def test_api_batch_in_process_pool(self, api_env, monkeypatch):
+        """Test un lot API réparti sur le pool de processus."""
+        monkeypatch.setattr(config, "BATCH_EXECUTEUR", "processus")
+        monkeypatch.setattr(config, "BATCH_WORKERS", 2)
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "file": _multipart_files(
+                    (b'{"n": 1}', "un.json"),
+                    (b"", "vide.json"),
+                    (b'{"n": 3}', "trois.json"),
+                ),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.status_code == 201
+        payload = response.get_json()
+        assert payload["success_count"] == 2
+        assert payload["errors"] == ["vide.json: fichier vide"]
+        
+        archive = zipfile.ZipFile(io.BytesIO(client.get(payload["download_url"]).data))
+        noms = [n for n in archive.namelist() if n.endswith(".yaml")]
+        assert noms[0].startswith("un_") and noms[1].startswith("trois_")
+
+
+class TestLibreOfficePool:
+    """Tests pour le pool d'instances LibreOffice."""
+    
+    def test_document_converter_uses_pool_profile(self, faux_soffice):
+        """Test que DocumentConverter passe par un profil isolé du pool."""
+        result = DocumentConverter().convert(b"Bonjour", "txt", "pdf")
+        
+        assert result.output_bytes == b"CONVERTI:Bonjour"
+        assert faux_soffice.read_text().splitlines() == ["init instance_0", "convert instance_0"]
+    
+    def test_profile_reused_then_recycled(self, faux_soffice, tmp_path):
+        """Test que le profil est réutilisé puis recyclé après N conversions."""
+        pool = libreoffice_pool.LibreOfficePool(1, tmp_path / "profils", max_conversions=2)
+        source = tmp_path / "doc.txt"
+        source.write_text("x", encoding="utf-8")
+        
+        for _ in range(3):
+            pool.convertir("soffice", [source], "pdf", tmp_path, timeout=30)
+        
+        assert faux_soffice.read_text().splitlines() == [
+            "init instance_0",
+            "convert instance_0",
+            "convert instance_0",
+            "init instance_0",
+            "convert instance_0",
+        ]
+    
+    def test_crash_recycles_instance(self, faux_soffice, tmp_path):
+        """Test qu'un plantage réinitialise le profil de l'instance."""
+        pool = libreoffice_pool.LibreOfficePool(1, tmp_path / "profils", max_conversions=10)
+        crash = tmp_path / "crash.txt"
+        crash.write_text("CRASH", encoding="utf-8")
+        
+        with pytest.raises(subprocess.CalledProcessError):
+            pool.convertir("soffice", [crash], "pdf", tmp_path, timeout=30)
+        
+        assert not (tmp_path / "profils" / f"processus_{os.getpid()}" / "instance_0").exists()
+    
+    def test_profiles_scoped_to_process(self, tmp_path):
+        """Test que les profils sont propres au processus et que ceux des processus terminés sont purgés."""
+        orphelin = tmp_path / "profils" / "processus_999999999" / "instance_0"
+        orphelin.mkdir(parents=True)
+        
+        pool = libreoffice_pool.LibreOfficePool(2, tmp_path / "profils", max_conversions=10)
+        
+        assert {instance.rep_profil for instance in pool._instances.queue} == {
+            tmp_path / "profils" / f"processus_{os.getpid()}" / f"instance_{index}" for index in range(2)
+        }
+        assert not orphelin.parent.exists()
+    
+    def test_failed_init_keeps_instance_unready(self, tmp_path, monkeypatch):
+        """Test qu'un échec de création du profil est retenté tant qu'aucune conversion n'a réussi."""
+        commandes = []
+        
+        def _executer(cmd, timeout):
+            commandes.append("init" if "--terminate_after_init" in cmd else "convert")
+            if "--terminate_after_init" in cmd:
+                raise subprocess.CalledProcessError(1, cmd)
+        
+        monkeypatch.setattr(libreoffice_pool.LibreOfficePool, "_executer", staticmethod(_executer))
+        pool = libreoffice_pool.LibreOfficePool(1, tmp_path / "profils", max_conversions=10)
+        
+        pool._preparer("soffice", pool._instances.queue[0], 30)
+        assert pool._instances.queue[0].prete is False
+        
+        pool.convertir("soffice", [tmp_path / "doc.txt"], "pdf", tmp_path, timeout=30)
+        pool.convertir("soffice", [tmp_path / "doc.txt"], "pdf", tmp_path, timeout=30)
+        assert commandes == ["init", "init", "convert", "convert"]
+    
+    def test_exhausted_pool_times_out(self, tmp_path):
+        """Test qu'une attente d'instance au-delà du délai lève une ConversionError."""
+        pool = libreoffice_pool.LibreOfficePool(1, tmp_path / "profils", max_conversions=10, attente_max=0.05)
+        pool._instances.get()
+        
+        with pytest.raises(ConversionError, match="occupées"):
+            pool.convertir("soffice", [tmp_path / "doc.txt"], "pdf", tmp_path, timeout=30)
+
+
+class TestDocumentBatch:
+    """Tests pour la conversion groupée des documents."""
+    
+    def test_same_pair_uses_single_invocation(self, faux_soffice):
+        """Test qu'un lot TXT → PDF ne lance LibreOffice qu'une fois."""
+        items = [(f"doc{i}.txt", f"texte {i}".encode(), "text/plain") for i in range(5)]
+        
+        resultats = ConversionService().convert_batch("document", "pdf", items)
+        
+        assert [r[0] for r in resultats] == [f"CONVERTI:texte {i}".encode() for i in range(5)]
+        appels = [l for l in faux_soffice.read_text().splitlines() if l.startswith("convert")]
+        assert len(appels) == 1
+    
+    def test_failure_only_affects_own_entry(self, faux_soffice):
+        """Test qu'un document en échec n'invalide pas le reste du groupe."""
+        items = [
+            ("a.txt", b"un", "text/plain"),
+            ("b.txt", b"CRASH", "text/plain"),
+            ("c.docx", b"trois", ""),
+            ("d.txt", b"quatre", "text/plain"),
+            ("e.pdf", b"cinq", "application/pdf"),
+        ]
+        
+        resultats = ConversionService().convert_batch("document", "pdf", items)
+        
+        assert resultats[0][0] == b"CONVERTI:un"
+        assert isinstance(resultats[1], ConversionError)
+        assert resultats[2][0] == b"CONVERTI:trois"
+        assert resultats[3][0] == b"CONVERTI:quatre"
+        assert "déjà au format" in str(resultats[4])
+    
+    def test_results_yielded_as_each_group_finishes(self, faux_soffice):
+        """Test que les résultats d'un groupe sont produits avant la conversion du groupe suivant."""
+        items = [
+            ("a.txt", b"un", "text/plain"),
+            ("b.txt", b"deux", "text/plain"),
+            ("c.docx", b"trois", ""),
+        ]
+        resultats = ConversionService().iter_batch("document", "pdf", items)
+        
+        def _conversions():
+            return [l for l in faux_soffice.read_text().splitlines() if l.startswith("convert")]
+        
+        assert next(resultats)[0] == b"CONVERTI:un"
+        assert next(resultats)[0] == b"CONVERTI:deux"
+        assert len(_conversions()) == 1
+        assert next(resultats)[0] == b"CONVERTI:trois"
+        assert len(_conversions()) == 2
+
+
+def _atome_mp4(type_atome: bytes, contenu: bytes = b"") -> bytes:
+    """Construire un atome MP4 (taille + type + contenu)."""
+    return struct.pack(">I4s", 8 + len(contenu), type_atome) + contenu
+
+
+class TestAudioStreaming:
+    """Tests pour la conversion audio par pipes."""
+    
+    def test_mp3_to_wav_uses_pipes_and_fixes_header(self, faux_ffmpeg):
+        """Test que MP3 → WAV passe par les pipes avec un en-tête WAV corrigé."""
+        result = AudioConverter().convert(b"audio-mp3", "mp3", "wav")
+        
+        assert faux_ffmpeg.read_text().splitlines() == ["pipe"]
+        wav = result.output_bytes
+        assert struct.unpack("<I", wav[4:8])[0] == len(wav) - 8
+        position_data = wav.index(b"data")
+        assert struct.unpack("<I", wav[position_data + 4:position_data + 8])[0] == len(b"audio-mp3")
+    
+    def test_faststart_mp4_is_streamed(self, faux_ffmpeg):
+        """Test qu'un MP4 avec `moov` en tête est lu depuis un pipe."""
+        mp4 = _atome_mp4(b"ftyp", b"isom") + _atome_mp4(b"moov", b"index") + _atome_mp4(b"mdat", b"son")
+        
+        result = AudioConverter().convert(mp4, "mp4", "mp3")
+        
+        assert result.output_bytes == b"ID3" + mp4
+        assert faux_ffmpeg.read_text().splitlines() == ["pipe"]
+    
+    def test_mp4_with_trailing_moov_uses_temp_file(self, faux_ffmpeg):
+        """Test qu'un MP4 avec `moov` en fin de fichier repasse par un fichier temporaire."""
+        mp4 = _atome_mp4(b"ftyp", b"isom") + _atome_mp4(b"mdat", b"son") + _atome_mp4(b"moov", b"index")
+        
+        AudioConverter().convert(mp4, "mp4", "mp3")
+        
+        assert faux_ffmpeg.read_text().splitlines() == ["fichier"]
+    
+    def test_streaming_can_be_disabled(self, faux_ffmpeg, monkeypatch):
+        """Test que AUDIO_STREAMING=0 conserve le passage par fichiers."""
+        monkeypatch.setattr(config, "AUDIO_STREAMING", False)
+        
+        AudioConverter().convert(b"audio-mp3", "mp3", "wav")
+        
+        assert faux_ffmpeg.read_text().splitlines() == ["fichier"]
+
+
+class TestResultCache:
+    """Tests pour le cache des résultats de conversion."""
+    
+    def test_cache_hit_skips_converter(self, monkeypatch):
+        """Test qu'un résultat en cache évite le convertisseur."""
+        cache = CacheService()
+        service = ConversionService(cache=cache)
+        premier = service.convert_file("data", "yaml", "a.json", b'{"a": 1}')
+        
+        def _interdit(*args, **kwargs):
+            raise AssertionError("le convertisseur ne doit pas être appelé")
+        
+        monkeypatch.setattr(converters.registry, "resolve", _interdit)
+        second = service.convert_file("data", "yaml", "copie.json", b'{"a": 1}')
+        
+        assert second == premier
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    def test_key_depends_on_options_and_source(self):
+        """Test que la clé dépend du format source et des options."""
+        cle = CacheService.make_key(b"x", "document", "txt", "pdf", {"txt_encoding": "utf-8"})
+        
+        assert cle != CacheService.make_key(b"x", "document", "txt", "pdf", {"txt_encoding": "latin-1"})
+        assert cle != CacheService.make_key(b"x", "document", "docx", "pdf", {"txt_encoding": "utf-8"})
+        assert cle != CacheService.make_key(b"y", "document", "txt", "pdf", {"txt_encoding": "utf-8"})
+    
+    def test_lru_eviction_respects_budget(self, monkeypatch):
+        """Test l'éviction LRU quand le budget en octets est dépassé."""
+        monkeypatch.setattr(config, "CACHE_TAILLE_MAX", 25)
+        cache = CacheService()
+        
+        cache.put("aa" * 32, b"a" * 10, "json", "application/json")
+        cache.put("bb" * 32, b"b" * 10, "json", "application/json")
+        assert cache.get("aa" * 32) is not None
+        cache.put("cc" * 32, b"c" * 10, "json", "application/json")
+        
+        assert cache.get("bb" * 32) is None
+        assert cache.get("aa" * 32)[0] == b"a" * 10
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["size_bytes"] == 20
+    
+    def test_index_rebuilt_from_disk(self):
+        """Test que le cache survit à un redémarrage."""
+        CacheService().put("dd" * 32, b"resultat", "yaml", "application/x-yaml")
+        
+        assert CacheService().get("dd" * 32) == (b"resultat", "yaml", "application/x-yaml")
+    
+    def test_two_services_share_disk_and_budget(self, monkeypatch):
+        """Test que deux services (deux workers) partagent les entrées et un seul budget."""
+        monkeypatch.setattr(config, "CACHE_TAILLE_MAX", 25)
+        premier, second = CacheService(), CacheService()
+        assert second.stats()["entries"] == 0
+        
+        premier.put("aa" * 32, b"a" * 10, "json", "application/json")
+        assert second.get("aa" * 32) == (b"a" * 10, "json", "application/json")
+        
+        second.put("bb" * 32, b"b" * 10, "json", "application/json")
+        premier.put("cc" * 32, b"c" * 10, "json", "application/json")
+        
+        # "aa" est la moins récemment utilisée sur disque, tous processus confondus
+        assert second.get("aa" * 32) is None
+        assert second.get_file("aa" * 32, config.REP_CACHE.parent / "sorties") is None
+        assert second.get("cc" * 32)[0] == b"c" * 10
+        assert premier.stats()["size_bytes"] == second.stats()["size_bytes"] == 20
+        assert not list(config.REP_CACHE.glob("*/*.tmp"))
+    
+    def test_batch_serves_hits_and_caches_misses(self):
+        """Test qu'un lot combine entrées en cache et nouvelles conversions."""
+        cache = CacheService()
+        service = ConversionService(cache=cache)
+        service.convert_file("data", "yaml", "a.json", b'{"a": 1}')
+        
+        resultats = service.convert_batch(
+            "data", "yaml", [("a.json", b'{"a": 1}', ""), ("b.json", b'{"b": 2}', "")]
+        )
+        
+        assert [r[0] for r in resultats] == [b"a: 1\n", b"b: 2\n"]
+        assert cache.stats()["entries"] == 2
+    
+    def test_api_cache_stats(self, api_env):
+        """Test GET /api/cache."""
+        client = app_module.app.test_client()
+        
+        response = client.get("/api/cache")
+        
+        assert response.status_code == 200
+        assert {"hits", "misses", "entries", "size_bytes"} <= set(response.get_json())
+
+
+class TestZipStream:
+    """Tests pour les archives ZIP diffusées en flux."""
+    
+    def test_compression_by_format(self):
+        """Test le choix STORED/DEFLATED selon le format."""
+        assert compression_pour("photo.png") == zipfile.ZIP_STORED
+        assert compression_pour("son.MP3") == zipfile.ZIP_STORED
+        assert compression_pour("rapport.docx") == zipfile.ZIP_STORED
+        assert compression_pour("data.yaml") == zipfile.ZIP_DEFLATED
+        assert compression_pour("errors.txt") == zipfile.ZIP_DEFLATED
+    
+    def test_writer_streams_entries_and_keeps_copy(self, tmp_path, monkeypatch):
+        """Test que l'archive est produite par morceaux et copiée sur disque."""
+        monkeypatch.setattr("services.zip_stream.TAILLE_BLOC", 1024)
+        copie = tmp_path / "lot.zip"
+        writer = ZipStreamWriter(copie=copie)
+        image = os.urandom(5000)
+        
+        morceaux = list(writer.ajouter("a.png", image))
+        morceaux += list(writer.ajouter("b.json", b'{"a": 1}' * 100))
+        morceaux += list(writer.terminer())
+        
+        assert len(morceaux) > 3
+        assert b"".join(morceaux) == copie.read_bytes()
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(morceaux)))
+        assert archive.testzip() is None
+        assert archive.getinfo("a.png").compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo("b.json").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.read("a.png") == image
+    
+    def test_abandon_removes_copy(self, tmp_path):
+        """Test qu'une archive interrompue ne laisse pas de copie partielle."""
+        copie = tmp_path / "lot.zip"
+        writer = ZipStreamWriter(copie=copie)
+        list(writer.ajouter("a.json", b"{}"))
+        
+        writer.abandonner()
+        
+        assert not copie.exists()
+    
+    def test_iter_batch_is_lazy(self, monkeypatch):
+        """Test que les conversions suivent la consommation des résultats."""
+        monkeypatch.setattr(config, "BATCH_EXECUTEUR", "sequentiel")
+        appels = []
+        service = ConversionService()
+        conversion_originale = service._convert_file_sans_cache
+        
+        def _compter(*args, **kwargs):
+            appels.append(args[2])
+            return conversion_originale(*args, **kwargs)
+        
+        monkeypatch.setattr(service, "_convert_file_sans_cache", _compter)
+        resultats = service.iter_batch(
+            "data", "yaml", [("a.json", b'{"a": 1}', ""), ("b.json", b'{"b": 2}', "")]
+        )
+        
+        assert next(resultats)[0] == b"a: 1\n"
+        assert appels == ["a.json"]
+        assert next(resultats)[0] == b"b: 2\n"
+        assert appels == ["a.json", "b.json"]
+    
+    def test_web_batch_is_streamed(self, api_env):
+        """Test que le formulaire web diffuse le ZIP d'un lot."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "file": _multipart_files((b'{"a": 1}', "a.json"), (b"\xff", "b.json")),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.is_streamed
+        archive = zipfile.ZipFile(io.BytesIO(response.data))
+        nom_yaml = next(n for n in archive.namelist() if n.endswith(".yaml"))
+        assert archive.getinfo(nom_yaml).compress_type == zipfile.ZIP_DEFLATED
+        assert "b.json" in archive.read("errors.txt").decode("utf-8")
+        assert not list(api_env.glob("batch_*.zip"))
+    
+    def test_api_stream_returns_zip_and_persists_copy(self, api_env):
+        """Test que stream=1 diffuse le ZIP et garde une copie pour /download."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "async": "0",
+                "stream": "1",
+                "file": _multipart_files((b'{"a": 1}', "a.json"), (b'{"b": 2}', "b.json")),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.status_code == 200
+        assert response.mimetype == "application/zip"
+        contenu = response.data
+        job_id = response.headers["X-Job-Id"]
+        assert len(zipfile.ZipFile(io.BytesIO(contenu)).namelist()) == 2
+        
+        statut = client.get(f"/api/jobs/{job_id}").get_json()
+        assert statut["status"] == "termine"
+        assert client.get(f"/api/jobs/{job_id}/download").data == contenu
+    
+    @pytest.mark.parametrize("route", ["/convert", "/api/convert"])
+    def test_response_closed_before_reading_ends_job(self, api_env, monkeypatch, route):
+        """Test qu'une réponse fermée sans être lue clôture le job et supprime les dépôts."""
+        monkeypatch.setattr(config, "SEUIL_SPOOL", 0)
+        environ = EnvironBuilder(
+            path=route,
+            method="POST",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "async": "0",
+                "stream": "1",
+                "file": _multipart_files((b'{"a": 1}', "a.json"), (b'{"b": 2}', "b.json")),
+            },
+            content_type="multipart/form-data",
+        ).get_environ()
+        statuts = []
+        
+        # Le client de test lit le premier morceau: appel WSGI direct, réponse fermée sans lecture
+        corps = app_module.app.wsgi_app(environ, lambda statut, en_tetes: statuts.append(statut))
+        corps.close()
+        
+        assert statuts == ["200 OK"]
+        job = job_service.get_recent_jobs(1)[0]
+        assert job.status == "erreur"
+        assert job.message == "Téléchargement interrompu"
+        assert list(config.REP_SPOOL.iterdir()) == []
+    
+    def test_api_stream_single_file(self, api_env):
+        """Test que stream=1 renvoie directement un fichier unique."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "async": "0",
+                "stream": "1",
+                "file": _multipart_files((b'{"a": 1}', "a.json")),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.status_code == 200
+        assert response.data == b"a: 1\n"
+
+
+def _ajouter_historique(service, nombre):
+    """Ajouter `nombre` entrées numérotées via le service."""
+    for index in range(nombre):
+        service.add_entry(f"job-{index}", "data", "yaml", {"json"}, 10, 1, 1, 0, "termine")
+
+
+class TestHistoryLog:
+    """Tests pour l'historique en journal NDJSON segmenté."""
+    
+    @pytest.fixture(autouse=True)
+    def historique(self, tmp_path, monkeypatch):
+        """Isoler le journal et réduire la taille des segments."""
+        monkeypatch.setattr(config, "HISTORIQUE_PATH", tmp_path / "history.json")
+        monkeypatch.setattr(config, "HISTORIQUE_SEGMENT_ENTREES", 3)
+        return tmp_path / "history_log"
+    
+    def test_append_rotates_segments(self, historique):
+        """Test que les ajouts remplissent des segments successifs."""
+        service = HistoryService()
+        
+        _ajouter_historique(service, 7)
+        
+        segments = sorted(p.name for p in historique.glob("*.ndjson"))
+        assert segments == ["000000000000.ndjson", "000000000003.ndjson", "000000000006.ndjson"]
+        assert [e["job_id"] for e in service.get_recent(4)] == ["job-6", "job-5", "job-4", "job-3"]
+    
+    def test_state_reloaded_from_segments(self, historique):
+        """Test qu'un nouveau service reprend la séquence du journal."""
+        _ajouter_historique(HistoryService(), 4)
+        
+        service = HistoryService()
+        _ajouter_historique(service, 1)
+        
+        assert len(service._load()) == 5
+        assert len(list(historique.glob("*.ndjson"))) == 2
+    
+    def test_compaction_drops_old_segments(self, historique, monkeypatch):
+        """Test que les segments hors fenêtre sont supprimés en arrière-plan."""
+        monkeypatch.setattr(config, "MAX_HISTORY_ENTRIES", 4)
+        service = HistoryService()
+        
+        _ajouter_historique(service, 12)
+        if service._compaction is not None:
+            service._compaction.join(timeout=5)
+        
+        assert [e["job_id"] for e in service._load()] == ["job-8", "job-9", "job-10", "job-11"]
+        assert len(list(historique.glob("*.ndjson"))) <= 3
+    
+    def test_legacy_history_migrated_on_first_write(self, tmp_path, historique):
+        """Test la migration transparente de history.json."""
+        ancien = [{"id": str(i), "job_id": f"ancien-{i}"} for i in range(4)]
+        (tmp_path / "history.json").write_text(json.dumps(ancien), encoding="utf-8")
+        service = HistoryService()
+        
+        assert service.get_recent(2)[0]["job_id"] == "ancien-3"
+        assert not historique.exists()
+        
+        _ajouter_historique(service, 1)
+        
+        assert not (tmp_path / "history.json").exists()
+        assert (tmp_path / "history.json.migre").exists()
+        assert [e["job_id"] for e in service.get_recent(3)] == ["job-0", "ancien-3", "ancien-2"]
+    
+    def test_torn_line_is_discarded(self, historique):
+        """Test qu'une ligne incomplète (arrêt brutal) ne corrompt pas le journal."""
+        _ajouter_historique(HistoryService(), 2)
+        segment = historique / "000000000000.ndjson"
+        with segment.open("a", encoding="utf-8") as fichier:
+            fichier.write('{"job_id": "coup')
+        
+        service = HistoryService()
+        _ajouter_historique(service, 1)
+        
+        assert [e["job_id"] for e in service.get_recent(5)] == ["job-0", "job-1", "job-0"]
+    
+    def test_two_services_share_one_log(self, historique):
+        """Test que deux services (deux workers) voient les ajouts l'un de l'autre."""
+        premier, second = HistoryService(), HistoryService()
+        
+        _ajouter_historique(premier, 2)
+        version = second.version
+        second.add_entry("job-second", "image", "png", {"jpg"}, 10, 1, 1, 0, "termine")
+        premier.add_entry("job-premier", "data", "json", {"yaml"}, 10, 1, 1, 0, "termine")
+        
+        assert version == 2
+        assert premier.version == second.version == 4
+        assert premier.epoque == second.epoque
+        assert [e["job_id"] for e in second.query(10, since=version)[0]] == ["job-premier", "job-second"]
+        assert [e["job_id"] for e in premier.get_recent(5)] == ["job-premier", "job-second", "job-1", "job-0"]
+        assert sorted(p.name for p in historique.glob("*.ndjson")) == ["000000000000.ndjson", "000000000003.ndjson"]
+
+
+@pytest.fixture(params=["journal", "sqlite"])
+def backend_historique(request, tmp_path, monkeypatch):
+    """Historique isolé, pour chacun des deux backends."""
+    monkeypatch.setattr(config, "HISTORIQUE_PATH", tmp_path / "history.json")
+    monkeypatch.setattr(config, "HISTORIQUE_BACKEND", request.param)
+    return request.param
+
+
+def _entree_historique(index, conversion_type, status, date):
+    """Construire une entrée d'historique minimale."""
+    return {
+        "id": f"e{index}",
+        "job_id": f"job-{index}",
+        "date": date,
+        "type": conversion_type,
+        "source_formats": ["json"],
+        "target_format": "yaml" if conversion_type == "data" else "png",
+        "size_bytes": 10,
+        "files_count": 1,
+        "success_count": 1 if status == "termine" else 0,
+        "error_count": 0 if status == "termine" else 1,
+        "status": status,
+    }
+
+
+class TestHistoryQuery:
+    """Tests pour les filtres et la pagination de l'historique."""
+    
+    @pytest.fixture(autouse=True)
+    def entrees(self, backend_historique):
+        """Remplir l'historique: 10 entrées data/image alternées sur 10 jours."""
+        service = HistoryService()
+        service._save([
+            _entree_historique(
+                i,
+                "data" if i % 2 == 0 else "image",
+                "erreur" if i % 3 == 0 else "termine",
+                f"2026-04-{i + 1:02d}T12:00:00+00:00",
+            )
+            for i in range(10)
+        ])
+        return service
+    
+    def test_cursor_walks_all_pages(self, entrees):
+        """Test que la pagination par curseur parcourt tout sans doublon."""
+        vus = []
+        cursor = None
+        while True:
+            page, cursor = entrees.query(3, cursor=cursor)
+            vus += [e["job_id"] for e in page]
+            if cursor is None:
+                break
+        
+        assert vus == [f"job-{i}" for i in range(9, -1, -1)]
+    
+    def test_filters(self, entrees):
+        """Test les filtres type, statut, format cible et dates."""
+        page, _ = entrees.query(20, filtres={"type": "data", "status": "erreur"})
+        assert [e["job_id"] for e in page] == ["job-6", "job-0"]
+        
+        page, _ = entrees.query(20, filtres={"target_format": "png"})
+        assert len(page) == 5
+        
+        page, _ = entrees.query(20, filtres={
+            "date_from": "2026-04-03T00:00:00+00:00",
+            "date_to": "2026-04-05T00:00:00+00:00",
+        })
+        assert [e["job_id"] for e in page] == ["job-3", "job-2"]
+    
+    def test_filtered_pages(self, entrees):
+        """Test la pagination combinée à un filtre."""
+        page, cursor = entrees.query(2, filtres={"type": "image"})
+        assert [e["job_id"] for e in page] == ["job-9", "job-7"]
+        
+        page, cursor = entrees.query(2, cursor=cursor, filtres={"type": "image"})
+        assert [e["job_id"] for e in page] == ["job-5", "job-3"]
+    
+    def test_api_history_filters_and_cursor(self, entrees, monkeypatch):
+        """Test GET /api/history avec filtres et en-tête X-Next-Cursor."""
+        monkeypatch.setattr(config, "CLE_API", "")
+        client = app_module.app.test_client()
+        
+        response = client.get("/api/history?limit=2&type=data&to=2026-04-05")
+        assert [e["job_id"] for e in response.get_json()] == ["job-4", "job-2"]
+        
+        suite = client.get(f"/api/history?limit=2&type=data&to=2026-04-05&cursor={response.headers['X-Next-Cursor']}")
+        assert [e["job_id"] for e in suite.get_json()] == ["job-0"]
+        assert "X-Next-Cursor" not in suite.headers
+    
+    def test_api_history_rejects_bad_parameters(self, entrees, monkeypatch):
+        """Test les paramètres invalides de /api/history."""
+        monkeypatch.setattr(config, "CLE_API", "")
+        client = app_module.app.test_client()
+        
+        assert client.get("/api/history?cursor=abc").status_code == 400
+        assert client.get("/api/history?from=hier").status_code == 400
+
+
+class TestHistorySQLite:
+    """Tests spécifiques au backend SQLite de l'historique."""
+    
+    @pytest.fixture(autouse=True)
+    def sqlite(self, tmp_path, monkeypatch):
+        """Isoler l'historique et activer le backend SQLite."""
+        monkeypatch.setattr(config, "HISTORIQUE_PATH", tmp_path / "history.json")
+        monkeypatch.setattr(config, "HISTORIQUE_BACKEND", "sqlite")
+        return tmp_path / "history.sqlite3"
+    
+    def test_no_entry_cap(self, sqlite, monkeypatch):
+        """Test que la base n'est pas limitée à MAX_HISTORY_ENTRIES."""
+        monkeypatch.setattr(config, "MAX_HISTORY_ENTRIES", 5)
+        service = HistoryService()
+        
+        _ajouter_historique(service, 12)
+        
+        assert service._store_sqlite().count() == 12
+        assert sqlite.exists()
+    
+    def test_imports_existing_history(self, tmp_path, monkeypatch):
+        """Test que l'historique existant est repris à la création de la base."""
+        monkeypatch.setattr(config, "HISTORIQUE_BACKEND", "journal")
+        _ajouter_historique(HistoryService(), 3)
+        monkeypatch.setattr(config, "HISTORIQUE_BACKEND", "sqlite")
+        
+        service = HistoryService()
+        
+        assert [e["job_id"] for e in service.get_recent(5)] == ["job-2", "job-1", "job-0"]
+    
+    def test_indexes_exist(self, sqlite):
+        """Test la présence des index de filtrage."""
+        HistoryService().get_recent(1)
+        
+        import sqlite3
+        with sqlite3.connect(sqlite) as connexion:
+            index = {ligne[0] for ligne in connexion.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        
+        assert {"idx_history_date", "idx_history_type", "idx_history_status", "idx_history_job"} <= index
+
+
+class TestProfileCache:
+    """Tests pour le cache mémoire des profils."""
+    
+    @pytest.fixture(autouse=True)
+    def profils(self, tmp_path, monkeypatch):
+        """Isoler le fichier des profils."""
+        chemin = tmp_path / "profiles.json"
+        monkeypatch.setattr(config, "PROFILS_PATH", chemin)
+        return chemin
+    
+    def test_reads_do_not_reparse_file(self, profils, monkeypatch):
+        """Test que les lectures répétées ne relisent pas le fichier."""
+        service = ProfileService()
+        profil = service.add_profile("data", "JSON vers YAML", "json", "yaml")
+        lectures = []
+        lire = ProfileService._lire_fichier
+        monkeypatch.setattr(ProfileService, "_lire_fichier", staticmethod(lambda: lectures.append(1) or lire()))
+        
+        for _ in range(5):
+            assert service.get_profiles("data")[-1] == profil
+        
+        assert lectures == []
+    
+    def test_external_change_invalidates_cache(self, profils):
+        """Test qu'une modification externe du fichier est prise en compte."""
+        service = ProfileService()
+        service.add_profile("data", "JSON vers YAML", "json", "yaml")
+        
+        profils.write_text(json.dumps({"data": [], "image": [{"id": "x", "name": "X", "source": "png", "target": "jpg"}]}), encoding="utf-8")
+        
+        assert service.get_profiles("data") == []
+        assert service.get_profile("x")["target"] == "jpg"
+    
+    def test_index_by_id_follows_writes(self, profils):
+        """Test que l'index par id suit les ajouts et suppressions."""
+        service = ProfileService()
+        profil = service.add_profile("image", "PNG vers WebP", "png", "webp")
+        
+        assert service.get_profile(profil["id"]) == profil
+        assert service.get_profile(profil["id"], "image") == profil
+        assert service.get_profile(profil["id"], "data") is None
+        assert not service.delete_profile("data", profil["id"])
+        assert service.delete_profile("image", profil["id"])
+        assert service.get_profile(profil["id"]) is None
+    
+    def test_atomic_write_leaves_no_temp_file(self, profils):
+        """Test que l'écriture passe par un renommage sans laisser de fichier temporaire."""
+        service = ProfileService()
+        service.add_profile("data", "JSON vers YAML", "json", "yaml")
+        
+        assert [p.name for p in profils.parent.iterdir()] == ["profiles.json"]
+        assert json.loads(profils.read_text(encoding="utf-8"))["data"][0]["source"] == "json"
+    
+    def test_defaults_are_not_mutated(self, profils):
+        """Test que les profils par défaut de config ne sont pas modifiés."""
+        avant = copy.deepcopy(config.PROFILS_PAR_DEFAUT)
+        service = ProfileService()
+        
+        service.load_all()["data"].append({"id": "tmp"})
+        service.add_profile("data", "Test", "json", "yaml")
+        
+        assert config.PROFILS_PAR_DEFAUT == avant
+
+
+def _evenement_suivant(flux):
+    """Lire le prochain événement SSE (hors commentaires) sous forme de dict."""
+    for morceau in flux:
+        texte = morceau.decode("utf-8") if isinstance(morceau, bytes) else morceau
+        if texte.startswith(":") or texte.startswith("retry:"):
+            continue
+        champs = dict(ligne.split(": ", 1) for ligne in texte.strip().splitlines())
+        epoque, _, sequence = champs["id"].partition(":")
+        return {"epoque": epoque, "id": int(sequence), "event": champs["event"], "data": json.loads(champs["data"])}
+    return None
+
+
+class TestJobStream:
+    """Tests pour le flux SSE /api/jobs/stream."""
+    
+    @pytest.fixture(autouse=True)
+    def sse_rapide(self, monkeypatch):
+        """Raccourcir le heartbeat et la durée du flux."""
+        monkeypatch.setattr(config, "SSE_HEARTBEAT", 0.05)
+        monkeypatch.setattr(config, "SSE_DUREE_MAX", 2)
+        monkeypatch.setattr(config, "CLE_API", "")
+    
+    def test_wait_for_changes_returns_only_changed_jobs(self):
+        """Test que seuls les jobs modifiés après la séquence sont retournés."""
+        service = JobService()
+        premier = service.create_job("data", "yaml", 1)
+        second = service.create_job("data", "yaml", 1)
+        sequence = service.sequence
+        
+        service.update_job(premier, status="en_cours")
+        jobs, nouvelle = service.wait_for_changes(sequence, timeout=1)
+        
+        assert [job["id"] for job in jobs] == [premier]
+        assert nouvelle == sequence + 1
+        assert service.wait_for_changes(nouvelle, timeout=0.01) == ([], nouvelle)
+        assert second in [job["id"] for job in service.changes_since(0)[0]]
+    
+    def test_wait_for_changes_wakes_on_update(self):
+        """Test que l'attente est réveillée par une mise à jour concurrente."""
+        service = JobService()
+        job_id = service.create_job("data", "yaml", 1)
+        sequence = service.sequence
+        
+        threading.Timer(0.05, service.update_job, args=(job_id,), kwargs={"status": "termine"}).start()
+        debut = time.monotonic()
+        jobs, _ = service.wait_for_changes(sequence, timeout=5)
+        
+        assert jobs[0]["status"] == "termine"
+        assert time.monotonic() - debut < 2
+    
+    def test_stream_sends_snapshot_then_deltas(self):
+        """Test l'événement snapshot initial puis les seuls jobs modifiés."""
+        job_id = job_service.create_job("data", "yaml", 1)
+        autre_id = job_service.create_job("data", "json", 1)
+        client = app_module.app.test_client()
+        
+        response = client.get("/api/jobs/stream", buffered=False)
+        flux = iter(response.response)
+        snapshot = _evenement_suivant(flux)
+        job_service.update_job(job_id, status="termine")
+        delta = _evenement_suivant(flux)
+        response.close()
+        
+        assert response.mimetype == "text/event-stream"
+        assert snapshot["event"] == "snapshot"
+        assert {job_id, autre_id} <= {job["id"] for job in snapshot["data"]}
+        assert delta["event"] == "jobs"
+        assert [job["id"] for job in delta["data"]] == [job_id]
+        assert delta["data"][0]["status"] == "termine"
+        assert delta["id"] > snapshot["id"]
+        assert snapshot["epoque"] == delta["epoque"] == job_service.epoque
+    
+    def test_stream_resumes_from_last_event_id(self):
+        """Test la reprise avec Last-Event-ID sans snapshot."""
+        job_id = job_service.create_job("data", "yaml", 1)
+        dernier_id = job_service.sequence
+        job_service.update_job(job_id, status="en_cours")
+        client = app_module.app.test_client()
+        
+        response = client.get("/api/jobs/stream", headers={"Last-Event-ID": f"{job_service.epoque}:{dernier_id}"}, buffered=False)
+        evenement = _evenement_suivant(iter(response.response))
+        response.close()
+        
+        assert evenement["event"] == "jobs"
+        assert [job["id"] for job in evenement["data"]] == [job_id]
+    
+    def test_stream_unknown_event_id_sends_snapshot(self):
+        """Test qu'un id inconnu (redémarrage du serveur) renvoie un snapshot."""
+        client = app_module.app.test_client()
+        
+        response = client.get(
+            "/api/jobs/stream",
+            headers={"Last-Event-ID": f"{job_service.epoque}:{job_service.sequence + 1000}"},
+            buffered=False,
+        )
+        evenement = _evenement_suivant(iter(response.response))
+        response.close()
+        
+        assert evenement["event"] == "snapshot"
+    
+    def test_stream_other_epoch_sends_snapshot(self):
+        """Test qu'un id d'une autre époque (autre store) renvoie un snapshot, même avec une séquence plausible."""
+        job_service.create_job("data", "yaml", 1)
+        client = app_module.app.test_client()
+        
+        for dernier_id in ("autre:0", str(job_service.sequence)):
+            response = client.get("/api/jobs/stream", headers={"Last-Event-ID": dernier_id}, buffered=False)
+            evenement = _evenement_suivant(iter(response.response))
+            response.close()
+            
+            assert evenement["event"] == "snapshot"
+            assert evenement["epoque"] == job_service.epoque
+
+
+class TestVersionedEndpoints:
+    """Tests pour les ETag versionnés, les réponses 304 et les deltas `since`."""
+    
+    @pytest.fixture(autouse=True)
+    def sans_cle(self, monkeypatch):
+        """Désactiver la clé API."""
+        monkeypatch.setattr(config, "CLE_API", "")
+    
+    def test_jobs_not_modified_until_change(self):
+        """Test qu'un ETag inchangé donne 304 sans corps, puis 200 après un changement."""
+        job_id = job_service.create_job("data", "yaml", 1)
+        client = app_module.app.test_client()
+        
+        premiere = client.get("/api/jobs")
+        etag = premiere.headers["ETag"]
+        revalidation = client.get("/api/jobs", headers={"If-None-Match": etag})
+        
+        assert revalidation.status_code == 304
+        assert revalidation.data == b""
+        
+        job_service.update_job(job_id, status="termine")
+        apres = client.get("/api/jobs", headers={"If-None-Match": etag})
+        
+        assert apres.status_code == 200
+        assert apres.headers["ETag"] != etag
+        assert int(apres.headers["X-Version"]) > int(premiere.headers["X-Version"])
+    
+    def test_jobs_since_returns_only_changed_jobs(self):
+        """Test le delta ?since= de /api/jobs."""
+        job_id = job_service.create_job("data", "yaml", 1)
+        job_service.create_job("data", "json", 1)
+        client = app_module.app.test_client()
+        version = client.get("/api/jobs").headers["X-Version"]
+        
+        job_service.update_job(job_id, status="en_cours")
+        delta = client.get(f"/api/jobs?since={version}")
+        
+        assert [job["id"] for job in delta.get_json()] == [job_id]
+        assert client.get(f"/api/jobs?since={delta.headers['X-Version']}").get_json() == []
+        assert client.get("/api/jobs?since=abc").status_code == 400
+    
+    def test_job_status_etag(self):
+        """Test l'ETag propre à un job."""
+        job_id = job_service.create_job("data", "yaml", 1)
+        client = app_module.app.test_client()
+        
+        etag = client.get(f"/api/jobs/{job_id}").headers["ETag"]
+        job_service.create_job("data", "json", 1)
+        
+        # Un autre job a changé, pas celui-ci
+        assert client.get(f"/api/jobs/{job_id}", headers={"If-None-Match": etag}).status_code == 304
+        job_service.update_job(job_id, status="termine")
+        assert client.get(f"/api/jobs/{job_id}", headers={"If-None-Match": etag}).status_code == 200
+    
+    def test_history_etag_and_since(self, backend_historique):
+        """Test l'ETag et le delta ?since= de /api/history, pour les deux backends."""
+        service = history_service
+        service._save([
+            _entree_historique(i, "data", "termine", f"2026-04-{i + 1:02d}T12:00:00+00:00")
+            for i in range(3)
+        ])
+        client = app_module.app.test_client()
+        
+        premiere = client.get("/api/history")
+        etag = premiere.headers["ETag"]
+        assert client.get("/api/history", headers={"If-None-Match": etag}).status_code == 304
+        
+        entree = service.add_entry("job-neuf", "image", "png", {"jpg"}, 10, 1, 1, 0, "termine")
+        delta = client.get(f"/api/history?since={premiere.headers['X-Version']}", headers={"If-None-Match": etag})
+        
+        assert delta.status_code == 200
+        assert [e["id"] for e in delta.get_json()] == [entree.id]
+        assert client.get(f"/api/history?since={delta.headers['X-Version']}").get_json() == []
+        assert client.get("/api/history?since=-1").status_code == 400
+    
+    def test_history_etag_not_shared_across_stores(self, tmp_path, monkeypatch):
+        """Test qu'un ETag d'historique ne valide pas un autre journal ni l'autre backend à version égale."""
+        monkeypatch.setattr(config, "HISTORIQUE_BACKEND", "journal")
+        client = app_module.app.test_client()
+        entrees = [
+            _entree_historique(i, "data", "termine", f"2026-04-{i + 1:02d}T12:00:00+00:00")
+            for i in range(3)
+        ]
+        
+        etags = []
+        for dossier in ("premier", "second"):
+            monkeypatch.setattr(config, "HISTORIQUE_PATH", tmp_path / dossier / "history.json")
+            history_service._save(entrees)
+            etags.append(client.get("/api/history").headers["ETag"])
+        monkeypatch.setattr(config, "HISTORIQUE_BACKEND", "sqlite")
+        etags.append(client.get("/api/history").headers["ETag"])
+        
+        # Même version (3) partout, mais trois stockages distincts
+        assert len(set(etags)) == 3
+        reponse = client.get("/api/history", headers={"If-None-Match": etags[0]})
+        assert reponse.status_code == 200
+        assert len(reponse.get_json()) == 3
+
+
+@pytest.fixture(params=["memoire", "sqlite"])
+def backend_jobs(request, tmp_path, monkeypatch):
+    """Jobs isolés, pour chacun des deux stores."""
+    monkeypatch.setattr(config, "JOBS_BACKEND", request.param)
+    monkeypatch.setattr(config, "JOBS_PATH", tmp_path / "jobs.sqlite3")
+    return request.param
+
+
+class TestJobStore:
+    """Tests pour les stores de jobs (mémoire et SQLite)."""
+    
+    def test_job_contract(self, backend_jobs):
+        """Test création, mise à jour et lecture avec le même contrat `to_dict`."""
+        service = JobService()
+        job_id = service.create_job("data", "yaml", 2)
+        service.update_job(job_id, status="termine", success_count=2, inconnu="ignoré")
+        
+        job = service.get_job(job_id)
+        assert job.to_dict()["status"] == "termine"
+        assert job.success_count == 2
+        assert set(job.to_dict()) == set(Job(id="x", type="data", target_format="yaml", files_count=1).to_dict())
+        assert service.get_job("absent") is None
+        assert [j.id for j in service.get_recent_jobs(5)] == [job_id]
+    
+    def test_eviction_deletes_outputs(self, backend_jobs, tmp_path, monkeypatch):
+        """Test l'éviction des jobs les plus anciens et la suppression de leur sortie."""
+        monkeypatch.setattr(config, "MAX_JOBS_MEMOIRE", 2)
+        service = JobService()
+        sortie = tmp_path / "sortie.zip"
+        sortie.write_bytes(b"zip")
+        premier = service.create_job("data", "yaml", 1)
+        service.update_job(premier, api_output_path=str(sortie))
+        
+        service.create_job("data", "yaml", 1)
+        service.create_job("data", "yaml", 1)
+        service.wait_for_deletions()
+        
+        assert service.get_job(premier) is None
+        assert not sortie.exists()
+        assert len(service.get_recent_jobs(10)) == 2
+    
+    def test_sqlite_store_shared_between_instances(self, tmp_path, monkeypatch):
+        """Test qu'un job créé par un worker est visible et modifiable par un autre, et survit au redémarrage."""
+        monkeypatch.setattr(config, "JOBS_BACKEND", "sqlite")
+        monkeypatch.setattr(config, "JOBS_PATH", tmp_path / "jobs.sqlite3")
+        worker_a, worker_b = JobService(), JobService()
+        
+        job_id = worker_a.create_job("image", "png", 1)
+        worker_b.update_job(job_id, status="en_cours")
+        
+        assert worker_a.get_job(job_id).status == "en_cours"
+        assert worker_a.sequence == worker_b.sequence == 2
+        assert worker_a.epoque == worker_b.epoque
+        assert JobService().get_job(job_id).status == "en_cours"
+    
+    def test_sqlite_wait_sees_other_process_changes(self, tmp_path, monkeypatch):
+        """Test que l'attente SSE voit les changements d'un autre processus (sans notification)."""
+        monkeypatch.setattr(config, "JOBS_BACKEND", "sqlite")
+        monkeypatch.setattr(config, "JOBS_PATH", tmp_path / "jobs.sqlite3")
+        lecteur = JobService()
+        job_id = lecteur.create_job("data", "yaml", 1)
+        sequence = lecteur.sequence
+        
+        script = (
+            "import sys, config; from pathlib import Path; from services import JobService;"
+            "config.JOBS_BACKEND = 'sqlite'; config.JOBS_PATH = Path(sys.argv[1]);"
+            "JobService().update_job(sys.argv[2], status='termine')"
+        )
+        subprocess.run(
+            [sys.executable, "-c", script, str(config.JOBS_PATH), job_id],
+            check=True,
+            cwd=config.REP_BASE,
+        )
+        jobs, nouvelle = lecteur.wait_for_changes(sequence, timeout=5)
+        
+        assert [job["status"] for job in jobs] == ["termine"]
+        assert nouvelle == sequence + 1
+    
+    def test_filters_by_status_and_type(self, backend_jobs):
+        """Test les filtres statut/type, qui suivent les changements de statut."""
+        service = JobService()
+        ids = [service.create_job("data" if i % 2 == 0 else "image", "png", 1) for i in range(6)]
+        service.update_job(ids[0], status="termine")
+        service.update_job(ids[3], status="termine")
+        service.update_job(ids[4], status="termine")
+        
+        assert [j.id for j in service.get_recent_jobs(10, status="termine")] == [ids[4], ids[3], ids[0]]
+        assert [j.id for j in service.get_recent_jobs(10, status="termine", conversion_type="data")] == [ids[4], ids[0]]
+        assert [j.id for j in service.get_recent_jobs(1, status="en_attente")] == [ids[5]]
+        assert service.get_recent_jobs(10, status="inconnu") == []
+        
+        service.update_job(ids[4], status="erreur")
+        assert ids[4] not in [j.id for j in service.get_recent_jobs(10, status="termine")]
+    
+    def test_changes_since_follows_last_change(self, backend_jobs):
+        """Test que le delta est ordonné par dernier changement, sans doublon."""
+        service = JobService()
+        premier = service.create_job("data", "yaml", 1)
+        second = service.create_job("data", "yaml", 1)
+        sequence = service.sequence
+        service.update_job(premier, status="en_cours")
+        service.update_job(second, status="en_cours")
+        service.update_job(premier, status="termine")
+        
+        jobs, _ = service.changes_since(sequence)
+        assert [(job["id"], job["status"]) for job in jobs] == [(second, "en_cours"), (premier, "termine")]
+    
+    def test_api_jobs_filters(self, monkeypatch):
+        """Test GET /api/jobs?status=&type= et le refus de since combiné à un filtre."""
+        monkeypatch.setattr(config, "CLE_API", "")
+        job_id = job_service.create_job("audio", "mp3", 1)
+        job_service.update_job(job_id, status="erreur")
+        client = app_module.app.test_client()
+        
+        jobs = client.get("/api/jobs?status=erreur&type=audio").get_json()
+        
+        assert job_id in [job["id"] for job in jobs]
+        assert {(job["status"], job["type"]) for job in jobs} == {("erreur", "audio")}
+        assert client.get("/api/jobs?status=erreur&since=1").status_code == 400
+
+
+class TestSpooledConversion:
+    """Tests pour le dépôt sur disque des gros fichiers et la conversion par chemin."""
+    
+    @pytest.fixture(autouse=True)
+    def seuil_bas(self, monkeypatch):
+        """Déposer sur disque tout fichier de plus de 16 octets."""
+        monkeypatch.setattr(config, "SEUIL_SPOOL", 16)
+    
+    def test_spool_upload_threshold(self):
+        """Test qu'un petit fichier reste en mémoire et qu'un gros est écrit dans REP_SPOOL."""
+        from werkzeug.datastructures import FileStorage
+        
+        petit = utils.spool_upload(FileStorage(io.BytesIO(b"court"), filename="a.mp3"))
+        gros = utils.spool_upload(FileStorage(io.BytesIO(b"x" * 100), filename="b.MP3"))
+        
+        assert petit == b"court"
+        assert gros.parent == config.REP_SPOOL
+        assert gros.suffix == ".mp3"
+        assert gros.read_bytes() == b"x" * 100
+    
+    def test_audio_convert_path_never_loads_input(self, faux_ffmpeg, tmp_path):
+        """Test que FFmpeg lit et écrit directement les fichiers."""
+        entree = tmp_path / "son.mp4"
+        entree.write_bytes(b"video")
+        
+        result = AudioConverter().convert_path(entree, "mp4", "mp3", tmp_path / "sorties")
+        
+        assert result.output_bytes == b""
+        assert result.output_path.parent == tmp_path / "sorties"
+        assert result.output_path.read_bytes() == b"ID3video"
+        assert faux_ffmpeg.read_text().splitlines() == ["fichier"]
+    
+    def test_document_batch_from_paths(self, faux_soffice, tmp_path):
+        """Test un lot de documents sur disque: un appel LibreOffice, sorties dans REP_SPOOL."""
+        entrees = []
+        for i in range(3):
+            chemin = tmp_path / f"doc{i}.txt"
+            chemin.write_bytes(f"texte {i}".encode())
+            entrees.append((chemin.name, chemin, "text/plain"))
+        
+        resultats = ConversionService().convert_batch("document", "pdf", entrees)
+        
+        assert [r[0].read_bytes() for r in resultats] == [f"CONVERTI:texte {i}".encode() for i in range(3)]
+        assert all(r[0].parent == config.REP_SPOOL for r in resultats)
+        assert len([l for l in faux_soffice.read_text().splitlines() if l.startswith("convert")]) == 1
+    
+    def test_cached_path_result_is_a_file(self, faux_ffmpeg, tmp_path):
+        """Test qu'un résultat en cache est restitué en fichier pour une entrée sur disque."""
+        service = ConversionService(cache=CacheService())
+        entree = tmp_path / "son.mp4"
+        entree.write_bytes(b"video")
+        
+        premier = service.convert_file("audio", "mp3", "son.mp4", entree)
+        premier[0].unlink()
+        second = service.convert_file("audio", "mp3", "son.mp4", entree)
+        
+        assert isinstance(second[0], Path)
+        assert second[0].read_bytes() == b"ID3video"
+        assert faux_ffmpeg.read_text().splitlines() == ["fichier"]
+    
+    def test_zip_writer_reads_files_by_blocks(self, tmp_path):
+        """Test qu'une entrée ZIP peut provenir d'un fichier."""
+        chemin = tmp_path / "gros.wav"
+        chemin.write_bytes(os.urandom(600 * 1024))
+        writer = ZipStreamWriter()
+        
+        archive = b"".join([*writer.ajouter("gros.wav", chemin), *writer.terminer()])
+        
+        with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+            assert zf.read("gros.wav") == chemin.read_bytes()
+    
+    def test_api_spooled_upload_is_cleaned(self, faux_ffmpeg, api_env):
+        """Test le parcours API complet: dépôt, conversion par chemin, puis suppression du dépôt."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "audio",
+                "target_format": "mp3",
+                "file": _multipart_files((b"m" * 64, "clip.mp4")),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.status_code == 201
+        job = job_service.get_job(response.get_json()["job_id"])
+        assert Path(job.api_output_path).read_bytes() == b"ID3" + b"m" * 64
+        assert faux_ffmpeg.read_text().splitlines() == ["fichier"]
+        assert list(config.REP_SPOOL.iterdir()) == []
+    
+    def test_web_batch_streams_spooled_outputs(self, faux_ffmpeg, api_env):
+        """Test le formulaire web: ZIP diffusé depuis les sorties sur disque, dépôts supprimés."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/convert",
+            data={
+                "conversion_type": "audio",
+                "target_format": "wav",
+                "file": _multipart_files((b"a" * 40, "un.mp3"), (b"b" * 40, "deux.mp3")),
+            },
+            content_type="multipart/form-data",
+        )
+        archive = response.get_data()
+        response.close()
+        
+        with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+            assert sorted(n.split("_")[0] for n in zf.namelist()) == ["deux", "un"]
+        assert list(config.REP_SPOOL.iterdir()) == []
+
+
+class TestChunkedUploads:
+    """Tests pour les envois fractionnés avec reprise (/api/uploads)."""
+    
+    @pytest.fixture(autouse=True)
+    def envois_isoles(self, api_env, monkeypatch):
+        """Isoler les envois et réduire la taille des fragments."""
+        monkeypatch.setattr(config, "REP_ENVOIS", api_env / "chunked")
+        monkeypatch.setattr(config, "ENVOI_TAILLE_FRAGMENT", 16)
+    
+    @staticmethod
+    def _envoyer(client, upload_id, contenu, debut, total, **headers):
+        """Envoyer un fragment commençant à `debut`."""
+        fin = debut + len(contenu) - 1
+        return client.put(
+            f"/api/uploads/{upload_id}",
+            data=contenu,
+            headers={"Content-Range": f"bytes {debut}-{fin}/{total}", **headers},
+        )
+    
+    def test_resume_out_of_order_and_convert(self, faux_ffmpeg):
+        """Test un envoi repris dans le désordre, terminé puis converti par son ID."""
+        client = app_module.app.test_client()
+        contenu = bytes(range(40))
+        
+        creation = client.post("/api/uploads", json={"filename": "clip.mp4", "size": 40})
+        assert creation.status_code == 201
+        upload_id = creation.get_json()["upload_id"]
+        assert creation.headers["Location"] == f"/api/uploads/{upload_id}"
+        
+        # Fragments 2 puis 0; le fragment 1 est « interrompu »
+        assert self._envoyer(client, upload_id, contenu[32:], 32, 40).status_code == 200
+        assert self._envoyer(client, upload_id, contenu[:16], 0, 40).status_code == 200
+        etat = client.get(f"/api/uploads/{upload_id}").get_json()
+        assert etat["ranges"] == [[0, 16], [32, 40]]
+        assert etat["complete"] is False
+        assert client.post(f"/api/uploads/{upload_id}/complete").status_code == 409
+        
+        # Reprise: seul le trou est renvoyé
+        reponse = self._envoyer(
+            client, upload_id, contenu[16:32], 16, 40,
+            **{"X-Chunk-Sha256": hashlib.sha256(contenu[16:32]).hexdigest()},
+        )
+        assert reponse.get_json()["complete"] is True
+        
+        termine = client.post(
+            f"/api/uploads/{upload_id}/complete", json={"sha256": hashlib.sha256(contenu).hexdigest()}
+        )
+        assert termine.get_json()["finalized"] is True
+        
+        response = client.post(
+            "/api/convert",
+            data={"conversion_type": "audio", "target_format": "mp3", "upload_id": upload_id},
+        )
+        
+        assert response.status_code == 201
+        job = job_service.get_job(response.get_json()["job_id"])
+        assert Path(job.api_output_path).read_bytes() == b"ID3" + contenu
+        assert list(config.REP_SPOOL.iterdir()) == []
+        assert not (config.REP_ENVOIS / upload_id).exists()
+    
+    def test_chunk_checksum_mismatch_is_not_recorded(self):
+        """Test qu'un fragment dont l'empreinte diffère est refusé et reste à renvoyer."""
+        client = app_module.app.test_client()
+        upload_id = client.post("/api/uploads", json={"filename": "a.txt", "size": 8}).get_json()["upload_id"]
+        
+        reponse = self._envoyer(client, upload_id, b"abcdefgh", 0, 8, **{"X-Chunk-Sha256": "0" * 64})
+        
+        assert reponse.status_code == 400
+        assert client.get(f"/api/uploads/{upload_id}").get_json()["received"] == 0
+    
+    def test_bad_retry_keeps_verified_bytes(self):
+        """Test qu'un renvoi corrompu ou incomplet d'une plage reçue n'écrase pas les octets vérifiés."""
+        client = app_module.app.test_client()
+        upload_id = client.post("/api/uploads", json={"filename": "a.txt", "size": 8}).get_json()["upload_id"]
+        assert self._envoyer(client, upload_id, b"abcdefgh", 0, 8).status_code == 200
+        
+        assert self._envoyer(client, upload_id, b"XXXXXXXX", 0, 8, **{"X-Chunk-Sha256": "0" * 64}).status_code == 400
+        with pytest.raises(UploadError, match="incomplet"):
+            UploadService().write_chunk(upload_id, 0, 8, io.BytesIO(b"YY"))
+        
+        dossier = config.REP_ENVOIS / upload_id
+        assert (dossier / "data").read_bytes() == b"abcdefgh"
+        assert not list(dossier.glob("fragment-*"))
+        assert client.post(f"/api/uploads/{upload_id}/complete").get_json()["finalized"] is True
+    
+    def test_invalid_ranges_and_unknown_upload(self):
+        """Test les plages hors fichier, les fragments trop grands et les envois inconnus."""
+        client = app_module.app.test_client()
+        upload_id = client.post("/api/uploads", json={"filename": "a.txt", "size": 40}).get_json()["upload_id"]
+        
+        assert self._envoyer(client, upload_id, b"x" * 8, 36, 40).status_code == 416
+        assert self._envoyer(client, upload_id, b"x" * 8, 0, 99).status_code == 416
+        assert self._envoyer(client, upload_id, b"x" * 20, 0, 40).status_code == 413
+        assert client.put(f"/api/uploads/{upload_id}", data=b"x").status_code == 400
+        assert client.get("/api/uploads/../../etc").status_code == 404
+        assert client.get(f"/api/uploads/{'0' * 32}").status_code == 404
+        assert client.delete(f"/api/uploads/{upload_id}").status_code == 200
+        assert client.get(f"/api/uploads/{upload_id}").status_code == 404
+    
+    def test_convert_refuses_unfinished_upload(self):
+        """Test qu'un envoi non terminé ne peut pas être converti et reste intact."""
+        client = app_module.app.test_client()
+        upload_id = client.post("/api/uploads", json={"filename": "a.json", "size": 2}).get_json()["upload_id"]
+        self._envoyer(client, upload_id, b"{}", 0, 2)
+        
+        response = client.post(
+            "/api/convert",
+            data={"conversion_type": "data", "target_format": "yaml", "upload_id": upload_id},
+        )
+        
+        assert response.status_code == 409
+        assert client.get(f"/api/uploads/{upload_id}").get_json()["complete"] is True
+    
+    def test_expired_uploads_are_purged(self, monkeypatch):
+        """Test que les envois abandonnés sont supprimés à la création suivante."""
+        client = app_module.app.test_client()
+        ancien = client.post("/api/uploads", json={"filename": "a.txt", "size": 4}).get_json()["upload_id"]
+        monkeypatch.setattr(config, "ENVOI_EXPIRATION", -1)
+        
+        client.post("/api/uploads", json={"filename": "b.txt", "size": 4})
+        
+        assert client.get(f"/api/uploads/{ancien}").status_code == 404
+
+
+def _image(format_pil, taille, couleur=(200, 30, 30)):
+    """Créer une image unie encodée."""
+    from PIL import Image
+    
+    sortie = io.BytesIO()
+    Image.new("RGB", taille, couleur).save(sortie, format=format_pil)
+    return sortie.getvalue()
+
+
+class TestImageResize:
+    """Tests pour le redimensionnement des images (max_width, max_height, scale)."""
+    
+    def test_target_size_keeps_ratio_and_never_upscales(self):
+        """Test le calcul des dimensions de sortie."""
+        taille = (6000, 4000)
+        
+        assert ImageConverter.taille_cible(taille, max_width=1500) == (1500, 1000)
+        assert ImageConverter.taille_cible(taille, max_width=3000, max_height=500) == (750, 500)
+        assert ImageConverter.taille_cible(taille, scale=0.25) == (1500, 1000)
+        assert ImageConverter.taille_cible(taille, max_width=9000) == taille
+        assert ImageConverter.taille_cible(taille) == taille
+    
+    def test_jpeg_is_decoded_at_reduced_size(self, monkeypatch):
+        """Test qu'un JPEG est décodé directement à taille réduite (draft)."""
+        from PIL import Image, JpegImagePlugin
+        
+        drafts = []
+        draft = JpegImagePlugin.JpegImageFile.draft
+        
+        def _espion(self, mode, taille):
+            resultat = draft(self, mode, taille)
+            drafts.append(self.size)
+            return resultat
+        
+        monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", _espion)
+        result = ImageConverter().convert(_image("JPEG", (1600, 1200)), "jpg", "webp", max_width=200)
+        
+        # Décodage au 1/8 (200 x 150), sans passer par la pleine résolution
+        assert drafts == [(200, 150)]
+        assert Image.open(io.BytesIO(result.output_bytes)).size == (200, 150)
+    
+    def test_options_parsing(self):
+        """Test la validation des options de formulaire."""
+        assert utils.parse_conversion_options("image", {"max_width": "800", "scale": "", "max_height": None}) == {
+            "max_width": 800
+        }
+        assert utils.parse_conversion_options("image", {"scale": "1"}) == {}
+        assert utils.parse_conversion_options("data", {"max_width": "800"}) == {}
+        for invalide in ({"max_width": "0"}, {"max_height": "-5"}, {"scale": "1.5"}, {"scale": "nan"}):
+            with pytest.raises(ConversionError):
+                utils.parse_conversion_options("image", invalide)
+    
+    def test_cache_key_includes_options(self):
+        """Test qu'une sortie redimensionnée ne sert pas une autre taille."""
+        from PIL import Image
+        
+        cache = CacheService()
+        service = ConversionService(cache=cache)
+        png = _image("PNG", (400, 300))
+        
+        petite = service.convert_file("image", "jpg", "a.png", png, options={"max_width": 100})
+        grande = service.convert_file("image", "jpg", "a.png", png, options={"max_width": 200})
+        
+        assert Image.open(io.BytesIO(petite[0])).size == (100, 75)
+        assert Image.open(io.BytesIO(grande[0])).size == (200, 150)
+        assert cache.stats()["misses"] == 2
+    
+    def test_api_resize_same_format_and_profile(self, api_env, monkeypatch):
+        """Test l'API: redimensionnement au même format et options portées par un profil."""
+        from PIL import Image
+        
+        monkeypatch.setattr(config, "PROFILS_PATH", api_env / "profiles.json")
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "image",
+                "target_format": "jpg",
+                "scale": "0.5",
+                "file": _multipart_files((_image("JPEG", (320, 240)), "photo.jpg")),
+            },
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        job = job_service.get_job(response.get_json()["job_id"])
+        assert Image.open(job.api_output_path).size == (160, 120)
+        
+        profil = client.post(
+            "/api/profiles",
+            json={"type": "image", "name": "Web", "source": "jpg", "target": "webp", "options": {"max_width": 64}},
+        ).get_json()
+        assert profil["options"] == {"max_width": 64}
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "image",
+                "profile_id": profil["id"],
+                "file": _multipart_files((_image("JPEG", (320, 240)), "photo.jpg")),
+            },
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        job = job_service.get_job(response.get_json()["job_id"])
+        assert job.api_output_name.endswith(".webp")
+        assert Image.open(job.api_output_path).size == (64, 48)
+    
+    def test_api_rejects_invalid_options(self, api_env):
+        """Test qu'une option invalide est refusée avant toute conversion."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "image",
+                "target_format": "png",
+                "max_width": "large",
+                "file": _multipart_files((_image("JPEG", (32, 32)), "photo.jpg")),
+            },
+            content_type="multipart/form-data",
+        )
+        
+        assert response.status_code == 400
+
+
+class TestThumbnails:
+    """Tests pour les miniatures des sorties image."""
+    
+    def _convertir(self, client, contenu, nom, cible):
+        """Convertir une image par l'API et retourner le job."""
+        response = client.post(
+            "/api/convert",
+            data={"conversion_type": "image", "target_format": cible, "file": _multipart_files((contenu, nom))},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        return job_service.get_job(response.get_json()["job_id"])
+    
+    def test_thumbnail_is_bounded_and_generated_once(self, api_env, monkeypatch):
+        """Test qu'une miniature bornée est générée une fois puis servie depuis le disque."""
+        from PIL import Image
+        
+        monkeypatch.setattr(config, "VIGNETTE_TAILLE", 64)
+        client = app_module.app.test_client()
+        job = self._convertir(client, _image("JPEG", (800, 400)), "photo.jpg", "png")
+        
+        apercu = client.get(f"/api/jobs/{job.id}/preview").get_json()
+        assert apercu["type"] == "image"
+        assert apercu["url"] == f"/api/jobs/{job.id}/thumbnail"
+        assert "data" not in apercu
+        
+        premiere = client.get(apercu["url"])
+        assert premiere.status_code == 200
+        assert premiere.mimetype == "image/webp"
+        assert "private" in premiere.headers["Cache-Control"]
+        assert Image.open(io.BytesIO(premiere.get_data())).size == (64, 32)
+        
+        vignette = utils.thumbnail_path(Path(job.api_output_path))
+        date = vignette.stat().st_mtime_ns
+        seconde = client.get(apercu["url"], headers={"If-None-Match": premiere.headers["ETag"]})
+        assert seconde.status_code == 304
+        assert vignette.stat().st_mtime_ns == date
+    
+    def test_thumbnail_refreshed_when_output_changes(self, tmp_path):
+        """Test qu'une sortie plus récente que sa miniature la fait régénérer."""
+        from PIL import Image
+        
+        sortie = tmp_path / "image.png"
+        sortie.write_bytes(_image("PNG", (100, 100)))
+        vignette = utils.ensure_thumbnail(sortie)
+        
+        sortie.write_bytes(_image("PNG", (100, 50)))
+        os.utime(sortie, ns=(vignette.stat().st_mtime_ns + 10**9,) * 2)
+        
+        assert Image.open(utils.ensure_thumbnail(sortie)).size == (100, 50)
+    
+    def test_no_thumbnail_for_pdf_output(self, api_env):
+        """Test qu'une sortie non image n'a pas de miniature."""
+        client = app_module.app.test_client()
+        job = self._convertir(client, _image("PNG", (20, 20)), "a.png", "pdf")
+        
+        assert client.get(f"/api/jobs/{job.id}/thumbnail").status_code == 404
+    
+    def test_evicted_job_thumbnail_is_deleted(self, api_env, monkeypatch):
+        """Test que la miniature d'un job évincé est supprimée avec sa sortie."""
+        monkeypatch.setattr(config, "MAX_JOBS_MEMOIRE", 1)
+        service = JobService()
+        sortie = api_env / "sortie.png"
+        sortie.write_bytes(_image("PNG", (10, 10)))
+        job_id = service.create_job("image", "png", 1)
+        service.update_job(job_id, api_output_path=str(sortie))
+        vignette = utils.ensure_thumbnail(sortie)
+        
+        service.create_job("image", "png", 1)
+        service.wait_for_deletions()
+        
+        assert not sortie.exists()
+        assert not vignette.exists()
+
+
+class TestTextPreview:
+    """Tests pour l'aperçu texte à lecture bornée."""
+    
+    def test_only_a_bounded_window_is_read(self, tmp_path):
+        """Test que la fin d'un gros fichier n'est ni lue ni décodée."""
+        chemin = tmp_path / "gros.txt"
+        # Un octet invalide loin après la fenêtre: une lecture complète le prendrait pour un binaire
+        chemin.write_bytes(b"ligne\n" * 200_000 + b"\xff")
+        
+        apercu = utils.generate_preview(chemin, max_chars=50)
+        
+        assert apercu["type"] == "text"
+        assert apercu["data"] == ("ligne\n" * 9)[:50]
+        assert apercu["truncated"] is True
+        assert apercu["size"] == 1_200_001
+    
+    def test_multibyte_character_cut_at_window_edge(self, tmp_path):
+        """Test qu'un caractère UTF-8 coupé au bord de la fenêtre n'est pas pris pour un binaire."""
+        chemin = tmp_path / "accents.txt"
+        # 1 + 2 × 5000 octets: la fenêtre de TAILLE_SONDE_BINAIRE octets coupe un « é »
+        chemin.write_text("a" + "é" * 5000, encoding="utf-8")
+        
+        apercu = utils.generate_preview(chemin, max_chars=100)
+        
+        assert apercu["type"] == "text"
+        assert apercu["data"] == "a" + "é" * 99
+        assert apercu["truncated"] is True
+    
+    def test_truncation_and_binary_detection(self, tmp_path):
+        """Test la troncature exacte et la détection d'un binaire par octet nul."""
+        exact = tmp_path / "exact.txt"
+        exact.write_text("x" * 100, encoding="utf-8")
+        fins = tmp_path / "fins.txt"
+        fins.write_bytes(b"a\r\nb\rc")
+        binaire = tmp_path / "donnees.bin"
+        binaire.write_bytes(b"texte" + b"\x00" * 10 + b"suite")
+        
+        assert utils.generate_preview(exact, max_chars=100)["truncated"] is False
+        assert utils.generate_preview(exact, max_chars=99)["truncated"] is True
+        assert utils.generate_preview(fins)["data"] == "a\nb\nc"
+        assert utils.generate_preview(binaire)["type"] == "binary"
+
+
+class TestResumableDownloads:
+    """Tests pour les téléchargements par plages et le cache des sorties."""
+    
+    def _job_termine(self, client, contenu=b'{"cle": "valeur"}'):
+        """Convertir un fichier et retourner le job terminé."""
+        response = client.post(
+            "/api/convert",
+            data={"conversion_type": "data", "target_format": "yaml", "file": _multipart_files((contenu, "a.json"))},
+            content_type="multipart/form-data",
+        )
+        return job_service.get_job(response.get_json()["job_id"])
+    
+    def test_strong_etag_is_content_hash_and_output_is_immutable(self, api_env):
+        """Test l'ETag fort (SHA-256 du contenu) et le Cache-Control immuable."""
+        client = app_module.app.test_client()
+        job = self._job_termine(client)
+        
+        response = client.get(f"/api/jobs/{job.id}/download")
+        contenu = response.get_data()
+        
+        assert job.api_output_sha256 == hashlib.sha256(contenu).hexdigest()
+        assert response.headers["ETag"] == f'"{job.api_output_sha256}"'
+        assert response.headers["Accept-Ranges"] == "bytes"
+        cache_control = response.headers["Cache-Control"]
+        assert "immutable" in cache_control
+        assert "public" in cache_control
+        assert "no-cache" not in cache_control
+        
+        revalidation = client.get(f"/api/jobs/{job.id}/download", headers={"If-None-Match": response.headers["ETag"]})
+        assert revalidation.status_code == 304
+    
+    def test_range_and_if_range(self, api_env):
+        """Test la reprise d'un téléchargement: 206 si l'ETag correspond, sortie complète sinon."""
+        client = app_module.app.test_client()
+        job = self._job_termine(client)
+        complet = Path(job.api_output_path).read_bytes()
+        etag = f'"{job.api_output_sha256}"'
+        
+        partiel = client.get(f"/api/jobs/{job.id}/download", headers={"Range": "bytes=4-", "If-Range": etag})
+        assert partiel.status_code == 206
+        assert partiel.get_data() == complet[4:]
+        assert partiel.headers["Content-Range"] == f"bytes 4-{len(complet) - 1}/{len(complet)}"
+        
+        perime = client.get(f"/api/jobs/{job.id}/download", headers={"Range": "bytes=4-", "If-Range": '"autre"'})
+        assert perime.status_code == 200
+        assert perime.get_data() == complet
+        
+        hors_limite = client.get(f"/api/jobs/{job.id}/download", headers={"Range": f"bytes={len(complet) + 10}-"})
+        assert hors_limite.status_code == 416
+    
+    def test_zip_hash_computed_while_streaming(self, api_env):
+        """Test que l'empreinte d'un lot ZIP correspond à l'archive écrite."""
+        client = app_module.app.test_client()
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "yaml",
+                "file": _multipart_files((b'{"a": 1}', "a.json"), (b'{"b": 2}', "b.json")),
+            },
+            content_type="multipart/form-data",
+        )
+        job = job_service.get_job(response.get_json()["job_id"])
+        
+        assert job.api_output_mimetype == "application/zip"
+        assert job.api_output_sha256 == utils.sha256_file(Path(job.api_output_path))
+    
+    def test_private_cache_with_api_key(self, api_env, monkeypatch):
+        """Test qu'une sortie protégée par clé API n'est pas cachée par un proxy partagé."""
+        client = app_module.app.test_client()
+        job = self._job_termine(client)
+        monkeypatch.setattr(config, "CLE_API", "secret")
+        
+        response = client.get(f"/api/jobs/{job.id}/download", headers={"X-API-Key": "secret"})
+        
+        assert "private" in response.headers["Cache-Control"]
+        assert "public" not in response.headers["Cache-Control"]
+
+
+class TestEncoderTiers:
+    """Tests pour les niveaux d'encodage des images et de l'audio."""
+    
+    def test_options_parsing(self):
+        """Test la validation du niveau (images et audio uniquement)."""
+        assert utils.parse_conversion_options("image", {"tier": "Fast"}) == {"tier": "fast"}
+        assert utils.parse_conversion_options("audio", {"tier": "max_compression", "max_width": "10"}) == {
+            "tier": "max_compression"
+        }
+        assert utils.parse_conversion_options("data", {"tier": "fast"}) == {}
+        with pytest.raises(ConversionError):
+            utils.parse_conversion_options("image", {"tier": "ultra"})
+    
+    def test_image_tiers_change_encoding(self):
+        """Test qu'un niveau rapide produit un PNG plus gros qu'un niveau compressé."""
+        from PIL import Image
+        
+        img = Image.linear_gradient("L").resize((512, 512)).convert("RGB")
+        tampon = io.BytesIO()
+        img.save(tampon, format="JPEG")
+        
+        rapide = ImageConverter().convert(tampon.getvalue(), "jpg", "png", tier="fast")
+        compresse = ImageConverter().convert(tampon.getvalue(), "jpg", "png", tier="max_compression")
+        
+        assert len(rapide.output_bytes) > len(compresse.output_bytes)
+        assert Image.open(io.BytesIO(rapide.output_bytes)).tobytes() == Image.open(
+            io.BytesIO(compresse.output_bytes)
+        ).tobytes()
+    
+    def test_default_tier_from_config(self, monkeypatch):
+        """Test que le niveau par défaut vient de la configuration et entre dans la clé de cache."""
+        cache = CacheService()
+        service = ConversionService(cache=cache)
+        png = _image("PNG", (64, 64))
+        
+        monkeypatch.setattr(config, "NIVEAU_ENCODAGE_DEFAUT", "fast")
+        service.convert_file("image", "webp", "a.png", png)
+        service.convert_file("image", "webp", "a.png", png, options={"tier": "fast"})
+        monkeypatch.setattr(config, "NIVEAU_ENCODAGE_DEFAUT", "max_compression")
+        service.convert_file("image", "webp", "a.png", png)
+        
+        assert cache.stats()["misses"] == 2
+        assert cache.stats()["hits"] == 1
+    
+    def test_unknown_default_tier_refused_at_startup(self):
+        """Test qu'une valeur inconnue de ENCODER_TIER empêche le chargement de la configuration."""
+        resultat = subprocess.run(
+            [sys.executable, "-c", "import config"],
+            cwd=config.REP_BASE,
+            env={**os.environ, "ENCODER_TIER": "turbo"},
+            capture_output=True,
+            text=True,
+        )
+        
+        assert resultat.returncode != 0
+        assert "ENCODER_TIER" in resultat.stderr
+    
+    def test_audio_tier_ffmpeg_arguments(self, faux_ffmpeg, monkeypatch, tmp_path):
+        """Test que le niveau est traduit en arguments FFmpeg (MP3 uniquement)."""
+        commandes = []
+        run = subprocess.run
+        
+        def _espion(cmd, **kwargs):
+            commandes.append(cmd)
+            return run(cmd, **kwargs)
+        
+        monkeypatch.setattr(subprocess, "run", _espion)
+        entree = tmp_path / "a.mp4"
+        entree.write_bytes(b"audio")
+        
+        AudioConverter().convert_path(entree, "mp4", "mp3", tmp_path / "sortie", tier="fast")
+        AudioConverter().convert_path(entree, "mp4", "mp3", tmp_path / "sortie", tier="max_compression")
+        
+        assert commandes[0][-5:-1] == ["-b:a", "192k", "-compression_level", "9"]
+        assert commandes[1][-5:-1] == ["-q:a", "6", "-compression_level", "0"]
+        assert AudioConverter._parametres_encodage("wav", "fast") == []
+    
+    def test_api_tier_from_profile(self, api_env, monkeypatch):
+        """Test qu'un profil mémorise le niveau et que l'API l'applique."""
+        monkeypatch.setattr(config, "PROFILS_PATH", api_env / "profiles.json")
+        client = app_module.app.test_client()
+        niveaux = []
+        convert = ImageConverter.convert
+        
+        def _espion(self, *args, **kwargs):
+            niveaux.append(kwargs.get("tier"))
+            return convert(self, *args, **kwargs)
+        
+        monkeypatch.setattr(ImageConverter, "convert", _espion)
+        
+        profil = client.post(
+            "/api/profiles",
+            json={"type": "image", "name": "Rapide", "source": "jpg", "target": "png", "options": {"tier": "fast"}},
+        ).get_json()
+        assert profil["options"] == {"tier": "fast"}
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "image",
+                "profile_id": profil["id"],
+                "file": _multipart_files((_image("JPEG", (32, 32)), "photo.jpg")),
+            },
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        assert niveaux == ["fast"]
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "image",
+                "target_format": "png",
+                "tier": "ultra",
+                "file": _multipart_files((_image("JPEG", (32, 32)), "photo.jpg")),
+            },
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 400
+
+
+class TestDataStreaming:
+    """Tests pour la conversion JSON/YAML en flux."""
+    
+    DONNEES = {
+        "texte": "é\n ligne",
+        "nombres": [1, -2.5, 1e20, 123456789012345678901234567890],
+        "ambigus": ["123", "yes", "null", "a: b", "#x", ""],
+        "constantes": [True, False, None],
+        "vides": {"objet": {}, "liste": []},
+        "imbrique": [{"a": [{"b": "c"}]} for _ in range(3)],
+    }
+    
+    def test_same_output_as_full_load(self, monkeypatch):
+        """Test que la sortie en flux est identique à un chargement complet, blocs coupés compris."""
+        import yaml
+        
+        monkeypatch.setattr(data_stream, "TAILLE_BLOC", 7)
+        converter = DataConverter()
+        source = json.dumps(self.DONNEES).encode()
+        
+        en_yaml = converter.convert(source, "json", "yaml").output_bytes.decode()
+        assert en_yaml == yaml.safe_dump(self.DONNEES, sort_keys=False, allow_unicode=True)
+        
+        en_json = converter.convert(en_yaml.encode(), "yaml", "json").output_bytes.decode()
+        assert en_json == json.dumps(self.DONNEES, indent=2, ensure_ascii=False) + "\n"
+        
+        # Racine scalaire: marqueur de fin `...` après un scalaire simple seulement, comme yaml.safe_dump
+        for scalaire in (b"5", b'"texte"', b"\"'q'\"", b'"1e3"', b"null", b"[]"):
+            assert converter.convert(scalaire, "json", "yaml").output_bytes == yaml.safe_dump(
+                json.loads(scalaire), allow_unicode=True
+            ).encode()
+    
+    def test_duplicate_keys_keep_last_value(self):
+        """Test qu'une clé répétée garde sa dernière valeur (chargement complet), sans clé dupliquée en sortie."""
+        converter = DataConverter()
+        
+        en_yaml = converter.convert(b'{"a": 1, "b": [{"c": 1, "c": 3}], "a": 2}', "json", "yaml")
+        assert en_yaml.output_bytes == b"a: 2\nb:\n- c: 3\n"
+        
+        en_json = converter.convert(b"a: 1\nb: {a: 1}\na: 2\n", "yaml", "json")
+        assert json.loads(en_json.output_bytes) == {"a": 2, "b": {"a": 1}}
+        assert en_json.output_bytes.count(b'"a"') == 2
+    
+    def test_lone_surrogate(self):
+        """Test qu'une demi-paire de substitution isolée est échappée en YAML, refusée en JSON."""
+        converter = DataConverter()
+        
+        for source in (b'{"emoji": "\\ud83d"}', b'emoji: "\\uD83D"\n'):
+            assert converter.convert(source, "yaml", "yaml").output_bytes == b'emoji: "\\uD83D"\n'
+        for target in ("json", "ndjson"):
+            with pytest.raises(ConversionError, match="UTF-8"):
+                converter.convert(b'{"emoji": "\\ud83d"}', "json", target)
+    
+    def test_same_bytes_as_full_load_over_corpus(self):
+        """Test sur un corpus aléatoire (graine fixe) que la sortie est celle de json.loads/yaml.safe_load puis json.dumps/yaml.safe_dump."""
+        import random
+        
+        import yaml
+        
+        hasard = random.Random(22)
+        morceaux = ["", " ", "a", "1e3", "null", "yes", "~", ":", "- ", "# ", "'", '"', "\\", "\n", "\t",
+                    "\x00", "\x85", "\xa0", "\u2028", "\ufeff", "é", "😀", "---", "...", "<<", "!x", "&", "*", "0x1"]
+        
+        def _valeur(profondeur):
+            choix = hasard.randrange(9 if profondeur < 3 else 6)
+            if choix == 0:
+                return "".join(hasard.choice(morceaux) for _ in range(hasard.randrange(4)))
+            if choix == 1:
+                return hasard.choice([0, -7, 2**63, 10**30])
+            if choix == 2:
+                return hasard.choice([0.5, -1e-7, 1e20])
+            if choix == 3:
+                return hasard.choice([True, False])
+            if choix == 4:
+                return None
+            if choix == 5:
+                return hasard.choice(morceaux)
+            if choix == 6:
+                return [_valeur(profondeur + 1) for _ in range(hasard.randrange(4))]
+            return {hasard.choice(morceaux) + hasard.choice(morceaux): _valeur(profondeur + 1)
+                    for _ in range(hasard.randrange(4))}
+        
+        def _reference(texte, target):
+            try:
+                donnees = json.loads(texte)
+            except ValueError:
+                donnees = yaml.safe_load(texte)
+            if target == "json":
+                return (json.dumps(donnees, indent=2, ensure_ascii=False) + "\n").encode()
+            return yaml.safe_dump(donnees, sort_keys=False, allow_unicode=True).encode()
+        
+        converter = DataConverter()
+        for _ in range(300):
+            donnees = _valeur(0)
+            sources = {
+                "json": json.dumps(donnees, indent=hasard.choice([None, 2]), ensure_ascii=hasard.random() < 0.5),
+                "yaml": yaml.safe_dump(donnees, sort_keys=False, allow_unicode=hasard.random() < 0.5),
+            }
+            for source, texte in sources.items():
+                for target in ("json", "yaml"):
+                    sortie = converter.convert(texte.encode(), source, target).output_bytes
+                    assert sortie == _reference(texte, target), (texte, target)
+    
+    def test_yaml_aliases_and_merge_keys(self):
+        """Test les alias rejoués en flux et la clé de fusion (chargement complet)."""
+        converter = DataConverter()
+        
+        alias = converter.convert(b"base: &b {x: 1, y: [1, 2]}\ncopie: *b\n", "yaml", "json")
+        assert json.loads(alias.output_bytes) == {"base": {"x": 1, "y": [1, 2]}, "copie": {"x": 1, "y": [1, 2]}}
+        
+        fusion = converter.convert(b"base: &b {x: 1}\nautre:\n  <<: *b\n  z: 2\n", "yaml", "json")
+        assert json.loads(fusion.output_bytes) == {"base": {"x": 1}, "autre": {"x": 1, "z": 2}}
+    
+    def test_invalid_inputs(self):
+        """Test les erreurs: syntaxe, UTF-8 invalide, valeur sans équivalent JSON."""
+        converter = DataConverter()
+        
+        with pytest.raises(ConversionError, match="Impossible de parser"):
+            converter.convert(b"a: [1\n", "yaml", "json")
+        with pytest.raises(ConversionError, match="UTF-8"):
+            converter.convert(b'{"a": "\xff"}', "json", "yaml")
+        with pytest.raises(ConversionError, match="non représentable"):
+            converter.convert(b"date: 2024-01-01\n", "yaml", "json")
+    
+    def test_spooled_input_is_converted_file_to_file(self, tmp_path):
+        """Test qu'une entrée déposée sur disque produit une sortie sur disque, sans passer en mémoire."""
+        entree = tmp_path / "gros.json"
+        entree.write_text(json.dumps([{"id": i, "nom": f"élément {i}"} for i in range(2000)]), encoding="utf-8")
+        
+        sortie, fmt, mimetype = ConversionService().convert_file("data", "yaml", "gros.json", entree)
+        
+        assert isinstance(sortie, Path) and sortie.parent == config.REP_SPOOL
+        assert (fmt, mimetype) == ("yaml", "application/x-yaml")
+        assert sortie.read_text(encoding="utf-8").startswith("- id: 0\n  nom: élément 0\n")
+
+
+class TestDataSniffing:
+    """Tests pour la détection du format des données et l'usage de libyaml."""
+    
+    def _lecteurs_utilises(self, monkeypatch) -> list:
+        """Espionner les lecteurs appelés par DataConverter."""
+        appels = []
+        for nom in ("evenements_json", "evenements_yaml"):
+            lecteur = getattr(data_stream, nom)
+            
+            def _espion(texte, lecteur=lecteur, nom=nom):
+                appels.append(nom)
+                return lecteur(texte)
+            
+            monkeypatch.setattr(data_stream, nom, _espion)
+        return appels
+    
+    def test_yaml_is_not_scanned_as_json_first(self, monkeypatch):
+        """Test qu'un YAML est lu directement par le lecteur YAML."""
+        appels = self._lecteurs_utilises(monkeypatch)
+        
+        resultat = DataConverter().convert(b"# config\na: 1\n", "yaml", "json")
+        
+        assert json.loads(resultat.output_bytes) == {"a": 1}
+        assert appels == ["evenements_yaml"]
+    
+    def test_json_content_detected_from_leading_bytes(self, monkeypatch):
+        """Test qu'un contenu JSON annoncé en YAML (.txt, .conf) passe par le lecteur JSON."""
+        appels = self._lecteurs_utilises(monkeypatch)
+        
+        resultat = DataConverter().convert(b'\xef\xbb\xbf  \n{"a": [1, 2]}', "yaml", "yaml")
+        
+        assert resultat.output_bytes == b"a:\n- 1\n- 2\n"
+        assert appels == ["evenements_json"]
+    
+    def test_misnamed_yaml_falls_back(self, monkeypatch):
+        """Test qu'un YAML nommé .json est tout de même converti."""
+        appels = self._lecteurs_utilises(monkeypatch)
+        
+        resultat = DataConverter().convert(b"a: 1\n", "json", "json")
+        
+        assert json.loads(resultat.output_bytes) == {"a": 1}
+        assert appels == ["evenements_json", "evenements_yaml"]
+    
+    def test_libyaml_used_when_available(self):
+        """Test que libyaml lit le YAML quand il est présent, l'écriture restant en Python."""
+        import yaml
+        
+        if yaml.__with_libyaml__:
+            assert data_stream.ChargeurYaml is yaml.CSafeLoader
+        else:
+            assert data_stream.ChargeurYaml is yaml.SafeLoader
+        # Écriture: émetteur Python, celui de yaml.safe_dump
+        assert data_stream.DumperYaml is yaml.SafeDumper
+    
+    def test_service_passes_bytes_unchanged(self, monkeypatch):
+        """Test que le service transmet les octets sans décodage ni réencodage."""
+        recus = []
+        convert = DataConverter.convert
+        
+        def _espion(self, input_bytes, *args, **kwargs):
+            recus.append(input_bytes)
+            return convert(self, input_bytes, *args, **kwargs)
+        
+        monkeypatch.setattr(DataConverter, "convert", _espion)
+        source = b'{"a": 1}'
+        
+        ConversionService().convert_file("data", "yaml", "a.json", source)
+        
+        assert recus[0] is source
+
+
+class TestNdjson:
+    """Tests pour le NDJSON et les flux YAML à plusieurs documents."""
+    
+    FLUX_YAML = b"id: 1\ntags: [a, b]\n---\nid: 2\nref: &r {k: v}\ncopie: *r\n---\n- 3\n- 4\n"
+    
+    def test_multi_document_yaml_to_json_array_and_ndjson(self):
+        """Test qu'un flux YAML donne un tableau JSON, ou une ligne NDJSON par document."""
+        converter = DataConverter()
+        documents = [{"id": 1, "tags": ["a", "b"]}, {"id": 2, "ref": {"k": "v"}, "copie": {"k": "v"}}, [3, 4]]
+        
+        assert json.loads(converter.convert(self.FLUX_YAML, "yaml", "json").output_bytes) == documents
+        
+        lignes = converter.convert(self.FLUX_YAML, "yaml", "ndjson").output_bytes.decode().splitlines()
+        assert [json.loads(ligne) for ligne in lignes] == documents
+        assert lignes[0] == '{"id":1,"tags":["a","b"]}'
+    
+    def test_ndjson_to_json_and_yaml(self):
+        """Test qu'un NDJSON donne un tableau JSON et un flux YAML, lignes vides ignorées."""
+        import yaml
+        
+        converter = DataConverter()
+        source = b'{"a": 1}\n\n[1, 2]\n"texte"\n'
+        
+        assert json.loads(converter.convert(source, "ndjson", "json").output_bytes) == [{"a": 1}, [1, 2], "texte"]
+        assert list(yaml.safe_load_all(converter.convert(source, "ndjson", "yaml").output_bytes)) == [
+            {"a": 1},
+            [1, 2],
+            "texte",
+        ]
+        assert converter.convert(b"", "ndjson", "json").output_bytes == b"[]\n"
+    
+    def test_json_array_to_ndjson(self):
+        """Test qu'un tableau JSON donne une ligne par élément, un document seul une ligne."""
+        converter = DataConverter()
+        
+        resultat = converter.convert(b'[{"a": 1}, {"b": {}}, [], 5]', "json", "ndjson")
+        assert resultat.output_bytes == b'{"a":1}\n{"b":{}}\n[]\n5\n'
+        assert resultat.mimetype == "application/x-ndjson"
+        assert converter.convert(b'{"a": [1]}', "json", "ndjson").output_bytes == b'{"a":[1]}\n'
+    
+    def test_records_streamed_one_at_a_time(self):
+        """Test que le NDJSON est lu ligne à ligne, sans attendre la fin du fichier."""
+        lus = []
+        
+        class _Lignes(io.StringIO):
+            def __next__(self):
+                ligne = super().__next__()
+                lus.append(ligne)
+                return ligne
+        
+        evenements = data_stream.evenements_ndjson(_Lignes('{"a": 1}\n{"b": 2}\n'))
+        
+        assert next(evenements) == (data_stream.DEBUT_DOCUMENT, None)
+        assert lus == ['{"a": 1}\n']
+    
+    def test_invalid_line_reports_line_number(self):
+        """Test qu'une ligne invalide est signalée avec son numéro."""
+        with pytest.raises(data_stream.ErreurSyntaxe, match="Ligne 2"):
+            list(data_stream.evenements_ndjson(io.StringIO('{"a": 1}\n{faux\n')))
+    
+    def test_api_ndjson_upload(self, api_env):
+        """Test l'API: .jsonl accepté en entrée et ndjson en format cible."""
+        client = app_module.app.test_client()
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "json",
+                "file": _multipart_files((b'{"a": 1}\n{"a": 2}\n', "export.jsonl")),
+            },
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        job = job_service.get_job(response.get_json()["job_id"])
+        assert json.loads(Path(job.api_output_path).read_bytes()) == [{"a": 1}, {"a": 2}]
+        
+        response = client.post(
+            "/api/convert",
+            data={
+                "conversion_type": "data",
+                "target_format": "ndjson",
+                "file": _multipart_files((self.FLUX_YAML, "flux.yaml")),
+            },
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        job = job_service.get_job(response.get_json()["job_id"])
+        assert job.api_output_name.endswith(".ndjson")
+        assert len(Path(job.api_output_path).read_bytes().splitlines()) == 3
+
+
+class TestConverterRegistry:
+    """Tests pour le registre des convertisseurs et /api/capabilities."""
+    
+    def test_singletons_and_aliases(self):
+        """Test que le registre renvoie des instances partagées et normalise les alias."""
+        premier = converters.get_converter("image", "png", "jpg")
+        
+        assert converters.get_converter("image", "PNG", "jpeg") is premier
+        assert converters.get_converter("image", "svg", "png") is not premier
+        assert converters.registry.resolve("data", "yml", "json") == (
+            converters.get_converter("data", "json", "yaml"), "yaml", "json"
+        )
+        assert converters.registry.resolve("data", "jsonl", "yaml")[1] == "ndjson"
+    
+    def test_error_messages(self):
+        """Test les erreurs: type inconnu, source, cible, paire et même format."""
+        cas = {
+            ("video", "mp4", "mp3"): "Type de conversion inconnu",
+            ("audio", "ogg", "mp3"): r"Format source non supporté pour l'audio \(MP3 ou MP4\)",
+            ("image", "png", "gif"): "Format de sortie invalide pour les images",
+            ("audio", "mp4", "wav"): "Pour les MP4, seul le format MP3 est supporté",
+            ("document", "pdf", "pdf"): "déjà au format PDF",
+            ("image", "pdf", "png"): "Format source non supporté",
+        }
+        for (conversion_type, source, target), message in cas.items():
+            with pytest.raises(ConversionError, match=message):
+                converters.registry.resolve(conversion_type, source, target)
+    
+    def test_service_uses_registry(self):
+        """Test que le service passe par le registre (même format refusé sans options)."""
+        service = ConversionService()
+        
+        sortie, output_format, _ = service.convert_file("data", "json", "a.yml", b"a: 1\n")
+        assert (json.loads(sortie), output_format) == ({"a": 1}, "json")
+        with pytest.raises(ConversionError, match="déjà au format"):
+            service.convert_file("image", "jpg", "photo.jpeg", _image("JPEG", (10, 10)))
+        sortie, output_format, _ = service.convert_file(
+            "image", "jpg", "photo.jpeg", _image("JPEG", (100, 50)), options={"max_width": 20}
+        )
+        assert output_format == "jpg"
+    
+    def test_api_capabilities(self):
+        """Test que /api/capabilities expose la matrice du registre."""
+        client = app_module.app.test_client()
+        response = client.get("/api/capabilities")
+        
+        assert response.status_code == 200
+        matrice = response.get_json()
+        assert matrice == converters.registry.capabilities()
+        assert matrice["audio"]["conversions"] == {"mp3": ["wav"], "mp4": ["mp3"]}
+        assert matrice["data"]["conversions"]["yaml"] == ["json", "ndjson"]
+        assert matrice["image"]["aliases"] == {"jpeg": "jpg"}
+        assert "pdf" not in matrice["image"]["conversions"]
+        for conversion_type, cibles in config.FORMATS_CIBLES_AUTORISES.items():
+            proposees = {cible for liste in matrice[conversion_type]["conversions"].values() for cible in liste}
+            assert proposees == {converters.registry.normalize(conversion_type, cible) for cible in cibles}
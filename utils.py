@@ -1,6 +1,10 @@
 """Utilitaires du projet."""
 
+import codecs
+import hashlib
 import os
+import shutil
+import uuid
 from pathlib import Path
 from datetime import datetime, timezone
 
@@ -42,6 +46,65 @@ def get_total_upload_size(files: list) -> int:
     return total
 
 
+def spool_upload(file_obj) -> bytes | Path:
+    """Lire un fichier envoyé, ou l'écrire dans REP_SPOOL s'il dépasse SEUIL_SPOOL.
+    
+    Au-delà du seuil, le fichier est copié par blocs sur disque (jamais
+    entièrement en mémoire) et son chemin est retourné: l'appelant le
+    supprime une fois la conversion terminée.
+    """
+    if get_file_size(file_obj) <= config.SEUIL_SPOOL:
+        return file_obj.read()
+    
+    config.REP_SPOOL.mkdir(parents=True, exist_ok=True)
+    suffixe = Path(file_obj.filename or "").suffix.lower()
+    chemin = config.REP_SPOOL / f"{uuid.uuid4().hex}{suffixe}"
+    file_obj.save(chemin)
+    return chemin
+
+
+def input_size(data: bytes | Path) -> int:
+    """Taille d'une entrée ou d'une sortie, en mémoire ou sur disque."""
+    if isinstance(data, Path):
+        return data.stat().st_size
+    return len(data)
+
+
+def read_input(data: bytes | Path) -> bytes:
+    """Octets d'une entrée (lue depuis le disque si besoin)."""
+    if isinstance(data, Path):
+        return data.read_bytes()
+    return data
+
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    """Créer `destination` comme lien physique vers `source`, ou en copie si impossible.
+    
+    Le lien évite toute copie sur un même système de fichiers; la copie
+    (autre système de fichiers) se fait par blocs.
+    """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def sha256_file(chemin: Path) -> str:
+    """SHA-256 hexadécimal d'un fichier, lu par blocs."""
+    empreinte = hashlib.sha256()
+    with chemin.open("rb") as fichier:
+        while bloc := fichier.read(1024 * 1024):
+            empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def delete_spooled(*values) -> None:
+    """Supprimer les fichiers sur disque parmi des entrées ou sorties (les octets sont ignorés)."""
+    for value in values:
+        if isinstance(value, Path):
+            delete_file(str(value))
+
+
 def normalize_image_format(fmt: str) -> str:
     """Normaliser le format d'image (jpeg → jpg)."""
     return "jpg" if fmt in {"jpg", "jpeg"} else fmt
@@ -79,13 +142,152 @@ def validate_conversion_request(conversion_type: str, target_format: str) -> Non
         raise ConversionError("Format cible invalide pour ce type de conversion.")
 
 
+def parse_conversion_options(conversion_type: str, valeurs) -> dict:
+    """Extraire et valider les options de conversion (formulaire ou profil).
+    
+    Images: `max_width`, `max_height` (pixels) et `scale` (facteur dans ]0, 1]).
+    Images et audio: `tier`, niveau d'encodage parmi NIVEAUX_ENCODAGE.
+    Les champs vides ou absents sont ignorés.
+    
+    Args:
+        conversion_type: Type de conversion
+        valeurs: Mapping des valeurs brutes (request.form, options d'un profil)
+    
+    Returns:
+        Options normalisées (clés présentes uniquement)
+    
+    Raises:
+        ConversionError: Si une valeur est invalide
+    """
+    from models import ConversionError
+    
+    options = {}
+    if conversion_type not in {"image", "audio"}:
+        return options
+    
+    niveau = str(valeurs.get("tier") or "").strip().lower()
+    if niveau:
+        if niveau not in config.NIVEAUX_ENCODAGE:
+            raise ConversionError(f"tier doit valoir {', '.join(config.NIVEAUX_ENCODAGE)}.")
+        options["tier"] = niveau
+    
+    if conversion_type != "image":
+        return options
+    
+    for champ in ("max_width", "max_height"):
+        valeur = str(valeurs.get(champ) or "").strip()
+        if not valeur:
+            continue
+        if not valeur.isdigit() or not 1 <= int(valeur) <= config.IMAGE_DIMENSION_MAX:
+            raise ConversionError(f"{champ} doit être un entier entre 1 et {config.IMAGE_DIMENSION_MAX}.")
+        options[champ] = int(valeur)
+    
+    valeur = str(valeurs.get("scale") or "").strip()
+    if valeur:
+        try:
+            scale = float(valeur)
+        except ValueError:
+            scale = 0.0
+        if not 0 < scale <= 1:
+            raise ConversionError("scale doit être un nombre dans ]0, 1].")
+        if scale < 1:
+            options["scale"] = scale
+    
+    return options
+
+
+EXTENSIONS_VIGNETTE = {".png", ".jpg", ".jpeg", ".webp"}
+
+# Octets inspectés pour reconnaître un fichier binaire (octet nul)
+TAILLE_SONDE_BINAIRE = 8192
+
+
+def thumbnail_path(file_path: Path) -> Path:
+    """Chemin de la miniature mise en cache à côté d'un fichier de sortie."""
+    return file_path.with_name(f"{file_path.name}.thumb.webp")
+
+
+def ensure_thumbnail(file_path: Path) -> Path | None:
+    """Obtenir la miniature WebP d'une image, générée une seule fois.
+    
+    La miniature tient dans un carré de VIGNETTE_TAILLE pixels et est
+    écrite à côté du fichier; elle est régénérée si le fichier est plus
+    récent. Un JPEG est décodé directement à taille réduite (draft).
+    
+    Returns:
+        Chemin de la miniature, ou None si le fichier n'est pas une image
+    """
+    from PIL import Image
+    
+    if file_path.suffix.lower() not in EXTENSIONS_VIGNETTE or not file_path.exists():
+        return None
+    
+    vignette = thumbnail_path(file_path)
+    try:
+        if vignette.stat().st_mtime_ns >= file_path.stat().st_mtime_ns:
+            return vignette
+    except FileNotFoundError:
+        pass
+    
+    taille = (config.VIGNETTE_TAILLE, config.VIGNETTE_TAILLE)
+    temporaire = vignette.with_name(f".{vignette.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with Image.open(file_path) as img:
+            # thumbnail() utilise draft() pour les JPEG et reduce() pour les autres formats
+            img.thumbnail(taille, Image.Resampling.LANCZOS, reducing_gap=2.0)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+            img.save(temporaire, format="WEBP", quality=config.VIGNETTE_QUALITE)
+        # Renommage atomique: deux requêtes simultanées ne voient jamais une miniature partielle
+        os.replace(temporaire, vignette)
+    except Exception:
+        temporaire.unlink(missing_ok=True)
+        return None
+    return vignette
+
+
+def lire_fenetre_texte(file_path: Path, max_chars: int) -> tuple[str, bool] | None:
+    """Lire le début d'un fichier texte UTF-8 sans parcourir le reste.
+    
+    Au plus `max(4 × max_chars, TAILLE_SONDE_BINAIRE)` octets sont lus. Un
+    octet nul dans les premiers Ko, ou une séquence UTF-8 invalide, signale
+    un fichier binaire. Une séquence multi-octets coupée au bord de la
+    fenêtre n'est pas une erreur (décodeur incrémental). La troncature se
+    déduit de la taille du fichier, sans lire au-delà de la fenêtre.
+    
+    Returns:
+        Tuple (texte, tronqué), ou None si le fichier est binaire
+    """
+    # Un caractère UTF-8 occupe au plus 4 octets
+    fenetre = max(4 * max_chars, TAILLE_SONDE_BINAIRE)
+    with open(file_path, "rb") as f:
+        fin_atteinte = os.fstat(f.fileno()).st_size <= fenetre
+        octets = f.read(fenetre)
+    
+    if b"\x00" in octets[:TAILLE_SONDE_BINAIRE]:
+        return None
+    
+    decodeur = codecs.getincrementaldecoder("utf-8")()
+    try:
+        texte = decodeur.decode(octets, final=fin_atteinte)
+    except UnicodeDecodeError:
+        return None
+    
+    # Un \r final peut être la moitié d'un \r\n coupé par la fenêtre
+    if not fin_atteinte:
+        texte = texte.removesuffix("\r")
+    # Même traduction des fins de ligne qu'une lecture en mode texte
+    texte = texte.replace("\r\n", "\n").replace("\r", "\n")
+    return texte[:max_chars], len(texte) > max_chars or not fin_atteinte
+
+
 def generate_preview(file_path: Path, max_chars: int = 500) -> dict:
     """Générer un aperçu d'un fichier.
     
     Args:
         file_path: Chemin du fichier
         max_chars: Nombre max de caractères pour le texte
-        
+    
     Returns:
         Dictionnaire contenant l'aperçu
     """
@@ -97,38 +299,41 @@ def generate_preview(file_path: Path, max_chars: int = 500) -> dict:
     ext = file_path.suffix.lower()
     
     try:
-        # Aperçu image
-        if ext in {".png", ".jpg", ".jpeg", ".webp", ".svg"}:
-            with open(file_path, "rb") as f:
-                data = base64.b64encode(f.read()).decode()
-                mime_map = {
-                    ".png": "image/png",
-                    ".jpg": "image/jpeg",
-                    ".jpeg": "image/jpeg",
-                    ".webp": "image/webp",
-                    ".svg": "image/svg+xml",
-                }
+        # Aperçu image: la miniature (taille bornée) est intégrée, jamais le fichier complet
+        if ext in EXTENSIONS_VIGNETTE:
+            vignette = ensure_thumbnail(file_path)
+            if vignette is not None:
+                data = base64.b64encode(vignette.read_bytes()).decode()
                 return {
                     "type": "image",
-                    "data": f"data:{mime_map.get(ext, 'image/png')};base64,{data}",
+                    "data": f"data:image/webp;base64,{data}",
                     "size": file_path.stat().st_size
                 }
         
-        # Aperçu texte
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                contenu = f.read(max_chars)
+        if ext == ".svg":
+            with open(file_path, "rb") as f:
+                data = base64.b64encode(f.read()).decode()
                 return {
-                    "type": "text",
-                    "data": contenu,
-                    "truncated": len(f.read()) > 0,
+                    "type": "image",
+                    "data": f"data:image/svg+xml;base64,{data}",
                     "size": file_path.stat().st_size
                 }
-        except UnicodeDecodeError:
+        
+        # Aperçu texte: seule une fenêtre bornée est lue, quelle que soit la taille du fichier
+        taille = file_path.stat().st_size
+        texte = lire_fenetre_texte(file_path, max_chars)
+        if texte is None:
             return {
                 "type": "binary",
-                "data": f"Fichier binaire ({file_path.stat().st_size} bytes)",
-                "size": file_path.stat().st_size
+                "data": f"Fichier binaire ({taille} bytes)",
+                "size": taille
             }
+        contenu, tronque = texte
+        return {
+            "type": "text",
+            "data": contenu,
+            "truncated": tronque,
+            "size": taille
+        }
     except Exception as e:
         return {"error": f"Impossible de prévisualiser: {str(e)}"}